@@ -1,5 +1,10 @@
-from django.contrib import admin
-from .models import Booking, BookingItem, Review
+from django.contrib import admin, messages
+from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from .models import Booking, BookingItem, Review, SeatHold
+from .services import cancel_bookings, delete_bookings, release_items
+from .ticket_export import stream_tickets, async_chunks
 
 
 @admin.register(Booking)
@@ -7,7 +12,8 @@ class BookingAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'showtime', 'status', 'total_price', 'booking_date')
     list_filter = ('status', 'booking_date', 'showtime__movie')
     search_fields = ('user__username', 'showtime__movie__title')
-    readonly_fields = ('booking_date', 'total_price', 'number_of_seats')
+    readonly_fields = ('id', 'booking_date', 'total_price', 'number_of_seats', 'cancelled_at', 'refund_amount', 'cancellation_reason')
+    actions = ['cancel_and_refund', 'export_tickets_zip', 'export_tickets_pdf']
     
     fieldsets = (
         ('Booking Information', {
@@ -16,14 +22,74 @@ class BookingAdmin(admin.ModelAdmin):
         ('Details', {
             'fields': ('number_of_seats', 'total_price', 'status')
         }),
+        ('Cancellation', {
+            'fields': ('cancelled_at', 'refund_amount', 'cancellation_reason')
+        }),
     )
 
+    def get_readonly_fields(self, request, obj=None):
+        # A cancelled booking's seats may already be resold; it cannot be revived
+        if obj is not None and obj.status == 'cancelled':
+            return self.readonly_fields + ('status',)
+        return self.readonly_fields
+
+    def save_model(self, request, obj, form, change):
+        # Setting the status to cancelled by hand must release the seats too
+        if change and 'status' in form.changed_data and obj.status == 'cancelled':
+            obj.status = form.initial['status']
+            super().save_model(request, obj, form, change)
+            cancel_bookings(Booking.objects.filter(pk=obj.pk), reason='Cancelled by staff')
+        else:
+            super().save_model(request, obj, form, change)
+
+    @admin.action(description='Cancel and refund selected bookings')
+    def cancel_and_refund(self, request, queryset):
+        cancelled, freed = cancel_bookings(queryset, reason='Cancelled by staff')
+        self.message_user(request, "Cancelled %d bookings and released %d seats." % (cancelled, freed), messages.SUCCESS)
+
+    # Deleting bookings must hand their seats back to Showtime.available_seats
+    def delete_model(self, request, obj):
+        delete_bookings(Booking.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        delete_bookings(queryset)
+
+    def _export_tickets(self, request, queryset, fmt, content_type):
+        chunks = stream_tickets(queryset, fmt)
+        if isinstance(request, ASGIRequest):
+            chunks = async_chunks(chunks)
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="tickets.{fmt}"'
+        return response
+
+    @admin.action(description='Download tickets (ZIP of PNGs)')
+    def export_tickets_zip(self, request, queryset):
+        return self._export_tickets(request, queryset, 'zip', 'application/zip')
+
+    @admin.action(description='Download tickets (multipage PDF)')
+    def export_tickets_pdf(self, request, queryset):
+        return self._export_tickets(request, queryset, 'pdf', 'application/pdf')
+
 
 @admin.register(BookingItem)
 class BookingItemAdmin(admin.ModelAdmin):
-    list_display = ('booking', 'seat', 'price', 'booked_at')
-    list_filter = ('booked_at', 'seat__seat_type')
+    list_display = ('booking', 'seat', 'price', 'active', 'booked_at')
+    list_filter = ('active', 'booked_at', 'seat__seat_type')
     search_fields = ('booking__user__username', 'seat__row')
+    # Only cancelling (or deleting) releases a seat, so counters stay right
+    readonly_fields = ('active',)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            release_items(BookingItem.objects.filter(pk=obj.pk))
+            obj.delete()
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            # By primary key: a changelist filtered on active would be empty once released
+            items = BookingItem.objects.filter(pk__in=list(queryset.values_list('pk', flat=True)))
+            release_items(items)
+            items.delete()
 
 
 @admin.register(Review)
@@ -31,3 +97,10 @@ class ReviewAdmin(admin.ModelAdmin):
     list_display = ('user', 'movie', 'rating', 'created_at')
     list_filter = ('rating', 'created_at')
     search_fields = ('user__username', 'movie__title')
+
+
+@admin.register(SeatHold)
+class SeatHoldAdmin(admin.ModelAdmin):
+    list_display = ('showtime', 'seat', 'user', 'expires_at')
+    list_filter = ('expires_at',)
+    search_fields = ('user__username', 'seat__seat_number')
@@ -0,0 +1,216 @@
+"""Live seat availability events.
+
+Services publish seat deltas for a showtime once their transaction
+commits, and ``event_stream`` turns them into Server-Sent Events for the
+seat selection page. The broker is picked by settings.SEAT_EVENTS_BROKER:
+'local' fans events out inside one process, 'redis' relays them through
+Redis pub/sub so every worker sees bookings made by the others. Servers
+running more than one worker must use 'redis' (see check_worker_broker).
+"""
+from functools import lru_cache
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+from .seatmap import SeatMap
+
+logger = logging.getLogger(__name__)
+
+# Events a slow client may fall behind by before it is told to resync
+SUBSCRIBER_QUEUE_SIZE = 256
+RESYNC = {'type': 'resync'}
+
+
+def _offer(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(RESYNC)
+
+
+class LocalBroker:
+    """In-process pub/sub: publishers may be any thread, subscribers are asyncio queues"""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def publish(self, showtime_id, event):
+        self.dispatch(showtime_id, event)
+
+    def dispatch(self, showtime_id, event):
+        with self._lock:
+            targets = list(self._subscribers.get(showtime_id, ()))
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # The subscriber's event loop has gone away
+                pass
+
+    def subscribe(self, showtime_id):
+        """Return a subscription; must be called from a running event loop"""
+        subscription = (asyncio.get_running_loop(), asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE))
+        with self._lock:
+            self._subscribers.setdefault(showtime_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, showtime_id, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(showtime_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[showtime_id]
+
+    def subscriber_count(self, showtime_id=None):
+        with self._lock:
+            if showtime_id is not None:
+                return len(self._subscribers.get(showtime_id, ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+
+class RedisBroker(LocalBroker):
+    """Relays events through Redis pub/sub (requires the `redis` package).
+
+    Each process runs one listener thread on ``seats:*`` and hands what it
+    receives to its local subscribers, so a booking made on any worker
+    reaches every open seat map.
+    """
+    CHANNEL_PREFIX = 'seats:'
+
+    def __init__(self, url):
+        import redis
+
+        super().__init__()
+        self._redis = redis.Redis.from_url(url)
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def publish(self, showtime_id, event):
+        self._redis.publish(f'{self.CHANNEL_PREFIX}{showtime_id}', json.dumps(event))
+
+    def subscribe(self, showtime_id):
+        self._ensure_listener()
+        return super().subscribe(showtime_id)
+
+    def _ensure_listener(self):
+        with self._listener_lock:
+            if self._listener is None or not self._listener.is_alive():
+                self._listener = threading.Thread(target=self._listen, name='seat-events', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f'{self.CHANNEL_PREFIX}*')
+                for message in pubsub.listen():
+                    if message['type'] != 'pmessage':
+                        continue
+                    showtime_id = int(message['channel'].rsplit(b':', 1)[1])
+                    self.dispatch(showtime_id, json.loads(message['data']))
+            except Exception:
+                logger.exception('Seat event listener lost its Redis connection; retrying')
+                time.sleep(1)
+
+
+def check_worker_broker(workers):
+    """Refuse a server of ``workers`` processes whose seat events would not reach all of them"""
+    if workers > 1 and settings.SEAT_EVENTS_BROKER != 'redis':
+        raise ImproperlyConfigured(
+            "SEAT_EVENTS_BROKER=%r only reaches streams in the publishing process, but %d "
+            "workers are configured. Set SEAT_EVENTS_BROKER=redis or run one worker."
+            % (settings.SEAT_EVENTS_BROKER, workers)
+        )
+
+
+@lru_cache(maxsize=None)
+def get_broker():
+    """The process-wide broker configured by SEAT_EVENTS_BROKER"""
+    if settings.SEAT_EVENTS_BROKER == 'redis':
+        return RedisBroker(settings.SEAT_EVENTS_REDIS_URL)
+    return LocalBroker()
+
+
+def publish_seats(showtime_id, kind, seat_ids, user_id=None, **extra):
+    """Announce a seat change once the current transaction commits.
+
+    ``kind`` is 'booked', 'held' or 'released'. Failures are logged and
+    never affect the booking itself.
+    """
+    seat_ids = sorted(seat_ids)
+    if not seat_ids:
+        return
+    event = {'type': kind, 'seats': seat_ids, 'user': user_id, **extra}
+
+    def send():
+        try:
+            get_broker().publish(showtime_id, event)
+        except Exception:
+            logger.exception('Could not publish seat event for showtime %s', showtime_id)
+
+    transaction.on_commit(send)
+
+
+def format_event(kind, data):
+    return f'event: {kind}\ndata: {json.dumps(data, separators=(",", ":"))}\n\n'
+
+
+def seat_snapshot(showtime, user=None):
+    """Current booked and held seats, as sent when a stream opens"""
+    seat_map = SeatMap.for_showtime(showtime, user=user)
+    return {
+        'available_seats': seat_map.available_count,
+        'booked': seat_map.booked_seat_ids(),
+        'held': seat_map.held_seat_ids(),
+    }
+
+
+async def event_stream(showtime, user, user_id):
+    """Yield SSE messages for one client: a snapshot, then deltas.
+
+    The stream ends after SEAT_EVENTS_STREAM_SECONDS (or when the client
+    falls too far behind); EventSource reconnects on its own and starts
+    again from a fresh snapshot, so no delta is ever lost. Django 4.2 does
+    not notice an ASGI client going away, so the deadline is also what
+    frees the subscription of a closed tab.
+    """
+    broker = get_broker()
+    subscription = broker.subscribe(showtime.id)
+    _, queue = subscription
+    try:
+        # Subscribe first so nothing committed after the snapshot is missed
+        snapshot = await sync_to_async(seat_snapshot)(showtime, user)
+        yield f'retry: {settings.SEAT_EVENTS_RETRY_MS}\n' + format_event('snapshot', snapshot)
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.SEAT_EVENTS_STREAM_SECONDS
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                event = await asyncio.wait_for(
+                    queue.get(), timeout=min(settings.SEAT_EVENTS_HEARTBEAT_SECONDS, remaining)
+                )
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if event is RESYNC or event.get('type') == 'resync':
+                break
+            # Customers keep seeing their own holds as selectable
+            if event['type'] == 'held' and user_id is not None and event.get('user') == user_id:
+                continue
+            yield format_event(event['type'], {k: v for k, v in event.items() if k not in ('type', 'user')})
+    finally:
+        broker.unsubscribe(showtime.id, subscription)
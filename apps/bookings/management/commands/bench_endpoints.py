@@ -0,0 +1,189 @@
+from io import StringIO
+import json
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.movies.models import Showtime, Seat
+from apps.bookings.models import Booking, BookingItem
+from .generate_load_data import THEATER_PREFIX, USER_PREFIX
+
+DEFAULT_BUDGETS = Path(settings.BASE_DIR) / 'benchmarks' / 'budgets.json'
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def load_fixtures(generated=True):
+    """The showtime, user, booking and free seats every endpoint is measured against"""
+    today = timezone.localdate()
+    showtimes = Showtime.objects.all()
+    users = User.objects.all()
+    if generated:
+        # Keep the numbers independent of whatever else is in the database
+        showtimes = showtimes.filter(theater__name__startswith=THEATER_PREFIX)
+        users = users.filter(username__startswith=USER_PREFIX)
+    showtime = (
+        showtimes.filter(show_date__gte=today)
+        .annotate(sold=Count('bookingitem', filter=Q(bookingitem__active=True))).filter(sold__gt=0)
+        .select_related('movie').order_by('show_date', 'show_time').first()
+    )
+    if showtime is None:
+        raise CommandError('No upcoming showtime with bookings; run generate_load_data first.')
+    user = (
+        users.annotate(n=Count('bookings')).filter(n__gt=0).order_by('-n', 'id').first()
+    )
+    booking = Booking.objects.filter(user=user).order_by('-booking_date').first()
+    taken = BookingItem.objects.filter(showtime=showtime, active=True).values_list('seat_id', flat=True)
+    free_seats = list(
+        Seat.objects.filter(theater_id=showtime.theater_id).exclude(id__in=taken)
+        .values_list('id', flat=True)
+    )
+    return showtime, user, booking, free_seats
+
+
+def endpoint_requests(showtime, user, booking, free_seats):
+    """{endpoint name: callable making one request}, in the order they must run"""
+    anon = Client()
+    auth = Client()
+    auth.force_login(user)
+    browse = ','.join(str(s) for s in free_seats[:2])
+    # Each POST books two fresh seats
+    post_seats = iter(free_seats[2:])
+
+    def checkout_post():
+        seats = ','.join(str(s) for s in (next(post_seats), next(post_seats)))
+        return auth.post(reverse('checkout', args=[showtime.id]), {'seat_ids': seats})
+
+    return {
+        'home': lambda: anon.get(reverse('home')),
+        'movie_list': lambda: anon.get('/movies/'),
+        'movie_detail': lambda: anon.get(reverse('movie_detail', args=[showtime.movie_id])),
+        'movie_search': lambda: anon.get(reverse('movie_search'), {'q': showtime.movie.genre}),
+        'seat_selection': lambda: auth.get(reverse('seat_selection', args=[showtime.id])),
+        # Holds the browse seats, so checkout_get has a reservation to show
+        'reserve_seats': lambda: auth.post(reverse('reserve_seats', args=[showtime.id]), {'seats': browse}),
+        'checkout_get': lambda: auth.get(reverse('checkout', args=[showtime.id])),
+        'checkout_post': checkout_post,
+        'booking_history': lambda: auth.get(reverse('booking_history')),
+        'dashboard': lambda: auth.get(reverse('dashboard')),
+        'download_ticket': lambda: auth.get(reverse('download_ticket', args=[booking.id])),
+        'seat_availability': lambda: anon.get(reverse('seat_availability', args=[showtime.id])),
+    }
+
+
+class Command(BaseCommand):
+    help = ("Drive every public endpoint through the test client and compare query counts, "
+            "p50/p95 latency and allocations against the checked-in budgets.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=20, help='Timed requests per endpoint')
+        parser.add_argument('--budgets', default=str(DEFAULT_BUDGETS))
+        parser.add_argument('--use-existing', action='store_true',
+                            help='Benchmark against the current data instead of generating a fixture')
+        parser.add_argument('--write-budgets', action='store_true',
+                            help='Record the measured numbers (with headroom) as the new budgets')
+        parser.add_argument('--only', default='', help='Comma-separated endpoint names')
+
+    def handle(self, *args, **options):
+        # Every write (generated data, bookings made by checkout POST) is rolled back
+        with transaction.atomic():
+            if not options['use_existing']:
+                call_command('generate_load_data', theaters=3, days=14, movies=12,
+                             users=200, seed=1, clear=True, stdout=StringIO())
+            with override_settings(
+                SECURE_SSL_REDIRECT=False,
+                STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+            ):
+                results = self._run(options)
+            transaction.set_rollback(True)
+
+        self._report(results, options)
+
+    def _run(self, options):
+        showtime, user, booking, free_seats = load_fixtures(generated=not options['use_existing'])
+        endpoints = endpoint_requests(showtime, user, booking, free_seats)
+        only = {name for name in options['only'].split(',') if name}
+        if len(free_seats) < 2 * options['runs'] + 8:
+            raise CommandError('Not enough free seats for %d checkout POSTs' % options['runs'])
+
+        results = {}
+        for name, request in endpoints.items():
+            if only and name not in only:
+                continue
+            cache.clear()
+            # Cold request: the query budget covers the uncached path
+            with CaptureQueriesContext(connection) as ctx:
+                response = request()
+            if response.status_code >= 400:
+                raise CommandError('%s returned HTTP %d' % (name, response.status_code))
+            queries = len(ctx.captured_queries)
+
+            timings = []
+            for _ in range(options['runs']):
+                start = time.perf_counter()
+                request()
+                timings.append((time.perf_counter() - start) * 1000)
+
+            tracemalloc.start()
+            request()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            results[name] = {
+                'queries': queries,
+                'p50_ms': round(percentile(timings, 50), 2),
+                'p95_ms': round(percentile(timings, 95), 2),
+                'alloc_kb': round(peak / 1024, 1),
+            }
+        return results
+
+    def _report(self, results, options):
+        path = Path(options['budgets'])
+        budgets = json.loads(path.read_text()) if path.exists() else {}
+        if options['write_budgets']:
+            budgets.update({
+                name: {
+                    'queries': r['queries'],
+                    # Latency and memory vary between machines; leave headroom
+                    'p95_ms': round(max(r['p95_ms'] * 3, 20.0), 1),
+                    'alloc_kb': round(max(r['alloc_kb'] * 2, 512.0)),
+                }
+                for name, r in results.items()
+            })
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(budgets, indent=2, sort_keys=True) + '\n')
+            self.stdout.write("Wrote budgets to %s" % path)
+
+        self.stdout.write("%-18s %8s %9s %9s %10s  %s" % (
+            'endpoint', 'queries', 'p50 ms', 'p95 ms', 'alloc KB', 'budget'))
+        failures = []
+        for name, r in results.items():
+            budget = budgets.get(name, {})
+            over = [
+                metric for metric in ('queries', 'p95_ms', 'alloc_kb')
+                if metric in budget and r[metric] > budget[metric]
+            ]
+            status = 'OVER: ' + ', '.join(over) if over else ('ok' if budget else 'no budget')
+            line = "%-18s %8d %9.2f %9.2f %10.1f  %s" % (
+                name, r['queries'], r['p50_ms'], r['p95_ms'], r['alloc_kb'], status)
+            self.stdout.write(self.style.ERROR(line) if over else line)
+            if over:
+                failures.append(name)
+
+        if failures:
+            raise CommandError('Performance budget exceeded by: %s' % ', '.join(failures))
@@ -0,0 +1,71 @@
+from datetime import date, time as dtime
+from decimal import Decimal
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.movies.models import Movie, Theater, Showtime, Seat
+from apps.bookings.models import Booking, BookingItem
+from apps.bookings.seatmap import SeatMap
+
+
+class Command(BaseCommand):
+    help = "Benchmark seat map construction (query count and latency) across theater sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='50,150,300,600,1200',
+                            help='Comma-separated theater sizes (seats) to benchmark')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Number of timed builds per size')
+        parser.add_argument('--booked', type=float, default=0.5,
+                            help='Fraction of seats booked before measuring')
+
+    def handle(self, *args, **options):
+        sizes = [int(s) for s in options['sizes'].split(',') if s.strip()]
+        self.stdout.write("%8s %8s %10s %12s" % ('seats', 'queries', 'booked', 'avg ms'))
+        # All fixtures are created inside a transaction that is rolled back
+        with transaction.atomic():
+            for size in sizes:
+                self._bench(size, options['repeat'], options['booked'])
+            transaction.set_rollback(True)
+
+    def _bench(self, size, repeat, booked_ratio):
+        movie = Movie.objects.create(
+            title=f'Bench {size}', description='-', genre='Bench', director='-',
+            duration=120, release_date=date.today(),
+        )
+        theater = Theater.objects.create(name=f'Bench {size}', location='-', total_seats=size)
+        per_row = 20
+        Seat.objects.bulk_create([
+            Seat(theater=theater, row=f'R{i // per_row:03d}', column=i % per_row + 1,
+                 seat_number=f'R{i // per_row:03d}-{i % per_row + 1}')
+            for i in range(size)
+        ])
+        showtime = Showtime.objects.create(
+            movie=movie, theater=theater, show_date=date.today(),
+            show_time=dtime(20, 0), ticket_price=Decimal('300.00'),
+        )
+        user, _ = User.objects.get_or_create(username='seatmap-bench')
+        booking = Booking.objects.create(user=user, showtime=showtime, status='confirmed')
+        seats = list(Seat.objects.filter(theater=theater)[:int(size * booked_ratio)])
+        BookingItem.objects.bulk_create([
+            BookingItem(booking=booking, showtime=showtime, seat=seat, price=showtime.ticket_price)
+            for seat in seats
+        ])
+
+        with CaptureQueriesContext(connection) as ctx:
+            seat_map = SeatMap.for_showtime(showtime)
+            seat_map.seats_by_row()
+        queries = len(ctx.captured_queries)
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            seat_map = SeatMap.for_showtime(showtime)
+            seat_map.seats_by_row()
+            seat_map.booked_seat_ids()
+        elapsed = (time.perf_counter() - start) * 1000 / repeat
+
+        self.stdout.write("%8d %8d %10d %12.2f" % (size, queries, seat_map.booked_count, elapsed))
@@ -0,0 +1,67 @@
+import re
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.movies.models import Movie, Showtime
+from apps.bookings.models import Booking, BookingItem
+
+# A plain "SCAN <table>" without an index on SQLite, "Seq Scan" on PostgreSQL
+SEQ_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?!.*\bUSING (COVERING )?INDEX\b)'),
+    'postgresql': re.compile(r'\bSeq Scan\b'),
+}
+
+
+def hot_queries():
+    """The query shapes behind the busiest pages, keyed by a short label"""
+    today = timezone.localdate()
+    return {
+        'seat map: items by showtime': BookingItem.objects.filter(showtime_id=1, active=True),
+        'movie schedule': Showtime.objects.filter(
+            movie_id=1, show_date__gte=today, show_date__lte=today + timedelta(days=30)
+        ).order_by('show_date', 'show_time'),
+        'upcoming showtimes': Showtime.objects.filter(
+            show_date__gte=today
+        ).order_by('show_date', 'show_time'),
+        'active movies': Movie.objects.filter(status='active').order_by('-release_date'),
+        'active movies by genre': Movie.objects.filter(
+            status='active', genre='Drama'
+        ).order_by('-release_date'),
+        'booking history': Booking.objects.filter(user_id=1).order_by('-booking_date', '-id'),
+        'booking history page': Booking.objects.filter(user_id=1).filter(
+            Q(booking_date__lt=timezone.now()) | Q(booking_date=timezone.now(), id__lt=1)
+        ).order_by('-booking_date', '-id'),
+    }
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN the hot query shapes and fail if any falls back to a sequential scan."
+
+    def handle(self, *args, **options):
+        pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError("Query plan checks are not supported on %s" % connection.vendor)
+
+        failures = []
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                # Small tables make seq scans the cheapest plan; we only care
+                # whether an index path exists at all.
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            for label, queryset in hot_queries().items():
+                plan = queryset.explain()
+                if pattern.search(plan):
+                    failures.append(label)
+                    self.stdout.write(self.style.ERROR("SEQ SCAN  %s" % label))
+                    self.stdout.write("    " + plan.replace("\n", "\n    "))
+                else:
+                    self.stdout.write(self.style.SUCCESS("ok        %s" % label))
+
+        if failures:
+            raise CommandError("%d hot quer%s use a sequential scan" % (
+                len(failures), 'y would' if len(failures) == 1 else 'ies would'))
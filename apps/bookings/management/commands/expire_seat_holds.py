@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from apps.bookings.services import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Delete expired seat holds in bulk. Run from cron or a scheduler every minute or so."
+
+    def handle(self, *args, **options):
+        deleted = release_expired_holds()
+        self.stdout.write("Released %d expired seat hold(s)" % deleted)
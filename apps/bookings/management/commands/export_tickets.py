@@ -0,0 +1,53 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.bookings.models import Booking
+from apps.bookings.ticket_export import stream_tickets, FORMATS
+
+
+class Command(BaseCommand):
+    help = "Render tickets for many bookings in parallel into a ZIP of PNGs or a multipage PDF."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', default='', help='Comma-separated booking ids')
+        parser.add_argument('--showtime', type=int, help='Export every confirmed booking of a showtime')
+        parser.add_argument('--user', help='Export every confirmed booking of a username')
+        parser.add_argument('--format', choices=FORMATS, default='zip')
+        parser.add_argument('--output', '-o', required=True, help="Output file, or '-' for stdout")
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Render processes (default: TICKET_EXPORT_WORKERS or CPU count)')
+
+    def handle(self, *args, **options):
+        bookings = Booking.objects.all()
+        if options['bookings']:
+            try:
+                ids = [int(b) for b in options['bookings'].split(',') if b.strip()]
+            except ValueError:
+                raise CommandError('--bookings must be a comma-separated list of ids')
+            bookings = bookings.filter(id__in=ids)
+        elif options['showtime'] or options['user']:
+            bookings = bookings.filter(status='confirmed')
+            if options['showtime']:
+                bookings = bookings.filter(showtime_id=options['showtime'])
+            if options['user']:
+                bookings = bookings.filter(user__username=options['user'])
+        else:
+            raise CommandError('Pass --bookings, --showtime or --user')
+
+        count = bookings.count()
+        if not count:
+            raise CommandError('No bookings matched')
+
+        out = sys.stdout.buffer if options['output'] == '-' else open(options['output'], 'wb')
+        try:
+            written = 0
+            for chunk in stream_tickets(bookings, options['format'], options['workers']):
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+        if options['output'] != '-':
+            self.stdout.write(self.style.SUCCESS(
+                "Exported %d ticket(s) to %s (%d bytes)" % (count, options['output'], written)))
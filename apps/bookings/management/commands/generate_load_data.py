@@ -0,0 +1,216 @@
+from datetime import date, time as dtime, timedelta
+from decimal import Decimal
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.movies.models import Movie, Theater, Showtime, Seat
+from apps.movies.scheduling import SlotTemplate, create_schedule
+from apps.bookings.models import Booking, BookingItem
+
+THEATER_PREFIX = 'Load Hall '
+MOVIE_PREFIX = 'Load Movie '
+USER_PREFIX = 'load_user_'
+
+WORDS = (
+    'quantum paradox love paris dark shadows space odyssey laugh dragon chronicles '
+    'heist ocean mystery storm empire river night city ghost legend winter summer '
+    'secret garden machine iron crown shadow fire island desert hunter silent'
+).split()
+GENRES = ['Sci-Fi', 'Romance', 'Thriller', 'Comedy', 'Fantasy', 'Crime', 'Adventure', 'Drama']
+DIRECTORS = ['Nolan', 'Anderson', 'Villeneuve', 'Cameron', 'Apatow', 'Jackson', 'Soderbergh', 'Wan']
+ROWS = 'ABCDEFGHIJKLMNOPQRST'
+
+# (time, demand factor, ticket price)
+SLOTS = [
+    (dtime(10, 30), 0.35, Decimal('250.00')),
+    (dtime(13, 30), 0.5, Decimal('280.00')),
+    (dtime(16, 30), 0.65, Decimal('300.00')),
+    (dtime(19, 30), 1.0, Decimal('350.00')),
+    (dtime(22, 15), 0.75, Decimal('320.00')),
+]
+# Party sizes and how often they occur
+BASKET_SIZES = [1, 2, 3, 4, 5, 6]
+BASKET_WEIGHTS = [18, 45, 12, 15, 5, 5]
+
+
+class Command(BaseCommand):
+    help = ("Generate reproducible, production-scale load data (theaters, seats, movies, "
+            "showtimes, users, bookings) using batched bulk_create.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--theaters', type=int, default=10)
+        parser.add_argument('--rows', type=int, default=12, help='Seat rows per theater (max 20)')
+        parser.add_argument('--seats-per-row', type=int, default=20)
+        parser.add_argument('--movies', type=int, default=40)
+        parser.add_argument('--days', type=int, default=60, help='Length of the showtime calendar')
+        parser.add_argument('--start', default=None,
+                            help='First calendar day (YYYY-MM-DD); defaults to --days/2 ago')
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--occupancy', type=float, default=0.55,
+                            help='Mean occupancy of a prime-time showtime (0-1)')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete previously generated load data first')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        started = time.perf_counter()
+
+        if options['clear']:
+            self._clear()
+
+        with transaction.atomic():
+            theaters, seats_by_theater = self._theaters(options)
+            movies, popularity = self._movies(options)
+            users = self._users(options)
+        showtimes = self._showtimes(options, theaters, movies)
+        bookings, items = self._bookings(options, showtimes, seats_by_theater, popularity, users)
+
+        self.stdout.write(self.style.SUCCESS(
+            "Generated %d theaters, %d movies, %d users, %d showtimes, %d bookings, "
+            "%d booking items in %.1fs" % (
+                len(theaters), len(movies), len(users), len(showtimes), bookings, items,
+                time.perf_counter() - started,
+            )
+        ))
+
+    def _clear(self):
+        # Cascades take care of seats, showtimes, bookings and items
+        Theater.objects.filter(name__startswith=THEATER_PREFIX).delete()
+        Movie.objects.filter(title__startswith=MOVIE_PREFIX).delete()
+        User.objects.filter(username__startswith=USER_PREFIX).delete()
+        self.stdout.write("Cleared previous load data")
+
+    def _theaters(self, options):
+        rows = ROWS[:max(1, min(options['rows'], len(ROWS)))]
+        per_row = options['seats_per_row']
+        theaters = Theater.objects.bulk_create([
+            Theater(name=f'{THEATER_PREFIX}{n:03d}', location=f'Level {n % 4 + 1}',
+                    total_seats=len(rows) * per_row)
+            for n in range(options['theaters'])
+        ])
+        seats = []
+        for theater in theaters:
+            for r, row in enumerate(rows):
+                for col in range(1, per_row + 1):
+                    if r >= len(rows) - 3 and per_row // 3 <= col <= 2 * per_row // 3:
+                        seat_type = 'vip'
+                    elif r >= len(rows) // 2:
+                        seat_type = 'premium'
+                    else:
+                        seat_type = 'standard'
+                    seats.append(Seat(theater=theater, row=row, column=col,
+                                      seat_number=f'{row}{col}', seat_type=seat_type))
+        Seat.objects.bulk_create(seats, batch_size=self.batch_size)
+
+        seats_by_theater = {t.id: [] for t in theaters}
+        for theater_id, seat_id in Seat.objects.filter(
+            theater__in=theaters
+        ).values_list('theater_id', 'id').iterator():
+            seats_by_theater[theater_id].append(seat_id)
+        return theaters, seats_by_theater
+
+    def _movies(self, options):
+        rng = self.rng
+        today = date.today()
+        movies = Movie.objects.bulk_create([
+            Movie(
+                title=f"{MOVIE_PREFIX}{n:05d} {' '.join(rng.sample(WORDS, 2)).title()}",
+                description=' '.join(rng.choices(WORDS, k=25)),
+                genre=rng.choice(GENRES),
+                director=rng.choice(DIRECTORS),
+                duration=rng.randint(85, 175),
+                rating=round(rng.uniform(5.0, 9.5), 1),
+                release_date=today - timedelta(days=rng.randint(0, 120)),
+                status='active',
+            )
+            for n in range(options['movies'])
+        ], batch_size=self.batch_size)
+        # Zipf-like popularity: a few blockbusters, a long tail
+        popularity = {m.id: 1.0 / (rank + 1) ** 0.8 for rank, m in enumerate(movies)}
+        return movies, popularity
+
+    def _users(self, options):
+        password = make_password('loadtest123')
+        User.objects.bulk_create([
+            User(username=f'{USER_PREFIX}{n:06d}', email=f'{USER_PREFIX}{n:06d}@example.com',
+                 password=password)
+            for n in range(options['users'])
+        ], batch_size=self.batch_size)
+        return list(User.objects.filter(username__startswith=USER_PREFIX).values_list('id', flat=True))
+
+    def _showtimes(self, options, theaters, movies):
+        rng = self.rng
+        if options['start']:
+            start = date.fromisoformat(options['start'])
+        else:
+            start = date.today() - timedelta(days=options['days'] // 2)
+        # The scheduler rotates through this list, so popular movies appear in it more often
+        rotation = [
+            movie for rank, movie in enumerate(movies)
+            for _ in range(max(1, round(10 / (rank + 1) ** 0.8)))
+        ]
+        rng.shuffle(rotation)
+        slots = [SlotTemplate(slot_time, price) for slot_time, _, price in SLOTS]
+        # Long movies run into the next slot, which then stays empty
+        plan = create_schedule(start, start + timedelta(days=options['days'] - 1), rotation, theaters,
+                               slots, batch_size=self.batch_size)
+        self.stdout.write("  %d slots left empty by longer screenings" % len(plan.conflicts))
+        return plan.showtimes
+
+    def _bookings(self, options, showtimes, seats_by_theater, popularity, users):
+        rng = self.rng
+        demand = {slot_time: factor for slot_time, factor, _ in SLOTS}
+        top = max(popularity.values()) if popularity else 1.0
+        pending = []   # (Booking, [seat ids])
+        updated = []
+        totals = [0, 0]
+
+        def flush():
+            if not pending:
+                return
+            with transaction.atomic():
+                Booking.objects.bulk_create([b for b, _ in pending], batch_size=self.batch_size)
+                BookingItem.objects.bulk_create([
+                    BookingItem(booking=b, showtime_id=b.showtime_id, seat_id=seat_id,
+                                price=b.total_price / len(seat_ids))
+                    for b, seat_ids in pending for seat_id in seat_ids
+                ], batch_size=self.batch_size)
+                Showtime.objects.bulk_update(updated, ['available_seats'], batch_size=self.batch_size)
+            totals[0] += len(pending)
+            totals[1] += sum(len(seat_ids) for _, seat_ids in pending)
+            pending.clear()
+            updated.clear()
+
+        for showtime in showtimes:
+            seat_ids = list(seats_by_theater[showtime.theater_id])
+            weekend = 1.2 if showtime.show_date.weekday() >= 4 else 1.0
+            mean = options['occupancy'] * demand[showtime.show_time] * weekend \
+                * (0.4 + 0.6 * popularity[showtime.movie_id] / top)
+            target = int(len(seat_ids) * min(max(rng.gauss(mean, 0.12), 0.0), 1.0))
+            rng.shuffle(seat_ids)
+
+            sold = 0
+            while sold < target:
+                size = min(rng.choices(BASKET_SIZES, BASKET_WEIGHTS)[0], target - sold)
+                basket = seat_ids[sold:sold + size]
+                sold += size
+                pending.append((Booking(
+                    user_id=rng.choice(users), showtime_id=showtime.id, status='confirmed',
+                    total_price=showtime.ticket_price * size, number_of_seats=size,
+                ), basket))
+            if sold:
+                showtime.available_seats = len(seat_ids) - sold
+                updated.append(showtime)
+            if len(pending) >= self.batch_size:
+                flush()
+                self.stdout.write("  %d booking items so far" % totals[1])
+        flush()
+        return totals[0], totals[1]
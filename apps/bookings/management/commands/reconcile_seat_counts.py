@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Q
+
+from apps.bookings.models import BookingItem
+from apps.bookings.services import release_items
+from apps.movies.models import Showtime
+
+
+class Command(BaseCommand):
+    help = ("Recompute Showtime.available_seats from booking items to repair counter drift. "
+            "Seats still held by items of cancelled bookings are released first.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drifted showtimes without saving')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        stranded = BookingItem.objects.filter(booking__status='cancelled', active=True)
+        if options['dry_run']:
+            self.stdout.write("Found %d seat(s) held by cancelled bookings" % stranded.count())
+        else:
+            with transaction.atomic():
+                self.stdout.write("Released %d seat(s) held by cancelled bookings" % release_items(stranded))
+
+        # One grouped aggregate over all showtimes
+        rows = Showtime.objects.values(
+            'id', 'available_seats', 'theater__total_seats'
+        ).annotate(
+            booked=Count('bookingitem', filter=Q(bookingitem__active=True))
+        ).order_by()
+
+        drifted = []
+        for row in rows.iterator():
+            expected = max(row['theater__total_seats'] - row['booked'], 0)
+            if expected != row['available_seats']:
+                drifted.append(Showtime(id=row['id'], available_seats=expected))
+
+        if drifted and not options['dry_run']:
+            Showtime.objects.bulk_update(drifted, ['available_seats'], batch_size=options['batch_size'])
+
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write("%s %d drifted showtime counter(s)" % (verb, len(drifted)))
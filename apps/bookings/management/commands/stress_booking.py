@@ -0,0 +1,107 @@
+from collections import Counter
+from datetime import date, time as dtime
+from decimal import Decimal
+import random
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, OperationalError
+from django.db.models import Count
+
+from apps.movies.models import Movie, Theater, Showtime, Seat
+from apps.bookings.models import BookingItem
+from apps.bookings.services import commit_booking, SeatsUnavailable
+
+
+class Command(BaseCommand):
+    help = "Hammer commit_booking from many threads and verify there are no double bookings."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--attempts', type=int, default=50,
+                            help='Booking attempts per thread')
+        parser.add_argument('--seats', type=int, default=200,
+                            help='Seats in the scratch theater')
+        parser.add_argument('--basket', type=int, default=4,
+                            help='Seats requested per attempt')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        movie = Movie.objects.create(
+            title='Stress test', description='-', genre='Stress', director='-',
+            duration=120, release_date=date.today(),
+        )
+        theater = Theater.objects.create(name='Stress hall', location='-', total_seats=options['seats'])
+        try:
+            self._run(movie, theater, options)
+        finally:
+            # Cascades to seats, showtimes, bookings and items
+            movie.delete()
+            theater.delete()
+            User.objects.filter(username__startswith='stress-booker-').delete()
+
+    def _run(self, movie, theater, options):
+        Seat.objects.bulk_create([
+            Seat(theater=theater, row=f'R{i // 20:02d}', column=i % 20 + 1,
+                 seat_number=f'R{i // 20:02d}-{i % 20 + 1}')
+            for i in range(options['seats'])
+        ])
+        showtime = Showtime.objects.create(
+            movie=movie, theater=theater, show_date=date.today(),
+            show_time=dtime(20, 0), ticket_price=Decimal('300.00'),
+        )
+        seat_ids = list(Seat.objects.filter(theater=theater).values_list('id', flat=True))
+        users = [
+            User.objects.create(username=f'stress-booker-{n}')
+            for n in range(options['threads'])
+        ]
+        stats = Counter()
+        lock = threading.Lock()
+
+        def worker(n):
+            rng = random.Random(options['seed'] + n)
+            try:
+                for _ in range(options['attempts']):
+                    basket = rng.sample(seat_ids, options['basket'])
+                    try:
+                        commit_booking(users[n], showtime.id, basket)
+                        outcome = 'committed'
+                    except SeatsUnavailable:
+                        outcome = 'conflicts'
+                    except OperationalError:
+                        # e.g. SQLite "database is locked" under contention
+                        outcome = 'lock_errors'
+                    with lock:
+                        stats[outcome] += 1
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(options['threads'])]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+
+        doubles = (
+            BookingItem.objects.filter(showtime=showtime, active=True)
+            .values('seat_id').annotate(n=Count('id')).filter(n__gt=1).count()
+        )
+        sold = BookingItem.objects.filter(showtime=showtime, active=True).count()
+        showtime.refresh_from_db()
+
+        self.stdout.write(f"vendor:          {connection.vendor}")
+        self.stdout.write(f"attempts:        {sum(stats.values())}")
+        self.stdout.write(f"committed:       {stats['committed']}")
+        self.stdout.write(f"conflicts:       {stats['conflicts']}")
+        self.stdout.write(f"lock errors:     {stats['lock_errors']}")
+        self.stdout.write(f"seats sold:      {sold}")
+        self.stdout.write(f"double bookings: {doubles}")
+        self.stdout.write(f"commits/sec:     {stats['committed'] / elapsed:.1f}")
+
+        if doubles or showtime.available_seats != theater.total_seats - sold:
+            raise CommandError('Seat inventory is inconsistent after stress run')
+        self.stdout.write(self.style.SUCCESS('No double bookings.'))
@@ -0,0 +1,33 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = ("Copy the SQLite primary database onto the SQLite replicas in DATABASE_REPLICA_URLS, "
+            "standing in for replication when testing read-replica routing locally.")
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES['default']
+        if not settings.DATABASE_REPLICAS:
+            raise CommandError("No replicas configured; set DATABASE_REPLICA_URLS")
+        if 'sqlite3' not in primary['ENGINE']:
+            raise CommandError("Only SQLite primaries can be copied; use your database's replication instead")
+
+        source = sqlite3.connect(str(primary['NAME']))
+        try:
+            for alias in settings.DATABASE_REPLICAS:
+                replica = settings.DATABASES[alias]
+                if 'sqlite3' not in replica['ENGINE']:
+                    raise CommandError("%s is not a SQLite database" % alias)
+                target = sqlite3.connect(str(replica['NAME']))
+                try:
+                    # Online backup: consistent even while the primary is in use
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(self.style.SUCCESS("Copied %s to %s (%s)" % (
+                    primary['NAME'], alias, replica['NAME'])))
+        finally:
+            source.close()
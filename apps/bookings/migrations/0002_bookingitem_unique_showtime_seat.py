@@ -0,0 +1,84 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:11
+
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+
+# Which sale keeps a seat sold twice: live bookings first, then the earliest
+STATUS_RANK = {'confirmed': 0, 'pending': 1, 'cancelled': 2}
+
+
+def remove_double_bookings(apps, schema_editor):
+    """Resolve seats sold twice for the same showtime so the constraint can be added.
+
+    The seat stays with its earliest confirmed sale (a pending or
+    cancelled one only when nothing better holds it); the other items
+    are deleted. Bookings that lost items get their seat count and total
+    recomputed from the items they keep, and are cancelled if none are
+    left. available_seats is recounted for the affected showtimes.
+    """
+    Booking = apps.get_model('bookings', 'Booking')
+    BookingItem = apps.get_model('bookings', 'BookingItem')
+    Showtime = apps.get_model('movies', 'Showtime')
+
+    duplicated = (
+        BookingItem.objects.values('showtime_id', 'seat_id')
+        .annotate(n=Count('id')).filter(n__gt=1).values_list('showtime_id', 'seat_id')
+    )
+    groups = {key: [] for key in duplicated}
+    if not groups:
+        return
+    showtime_ids = {showtime_id for showtime_id, _ in groups}
+    for item_id, showtime_id, seat_id, booking_id, status in BookingItem.objects.filter(
+        showtime_id__in=showtime_ids
+    ).values_list('id', 'showtime_id', 'seat_id', 'booking_id', 'booking__status').order_by('id'):
+        if (showtime_id, seat_id) in groups:
+            groups[(showtime_id, seat_id)].append((STATUS_RANK.get(status, 3), item_id, booking_id))
+
+    dropped, affected = [], set()
+    for items in groups.values():
+        items.sort()
+        for _, item_id, booking_id in items[1:]:
+            dropped.append(item_id)
+            affected.add(booking_id)
+    BookingItem.objects.filter(id__in=dropped).delete()
+
+    kept = {
+        row['booking_id']: row
+        for row in BookingItem.objects.filter(booking_id__in=affected)
+        .values('booking_id').annotate(seats=Count('id'), total=Sum('price'))
+    }
+    bookings = list(Booking.objects.filter(id__in=affected))
+    for booking in bookings:
+        row = kept.get(booking.id)
+        booking.number_of_seats = row['seats'] if row else 0
+        booking.total_price = row['total'] if row else Decimal('0.00')
+        if row is None:
+            booking.status = 'cancelled'
+    Booking.objects.bulk_update(bookings, ['number_of_seats', 'total_price', 'status'])
+
+    showtimes = list(
+        Showtime.objects.filter(id__in=showtime_ids).select_related('theater').annotate(
+            booked=Count('bookingitem', filter=~Q(bookingitem__booking__status='cancelled'))
+        )
+    )
+    for showtime in showtimes:
+        showtime.available_seats = max(showtime.theater.total_seats - showtime.booked, 0)
+    Showtime.objects.bulk_update(showtimes, ['available_seats'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0001_initial'),
+        ('bookings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_double_bookings, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='bookingitem',
+            unique_together={('showtime', 'seat'), ('booking', 'seat')},
+        ),
+    ]
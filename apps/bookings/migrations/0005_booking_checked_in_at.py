@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='checked_in_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0006_booking_history_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='booking',
+            name='cancellation_reason',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='cancelled_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='refund_amount',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['showtime', 'status'], name='booking_showtime_status_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0007_booking_cancellation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seathold',
+            name='price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+    ]
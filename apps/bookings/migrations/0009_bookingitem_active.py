@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_showtime_sales_updated_at'),
+        ('bookings', '0008_seathold_price'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='bookingitem',
+            unique_together={('booking', 'seat')},
+        ),
+        migrations.AddField(
+            model_name='bookingitem',
+            name='active',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddConstraint(
+            model_name='bookingitem',
+            constraint=models.UniqueConstraint(condition=models.Q(('active', True)), fields=('showtime', 'seat'), name='bookingitem_active_showtime_seat'),
+        ),
+    ]
@@ -1,5 +1,9 @@
+from datetime import datetime, timedelta
+
+from django.conf import settings
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from apps.movies.models import Showtime, Seat
 from decimal import Decimal
 
@@ -18,12 +22,32 @@ class Booking(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
     number_of_seats = models.IntegerField(default=0)
+    checked_in_at = models.DateTimeField(null=True, blank=True)
+    cancelled_at = models.DateTimeField(null=True, blank=True)
+    refund_amount = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    cancellation_reason = models.CharField(max_length=200, blank=True)
     
     class Meta:
         ordering = ['-booking_date']
+        indexes = [
+            # Booking history and dashboard: a user's bookings, newest first.
+            # id breaks ties so keyset pages can walk the index in order.
+            models.Index(fields=['user', '-booking_date', '-id'], name='booking_user_date_id_idx'),
+            # A showtime's live (or cancelled) bookings: mass cancellation and seat recounts
+            models.Index(fields=['showtime', 'status'], name='booking_showtime_status_idx'),
+        ]
     
     def __str__(self):
         return f"Booking #{self.id} - {self.user.username} - {self.showtime.movie.title}"
+
+    def can_cancel(self, now=None):
+        """Whether the customer may still cancel: confirmed, unused and
+        at least BOOKING_CANCEL_CUTOFF_MINUTES before the show starts"""
+        if self.status != 'confirmed' or self.checked_in_at is not None:
+            return False
+        starts = timezone.make_aware(datetime.combine(self.showtime.show_date, self.showtime.show_time))
+        cutoff = timedelta(minutes=settings.BOOKING_CANCEL_CUTOFF_MINUTES)
+        return (now or timezone.now()) <= starts - cutoff
     
     def calculate_total(self):
         """Calculate total price from booking items"""
@@ -41,9 +65,21 @@ class BookingItem(models.Model):
     seat = models.ForeignKey(Seat, on_delete=models.CASCADE)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     booked_at = models.DateTimeField(auto_now_add=True)
+    # Cleared when the booking is cancelled: the item stays as a record of
+    # what was sold, but no longer holds the seat
+    active = models.BooleanField(default=True)
     
     class Meta:
-        unique_together = ['booking', 'seat']
+        unique_together = [['booking', 'seat']]
+        constraints = [
+            # A seat can only be sold once per showtime; this is the final guard
+            # against concurrent checkouts racing for the same seats. The same
+            # partial index serves the seat map's active items by showtime.
+            models.UniqueConstraint(
+                fields=['showtime', 'seat'], condition=models.Q(active=True),
+                name='bookingitem_active_showtime_seat',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.booking} - {self.seat}"
@@ -64,3 +100,25 @@ class Review(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.movie.title}"
+
+
+class SeatHold(models.Model):
+    """Temporary reservation of a seat while a customer checks out"""
+    showtime = models.ForeignKey(Showtime, on_delete=models.CASCADE, related_name='seat_holds')
+    seat = models.ForeignKey(Seat, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='seat_holds')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    # Price quoted when the seat was held; the booking charges this
+    price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    
+    class Meta:
+        unique_together = ['showtime', 'seat']
+    
+    def __str__(self):
+        return f"{self.seat} held by {self.user.username} until {self.expires_at}"
+    
+    @classmethod
+    def active(cls):
+        """Holds that have not yet expired"""
+        return cls.objects.filter(expires_at__gt=timezone.now())
@@ -0,0 +1,68 @@
+"""Keyset (cursor) pagination over (booking_date, id), newest first.
+
+Instead of OFFSET, each page continues from the last row of the previous
+one, so page 500 costs the same index range scan as page 1. Cursors are
+opaque URL-safe strings.
+"""
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that was not produced by ``encode_cursor``"""
+
+
+def encode_cursor(obj, field='booking_date'):
+    value = f"{getattr(obj, field).isoformat()}|{obj.pk}"
+    return urlsafe_b64encode(value.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        value, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(value), int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(str(e)) from None
+
+
+class KeysetPage:
+    """One page of results plus the cursors to its neighbours"""
+
+    def __init__(self, items, has_next, has_previous, field):
+        self.items = items
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = encode_cursor(items[-1], field) if has_next and items else None
+        self.previous_cursor = encode_cursor(items[0], field) if has_previous and items else None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def keyset_page(queryset, after=None, before=None, per_page=10, field='booking_date'):
+    """Return the ``per_page`` rows older than ``after`` (or newer than ``before``).
+
+    Rows are ordered by ``field`` then primary key, both descending. With
+    neither cursor the newest page is returned. Raises InvalidCursor.
+    """
+    if before:
+        value, pk = decode_cursor(before)
+        rows = list(
+            queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'pk__gt': pk}))
+            .order_by(field, 'pk')[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        items = rows[:per_page][::-1]
+        return KeysetPage(items, has_next=True, has_previous=has_previous, field=field)
+
+    if after:
+        value, pk = decode_cursor(after)
+        queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'pk__lt': pk}))
+    rows = list(queryset.order_by(f'-{field}', '-pk')[:per_page + 1])
+    return KeysetPage(rows[:per_page], has_next=len(rows) > per_page, has_previous=bool(after), field=field)
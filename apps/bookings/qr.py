@@ -0,0 +1,279 @@
+"""Minimal, dependency-free QR code encoder.
+
+Supports byte mode at error correction level M for versions 1-10 (up to
+213 bytes), which is plenty for signed ticket tokens. ``encode`` returns
+the module matrix as a list of rows of booleans (True = dark), without
+the quiet zone.
+"""
+
+# version -> (EC codewords per block, [(block count, data codewords per block), ...])
+_EC_M = {
+    1: (10, [(1, 16)]),
+    2: (16, [(1, 28)]),
+    3: (26, [(1, 44)]),
+    4: (18, [(2, 32)]),
+    5: (24, [(2, 43)]),
+    6: (16, [(4, 27)]),
+    7: (18, [(4, 31)]),
+    8: (22, [(2, 38), (2, 39)]),
+    9: (22, [(3, 36), (2, 37)]),
+    10: (26, [(4, 43), (1, 44)]),
+}
+
+_ALIGNMENT = {
+    1: [], 2: [6, 18], 3: [6, 22], 4: [6, 26], 5: [6, 30], 6: [6, 34],
+    7: [6, 22, 38], 8: [6, 24, 42], 9: [6, 26, 46], 10: [6, 28, 50],
+}
+
+_REMAINDER_BITS = {1: 0, 2: 7, 3: 7, 4: 7, 5: 7, 6: 7, 7: 0, 8: 0, 9: 0, 10: 0}
+
+_EC_LEVEL_M_BITS = 0b00
+
+# GF(256) with the QR polynomial x^8 + x^4 + x^3 + x^2 + 1
+_EXP = [0] * 512
+_LOG = [0] * 256
+_x = 1
+for _i in range(255):
+    _EXP[_i] = _x
+    _LOG[_x] = _i
+    _x <<= 1
+    if _x & 0x100:
+        _x ^= 0x11D
+for _i in range(255, 512):
+    _EXP[_i] = _EXP[_i - 255]
+
+_MASKS = [
+    lambda r, c: (r + c) % 2 == 0,
+    lambda r, c: r % 2 == 0,
+    lambda r, c: c % 3 == 0,
+    lambda r, c: (r + c) % 3 == 0,
+    lambda r, c: (r // 2 + c // 3) % 2 == 0,
+    lambda r, c: (r * c) % 2 + (r * c) % 3 == 0,
+    lambda r, c: ((r * c) % 2 + (r * c) % 3) % 2 == 0,
+    lambda r, c: ((r + c) % 2 + (r * c) % 3) % 2 == 0,
+]
+
+
+def _gf_mul(a, b):
+    if a == 0 or b == 0:
+        return 0
+    return _EXP[_LOG[a] + _LOG[b]]
+
+
+def _rs_generator(degree):
+    poly = [1]
+    for i in range(degree):
+        nxt = [0] * (len(poly) + 1)
+        for j, coef in enumerate(poly):
+            nxt[j] ^= coef
+            nxt[j + 1] ^= _gf_mul(coef, _EXP[i])
+        poly = nxt
+    return poly
+
+
+def _rs_remainder(data, degree):
+    gen = _rs_generator(degree)
+    rem = list(data) + [0] * degree
+    for i in range(len(data)):
+        coef = rem[i]
+        if coef:
+            for j in range(1, len(gen)):
+                rem[i + j] ^= _gf_mul(gen[j], coef)
+    return rem[len(data):]
+
+
+def _capacity(version):
+    _, groups = _EC_M[version]
+    return sum(count * size for count, size in groups)
+
+
+def _pick_version(length):
+    for version in _EC_M:
+        count_bits = 8 if version < 10 else 16
+        if 4 + count_bits + 8 * length <= 8 * _capacity(version):
+            return version
+    raise ValueError('Data too long for a version 1-10 QR code')
+
+
+def _codewords(data, version):
+    count_bits = 8 if version < 10 else 16
+    bits = [0, 1, 0, 0]  # byte mode
+    bits += [(len(data) >> i) & 1 for i in reversed(range(count_bits))]
+    for byte in data:
+        bits += [(byte >> i) & 1 for i in reversed(range(8))]
+    capacity = 8 * _capacity(version)
+    bits += [0] * min(4, capacity - len(bits))
+    bits += [0] * (-len(bits) % 8)
+    words = [int(''.join(map(str, bits[i:i + 8])), 2) for i in range(0, len(bits), 8)]
+    pad = 0xEC
+    while len(words) < capacity // 8:
+        words.append(pad)
+        pad ^= 0xEC ^ 0x11
+
+    ec_len, groups = _EC_M[version]
+    blocks, ecs, pos = [], [], 0
+    for count, size in groups:
+        for _ in range(count):
+            block = words[pos:pos + size]
+            pos += size
+            blocks.append(block)
+            ecs.append(_rs_remainder(block, ec_len))
+
+    out = []
+    for i in range(max(len(b) for b in blocks)):
+        out += [b[i] for b in blocks if i < len(b)]
+    for i in range(ec_len):
+        out += [e[i] for e in ecs]
+    return out
+
+
+def _bch(value, poly, poly_bits):
+    rem = value << (poly_bits - 1)
+    for shift in reversed(range(rem.bit_length() - poly_bits + 1)):
+        if rem & (1 << (shift + poly_bits - 1)):
+            rem ^= poly << shift
+    return rem
+
+
+class _Matrix:
+
+    def __init__(self, version):
+        self.version = version
+        self.size = 17 + 4 * version
+        self.dark = [[False] * self.size for _ in range(self.size)]
+        self.reserved = [[False] * self.size for _ in range(self.size)]
+
+    def set(self, r, c, dark):
+        self.dark[r][c] = dark
+        self.reserved[r][c] = True
+
+    def draw_function_patterns(self):
+        n = self.size
+        for i in range(n):
+            self.set(6, i, i % 2 == 0)
+            self.set(i, 6, i % 2 == 0)
+        for r0, c0 in ((0, 0), (0, n - 7), (n - 7, 0)):
+            for dr in range(-1, 8):
+                for dc in range(-1, 8):
+                    r, c = r0 + dr, c0 + dc
+                    if 0 <= r < n and 0 <= c < n:
+                        ring = max(abs(dr - 3), abs(dc - 3))
+                        self.set(r, c, ring != 2 and ring != 4)
+        positions = _ALIGNMENT[self.version]
+        last = len(positions) - 1
+        for i, r in enumerate(positions):
+            for j, c in enumerate(positions):
+                # Skip the three corners occupied by finder patterns
+                if (i, j) in ((0, 0), (0, last), (last, 0)):
+                    continue
+                for dr in range(-2, 3):
+                    for dc in range(-2, 3):
+                        self.set(r + dr, c + dc, max(abs(dr), abs(dc)) != 1)
+        self.draw_format(0)  # reserve; real bits are written after masking
+        self.draw_version()
+
+    def draw_format(self, mask):
+        n = self.size
+        data = (_EC_LEVEL_M_BITS << 3) | mask
+        bits = ((data << 10) | _bch(data, 0x537, 11)) ^ 0x5412
+        bit = [(bits >> i) & 1 == 1 for i in range(15)]
+        for i in range(6):
+            self.set(i, 8, bit[i])
+        self.set(7, 8, bit[6])
+        self.set(8, 8, bit[7])
+        self.set(8, 7, bit[8])
+        for i in range(9, 15):
+            self.set(8, 14 - i, bit[i])
+        for i in range(8):
+            self.set(8, n - 1 - i, bit[i])
+        for i in range(8, 15):
+            self.set(n - 15 + i, 8, bit[i])
+        self.set(n - 8, 8, True)  # dark module
+
+    def draw_version(self):
+        if self.version < 7:
+            return
+        bits = (self.version << 12) | _bch(self.version, 0x1F25, 13)
+        for i in range(18):
+            dark = (bits >> i) & 1 == 1
+            a, b = self.size - 11 + i % 3, i // 3
+            self.set(a, b, dark)
+            self.set(b, a, dark)
+
+    def place_data(self, codewords):
+        n = self.size
+        bits = []
+        for word in codewords:
+            bits += [(word >> i) & 1 == 1 for i in reversed(range(8))]
+        bits += [False] * _REMAINDER_BITS[self.version]
+        i = 0
+        right = n - 1
+        while right >= 1:
+            if right == 6:
+                right = 5
+            for vert in range(n):
+                for j in range(2):
+                    c = right - j
+                    upward = ((right + 1) & 2) == 0
+                    r = n - 1 - vert if upward else vert
+                    if not self.reserved[r][c] and i < len(bits):
+                        self.dark[r][c] = bits[i]
+                        i += 1
+            right -= 2
+
+    def apply_mask(self, mask):
+        fn = _MASKS[mask]
+        for r in range(self.size):
+            row, reserved = self.dark[r], self.reserved[r]
+            for c in range(self.size):
+                if not reserved[c] and fn(r, c):
+                    row[c] = not row[c]
+
+    def penalty(self):
+        n, grid = self.size, self.dark
+        score = 0
+        lines = grid + [list(col) for col in zip(*grid)]
+        finder_like = ([True, False, True, True, True, False, True, False, False, False, False],
+                       [False, False, False, False, True, False, True, True, True, False, True])
+        for line in lines:
+            run_color, run_len = line[0], 1
+            for cell in line[1:]:
+                if cell == run_color:
+                    run_len += 1
+                else:
+                    if run_len >= 5:
+                        score += run_len - 2
+                    run_color, run_len = cell, 1
+            if run_len >= 5:
+                score += run_len - 2
+            for i in range(n - 10):
+                if line[i:i + 11] in finder_like:
+                    score += 40
+        for r in range(n - 1):
+            for c in range(n - 1):
+                v = grid[r][c]
+                if v == grid[r][c + 1] == grid[r + 1][c] == grid[r + 1][c + 1]:
+                    score += 3
+        dark = sum(sum(row) for row in grid)
+        score += 10 * (abs(dark * 20 - n * n * 10) // (n * n))
+        return score
+
+
+def encode(data):
+    """Encode ``data`` (str or bytes) and return the QR module matrix"""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    version = _pick_version(len(data))
+    codewords = _codewords(data, version)
+
+    best, best_score = None, None
+    for mask in range(8):
+        matrix = _Matrix(version)
+        matrix.draw_function_patterns()
+        matrix.place_data(codewords)
+        matrix.apply_mask(mask)
+        matrix.draw_format(mask)
+        score = matrix.penalty()
+        if best_score is None or score < best_score:
+            best, best_score = matrix, score
+    return best.dark
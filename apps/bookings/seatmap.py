@@ -0,0 +1,120 @@
+from array import array
+
+from apps.movies.models import Seat
+from .models import BookingItem, SeatHold
+
+
+class SeatMap:
+    """Compact per-showtime seat occupancy map.
+
+    Seats are laid out in (row, column) order and addressed by a slot index.
+    Occupancy is a bitset (one bit per slot), so membership checks and counts
+    never touch the database once the map is built. Seats held by other
+    customers are tracked in a second bitset and count as taken.
+    """
+
+    def __init__(self, seats, booked_seat_ids=(), held_seat_ids=()):
+        self.seats = list(seats)
+        self.rows = []
+        self._slot_by_id = {}
+        self._seat_ids = array('q')
+        self._bits = bytearray((len(self.seats) + 7) // 8)
+        self._held_bits = bytearray(len(self._bits))
+
+        row_index = {}
+        for slot, seat in enumerate(self.seats):
+            self._slot_by_id[seat.id] = slot
+            self._seat_ids.append(seat.id)
+            if seat.row not in row_index:
+                row_index[seat.row] = len(self.rows)
+                self.rows.append((seat.row, []))
+            self.rows[row_index[seat.row]][1].append(seat)
+
+        self._booked = 0
+        self._held = 0
+        for seat_id in booked_seat_ids:
+            self.mark(seat_id)
+        for seat_id in held_seat_ids:
+            self.hold(seat_id)
+
+    @classmethod
+    def for_showtime(cls, showtime, user=None):
+        """Build the map for a showtime with three queries (seats, booked, held).
+
+        Holds placed by ``user`` are left out so customers still see their
+        own reserved seats as selectable.
+        """
+        seats = Seat.objects.filter(theater_id=showtime.theater_id).only(
+            'id', 'row', 'column', 'seat_type', 'seat_number'
+        ).order_by('row', 'column')
+        booked = BookingItem.objects.filter(
+            showtime_id=showtime.id, active=True
+        ).values_list('seat_id', flat=True)
+        held = SeatHold.active().filter(showtime_id=showtime.id)
+        if user is not None and user.is_authenticated:
+            held = held.exclude(user=user)
+        return cls(seats, booked, held.values_list('seat_id', flat=True))
+
+    def __len__(self):
+        return len(self.seats)
+
+    @staticmethod
+    def _test(bits, slot):
+        return bits[slot >> 3] & (1 << (slot & 7))
+
+    @staticmethod
+    def _set(bits, slot):
+        bits[slot >> 3] |= 1 << (slot & 7)
+
+    def mark(self, seat_id):
+        """Mark a seat as sold; unknown seat ids are ignored"""
+        slot = self._slot_by_id.get(seat_id)
+        if slot is None or self._test(self._bits, slot):
+            return
+        self._set(self._bits, slot)
+        self._booked += 1
+        if self._test(self._held_bits, slot):
+            self._held -= 1
+
+    def hold(self, seat_id):
+        """Mark a seat as temporarily held; unknown seat ids are ignored"""
+        slot = self._slot_by_id.get(seat_id)
+        if slot is None or self._test(self._held_bits, slot):
+            return
+        self._set(self._held_bits, slot)
+        if not self._test(self._bits, slot):
+            self._held += 1
+
+    def is_booked(self, seat_id):
+        slot = self._slot_by_id.get(seat_id)
+        return slot is not None and bool(self._test(self._bits, slot))
+
+    def is_held(self, seat_id):
+        slot = self._slot_by_id.get(seat_id)
+        return slot is not None and bool(self._test(self._held_bits, slot))
+
+    def _ids(self, bits):
+        return [self._seat_ids[slot] for slot in range(len(self.seats)) if self._test(bits, slot)]
+
+    def booked_seat_ids(self):
+        return self._ids(self._bits)
+
+    def held_seat_ids(self):
+        return self._ids(self._held_bits)
+
+    @property
+    def booked_count(self):
+        return self._booked
+
+    @property
+    def available_count(self):
+        """Seats that are neither sold nor held"""
+        return len(self.seats) - self._booked - self._held
+
+    def seats_by_row(self):
+        """Rows of seats annotated with ``is_booked``/``is_held`` for templates"""
+        for _, seats in self.rows:
+            for seat in seats:
+                seat.is_booked = self.is_booked(seat.id)
+                seat.is_held = self.is_held(seat.id)
+        return self.rows
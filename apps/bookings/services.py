@@ -0,0 +1,261 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from apps.movies.models import Showtime, Seat
+from apps.movies.pricing import price_basket
+from cinema_project.metrics import BOOKINGS, BOOKED_SEATS
+from .live import publish_seats
+from .models import Booking, BookingItem, SeatHold
+from .stats import invalidate_user_stats
+from .tickets import parse_ticket_token
+
+
+class SeatsUnavailable(Exception):
+    """Raised when one or more requested seats cannot be booked"""
+
+
+class InvalidSeatSelection(SeatsUnavailable):
+    """Raised for seats that do not exist in the showtime's theater (not a conflict)"""
+
+
+class TicketRejected(Exception):
+    """Raised when a scanned ticket must not be let through the gate"""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+class CancellationRejected(Exception):
+    """Raised when a customer may not cancel a booking"""
+
+    def __init__(self, reason, message):
+        super().__init__(message)
+        self.reason = reason
+
+
+@transaction.atomic
+def commit_booking(user, showtime_id, seat_ids):
+    """Atomically book ``seat_ids`` for ``user`` and return the Booking.
+
+    The showtime row is locked with SELECT ... FOR UPDATE so concurrent
+    checkouts for the same showtime are serialized; the unique constraint
+    on active (showtime, seat) BookingItems backs this up on databases that do
+    not support row locks. On those (SQLite), the seat hold check is not
+    serialized either: a hold taken by another customer while this
+    transaction runs can be overtaken, though never double-sold.
+    """
+    showtime = Showtime.objects.select_for_update(of=('self',)).select_related('theater').get(id=showtime_id)
+    seat_ids = set(seat_ids)
+    seats = list(Seat.objects.filter(id__in=seat_ids, theater_id=showtime.theater_id))
+    if not seats or len(seats) != len(seat_ids):
+        raise InvalidSeatSelection('Invalid seat selection.')
+
+    if BookingItem.objects.filter(showtime_id=showtime.id, seat_id__in=seat_ids, active=True).exists():
+        raise SeatsUnavailable('One or more seats are no longer available. Please select again.')
+    holds = SeatHold.active().filter(showtime_id=showtime.id, seat_id__in=seat_ids).values_list('user_id', 'seat_id', 'price')
+    locked = {}
+    for holder_id, seat_id, price in holds:
+        if holder_id != user.id:
+            raise SeatsUnavailable('One or more seats are being held by another customer. Please select again.')
+        if price is not None:
+            locked[seat_id] = price
+
+    # Charge the prices quoted when the seats were held
+    basket = price_basket(showtime, seats, locked)
+    booking = Booking.objects.create(
+        user=user,
+        showtime=showtime,
+        status='confirmed',
+        total_price=basket.total,
+        number_of_seats=len(seats),
+    )
+    try:
+        with transaction.atomic():
+            BookingItem.objects.bulk_create([
+                BookingItem(booking=booking, showtime=showtime, seat=seat, price=price)
+                for seat, price in basket.lines
+            ])
+    except IntegrityError:
+        raise SeatsUnavailable('One or more seats are no longer available. Please select again.')
+
+    Showtime.objects.filter(id=showtime.id).update(
+        available_seats=F('available_seats') - len(seats), sales_updated_at=timezone.now()
+    )
+    # The seats are sold now; drop this customer's holds for the showtime
+    SeatHold.objects.filter(showtime_id=showtime.id, user=user).delete()
+    publish_seats(showtime.id, 'booked', seat_ids, user.id)
+    transaction.on_commit(lambda: (BOOKINGS.inc(), BOOKED_SEATS.inc(len(seats))))
+    return booking
+
+
+@transaction.atomic
+def hold_seats(user, showtime_id, seat_ids):
+    """Reserve ``seat_ids`` for ``user`` for SEAT_HOLD_MINUTES.
+
+    Replaces any previous holds the user had on the showtime and returns
+    the expiry time and the priced Basket; each hold keeps its quoted
+    price. Raises SeatsUnavailable if a seat is sold or held by someone
+    else.
+    """
+    showtime = Showtime.objects.select_for_update(of=('self',)).select_related('theater').get(id=showtime_id)
+    seat_ids = set(seat_ids)
+    seats = list(
+        Seat.objects.filter(id__in=seat_ids, theater_id=showtime.theater_id)
+        .only('id', 'row', 'column', 'seat_type').order_by('row', 'column')
+    )
+    if not seats or len(seats) != len(seat_ids):
+        raise InvalidSeatSelection('Invalid seat selection.')
+
+    if BookingItem.objects.filter(showtime_id=showtime.id, seat_id__in=seat_ids, active=True).exists():
+        raise SeatsUnavailable('One or more seats are no longer available. Please select again.')
+
+    now = timezone.now()
+    holds = SeatHold.objects.filter(showtime_id=showtime.id)
+    # Expired holds on these seats no longer count; clear them so the
+    # unique (showtime, seat) constraint does not trip over them.
+    holds.filter(seat_id__in=seat_ids, expires_at__lte=now).delete()
+    if holds.filter(seat_id__in=seat_ids).exclude(user=user).exists():
+        raise SeatsUnavailable('One or more seats are being held by another customer. Please select again.')
+    previous = set(holds.filter(user=user).values_list('seat_id', flat=True))
+    holds.filter(user=user).delete()
+
+    basket = price_basket(showtime, seats)
+    expires_at = now + timedelta(minutes=settings.SEAT_HOLD_MINUTES)
+    try:
+        with transaction.atomic():
+            SeatHold.objects.bulk_create([
+                SeatHold(showtime=showtime, seat=seat, user=user, expires_at=expires_at, price=price)
+                for seat, price in basket.lines
+            ])
+    except IntegrityError:
+        raise SeatsUnavailable('One or more seats are being held by another customer. Please select again.')
+    publish_seats(showtime.id, 'released', previous - seat_ids, user.id)
+    publish_seats(showtime.id, 'held', seat_ids, user.id, ttl=settings.SEAT_HOLD_MINUTES * 60)
+    return expires_at, basket
+
+
+def release_expired_holds():
+    """Delete every expired hold in one statement; returns the number removed"""
+    deleted, _ = SeatHold.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+def release_items(items):
+    """Deactivate booking items and return their seats to the showtime counters.
+
+    The items are kept (bookings still list what was sold) but no longer
+    hold their seats. Runs one SELECT of the freed seats, one UPDATE and
+    one F() update per affected showtime; items already released are
+    skipped. Must be called inside a transaction.
+    """
+    items = items.filter(active=True)
+    released = {}
+    for showtime_id, seat_id in items.values_list('showtime_id', 'seat_id').order_by():
+        released.setdefault(showtime_id, []).append(seat_id)
+    items.update(active=False)
+    for showtime_id, seat_ids in released.items():
+        Showtime.objects.filter(id=showtime_id).update(
+            available_seats=F('available_seats') + len(seat_ids), sales_updated_at=timezone.now()
+        )
+        publish_seats(showtime_id, 'released', seat_ids)
+    return sum(len(seat_ids) for seat_ids in released.values())
+
+
+@transaction.atomic
+def delete_bookings(bookings):
+    """Delete bookings, releasing their seats; returns the number of seats freed"""
+    rows = list(bookings.values_list('id', 'user_id'))
+    booking_ids = [booking_id for booking_id, _ in rows]
+    freed = release_items(BookingItem.objects.filter(booking_id__in=booking_ids))
+    Booking.objects.filter(id__in=booking_ids).delete()
+    invalidate_user_stats(*(user_id for _, user_id in rows))
+    return freed
+
+
+@transaction.atomic
+def cancel_bookings(bookings, reason='', refund=True):
+    """Cancel ``bookings`` in one pass and return (bookings cancelled, seats freed).
+
+    Their seats are released with release_items (one UPDATE plus one F()
+    counter update per showtime) and the bookings are marked cancelled
+    with a single UPDATE, so cancelling a whole showtime costs the same
+    handful of statements as cancelling one booking. Refunds are
+    recorded as the full booking total unless ``refund`` is False.
+    Already cancelled bookings are skipped.
+    """
+    rows = list(
+        bookings.exclude(status='cancelled').select_for_update().values_list('id', 'user_id').order_by('id')
+    )
+    if not rows:
+        return 0, 0
+    booking_ids = [booking_id for booking_id, _ in rows]
+    freed = release_items(BookingItem.objects.filter(booking_id__in=booking_ids))
+    Booking.objects.filter(id__in=booking_ids).update(
+        status='cancelled',
+        cancelled_at=timezone.now(),
+        refund_amount=F('total_price') if refund else Decimal('0.00'),
+        cancellation_reason=reason[:200],
+    )
+    invalidate_user_stats(*{user_id for _, user_id in rows})
+    return len(booking_ids), freed
+
+
+@transaction.atomic
+def cancel_booking_for_user(user, booking_id):
+    """Cancel one of ``user``'s bookings under the customer policy; returns the refund.
+
+    Raises CancellationRejected if the booking is not theirs or can no
+    longer be cancelled (see Booking.can_cancel).
+    """
+    booking = (
+        Booking.objects.select_for_update().select_related('showtime')
+        .filter(id=booking_id, user=user).first()
+    )
+    if booking is None:
+        raise CancellationRejected('not_found', 'Booking does not exist')
+    if booking.status == 'cancelled':
+        raise CancellationRejected('cancelled', 'Booking is already cancelled')
+    if not booking.can_cancel():
+        raise CancellationRejected(
+            'too_late',
+            'Bookings can only be cancelled until %d minutes before the show' % settings.BOOKING_CANCEL_CUTOFF_MINUTES,
+        )
+    cancel_bookings(Booking.objects.filter(id=booking.id), reason='Cancelled by customer')
+    return booking.total_price
+
+
+def check_in_ticket(token):
+    """Admit the holder of a scanned ticket ``token``; returns the booking id.
+
+    The signature and show date are checked in memory first. An admitted
+    ticket costs a single conditional UPDATE by primary key, which also
+    makes a second scan of the same ticket lose. Only rejected tickets
+    read the booking back to explain why.
+    """
+    parsed = parse_ticket_token(token)
+    if parsed is None:
+        raise TicketRejected('invalid', 'Ticket signature is not valid')
+    booking_id, show_date = parsed
+    if show_date != timezone.localdate():
+        raise TicketRejected('wrong_date', f'Ticket is for {show_date:%b %d, %Y}')
+
+    admitted = Booking.objects.filter(
+        id=booking_id, status='confirmed', checked_in_at__isnull=True
+    ).update(checked_in_at=timezone.now())
+    if admitted:
+        return booking_id
+
+    booking = Booking.objects.filter(id=booking_id).values('status', 'checked_in_at').first()
+    if booking is None:
+        raise TicketRejected('not_found', 'Booking does not exist')
+    if booking['status'] != 'confirmed':
+        raise TicketRejected(booking['status'], f"Booking is {booking['status']}")
+    raise TicketRejected(
+        'already_used', f"Ticket was already used at {timezone.localtime(booking['checked_in_at']):%H:%M}"
+    )
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from apps.movies.models import Showtime
+from .models import Booking
+from .stats import invalidate_user_stats
+
+
+@receiver(post_save, sender=Booking)
+def invalidate_dashboard_stats(sender, instance, **kwargs):
+    """A new or changed booking makes the owner's dashboard numbers stale"""
+    invalidate_user_stats(instance.user_id)
+
+
+@receiver(post_save, sender=Booking)
+def mark_sales_changed(sender, instance, created, **kwargs):
+    """A status change (e.g. cancellation) changes the showtime's sales figures.
+
+    New bookings are covered by the seat counter update in commit_booking.
+    """
+    if not created:
+        Showtime.objects.filter(pk=instance.showtime_id).update(sales_updated_at=timezone.now())
@@ -0,0 +1,71 @@
+"""Per-user booking statistics for the dashboard.
+
+Totals come from one aggregate query, favourite genres from one grouped
+query, plus the upcoming and recent booking lists. The result is cached
+per user for USER_STATS_CACHE_TIMEOUT seconds; saving a booking (see
+signals.py) or deleting one through the booking services drops the entry.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from cinema_project.metrics import CACHE_REQUESTS
+from .models import Booking
+
+
+def stats_cache_key(user_id):
+    return f'user-stats:{user_id}'
+
+
+def invalidate_user_stats(*user_ids):
+    """Drop cached stats for ``user_ids`` once the current transaction commits"""
+    keys = [stats_cache_key(user_id) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def compute_user_stats(user):
+    bookings = Booking.objects.filter(user_id=user.id)
+    active = ~Q(status='cancelled')
+    now = timezone.localtime()
+    upcoming = Q(showtime__show_date__gt=now.date()) | Q(
+        showtime__show_date=now.date(), showtime__show_time__gte=now.time()
+    )
+
+    stats = bookings.aggregate(
+        total_bookings=Count('id'),
+        total_tickets=Coalesce(Sum('number_of_seats', filter=active), 0),
+        total_spent=Coalesce(
+            Sum('total_price', filter=active), Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        ),
+        upcoming_count=Count('id', filter=active & upcoming),
+    )
+    stats['favourite_genres'] = list(
+        bookings.filter(active)
+        .values(genre=F('showtime__movie__genre'))
+        .annotate(tickets=Sum('number_of_seats'))
+        .order_by('-tickets', 'genre')[:3]
+    )
+    related = bookings.select_related('showtime__movie', 'showtime__theater')
+    stats['upcoming_bookings'] = list(
+        related.filter(active & upcoming).order_by('showtime__show_date', 'showtime__show_time')[:5]
+    )
+    stats['recent_bookings'] = list(related.order_by('-booking_date')[:5])
+    return stats
+
+
+def get_user_stats(user):
+    """Dashboard numbers for ``user``, from the cache when possible"""
+    key = stats_cache_key(user.id)
+    stats = cache.get(key)
+    CACHE_REQUESTS.inc(cache='user_stats', result='miss' if stats is None else 'hit')
+    if stats is None:
+        stats = compute_user_stats(user)
+        cache.set(key, stats, settings.USER_STATS_CACHE_TIMEOUT)
+    return stats
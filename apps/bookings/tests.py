@@ -0,0 +1,715 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+import json
+import os
+import random
+import runpy
+import tempfile
+import threading
+import unittest
+import zipfile
+
+from asgiref.sync import async_to_sync
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Count
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.movies.models import Showtime
+from apps.movies.scheduling import showtime_conflict
+from apps.movies.pricing import price_snapshot
+from apps.movies.tests import DEMAND_SETTINGS, WEB_SETTINGS, create_movie, create_theater, create_showtime
+from .admin import BookingAdmin
+from .live import check_worker_broker
+from .management.commands.bench_endpoints import DEFAULT_BUDGETS, load_fixtures, endpoint_requests
+from .management.commands.check_query_plans import SEQ_SCAN_PATTERNS, hot_queries
+from .models import Booking, BookingItem, SeatHold
+from .pagination import InvalidCursor, decode_cursor, encode_cursor
+from .seatmap import SeatMap
+from .services import SeatsUnavailable, cancel_bookings, commit_booking, hold_seats, release_expired_holds
+from . import tickets
+from .stats import compute_user_stats
+from .ticket_export import async_chunks, stream_tickets
+
+
+@override_settings(**WEB_SETTINGS)
+class SeatMapTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', password='pw')
+        cls.other = User.objects.create_user('other', password='pw')
+        cls.showtime = create_showtime(create_movie(), create_theater(rows='ABC', columns=4))
+        cls.seats = list(cls.showtime.theater.seats.order_by('row', 'column'))
+
+    def test_bits_track_sold_and_held_seats(self):
+        seat_map = SeatMap(self.seats, [self.seats[0].id, self.seats[5].id, 999999], [self.seats[1].id])
+        self.assertEqual((len(seat_map), seat_map.booked_count, seat_map.available_count), (12, 2, 9))
+        self.assertTrue(seat_map.is_booked(self.seats[5].id))
+        self.assertFalse(seat_map.is_booked(self.seats[1].id))
+        self.assertTrue(seat_map.is_held(self.seats[1].id))
+        # Selling a held seat moves it from held to sold; marking twice changes nothing
+        seat_map.mark(self.seats[1].id)
+        seat_map.mark(self.seats[1].id)
+        self.assertEqual((seat_map.booked_count, seat_map.available_count), (3, 9))
+        self.assertEqual(seat_map.booked_seat_ids(), [self.seats[n].id for n in (0, 1, 5)])
+        rows = seat_map.seats_by_row()
+        self.assertEqual([row for row, _ in rows], ['A', 'B', 'C'])
+        self.assertTrue(rows[0][1][0].is_booked)
+
+    def test_built_from_the_database_in_three_queries(self):
+        commit_booking(self.other, self.showtime.id, [self.seats[0].id])
+        hold_seats(self.other, self.showtime.id, [self.seats[1].id])
+        hold_seats(self.user, self.showtime.id, [self.seats[2].id])
+        with self.assertNumQueries(3):
+            seat_map = SeatMap.for_showtime(self.showtime, user=self.user)
+        # The customer's own hold stays selectable for them
+        self.assertEqual(seat_map.held_seat_ids(), [self.seats[1].id])
+        self.assertEqual(seat_map.available_count, 10)
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('seat_availability', args=[self.showtime.id]))
+        self.assertEqual(response.json(), {
+            'available_seats': 10, 'booked_seats': [self.seats[0].id], 'held_seats': [self.seats[1].id],
+        })
+
+
+class SeatHoldExpiryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('holder', password='pw')
+        cls.other = User.objects.create_user('other', password='pw')
+        cls.showtime = create_showtime(create_movie(), create_theater(rows='AB', columns=5))
+        cls.seats = list(cls.showtime.theater.seats.order_by('id').values_list('id', flat=True))
+
+    def expire(self, user):
+        SeatHold.objects.filter(user=user).update(expires_at=timezone.now() - timedelta(seconds=1))
+
+    def test_live_holds_block_other_customers(self):
+        hold_seats(self.user, self.showtime.id, self.seats[:2])
+        with self.assertRaises(SeatsUnavailable):
+            hold_seats(self.other, self.showtime.id, self.seats[1:3])
+        with self.assertRaises(SeatsUnavailable):
+            commit_booking(self.other, self.showtime.id, self.seats[:1])
+        # The holder can still buy them
+        commit_booking(self.user, self.showtime.id, self.seats[:2])
+
+    def test_expired_holds_stop_blocking(self):
+        hold_seats(self.user, self.showtime.id, self.seats[:2])
+        self.expire(self.user)
+        self.assertEqual(SeatMap.for_showtime(self.showtime, self.other).held_seat_ids(), [])
+        hold_seats(self.other, self.showtime.id, self.seats[1:3])
+        self.assertEqual(
+            sorted(SeatHold.objects.filter(user=self.other).values_list('seat_id', flat=True)), self.seats[1:3]
+        )
+        commit_booking(self.other, self.showtime.id, self.seats[:1])
+
+    def test_expired_holds_are_deleted_and_live_ones_kept(self):
+        hold_seats(self.user, self.showtime.id, self.seats[:2])
+        self.expire(self.user)
+        hold_seats(self.other, self.showtime.id, self.seats[5:7])
+        self.assertEqual(release_expired_holds(), 2)
+        self.assertEqual(list(SeatHold.objects.values_list('user_id', flat=True).distinct()), [self.other.id])
+
+        self.expire(self.other)
+        out = StringIO()
+        call_command('expire_seat_holds', stdout=out)
+        self.assertIn('Released 2 expired seat hold(s)', out.getvalue())
+        self.assertFalse(SeatHold.objects.exists())
+
+
+@override_settings(**DEMAND_SETTINGS)
+class HeldPriceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('holder', password='pw')
+        cls.other = User.objects.create_user('other', password='pw')
+        cls.showtime = create_showtime(create_movie(), create_theater(rows='AB', columns=5), price='200.00')
+        cls.seats = list(cls.showtime.theater.seats.order_by('id').values_list('id', flat=True))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_price_quoted_at_hold_time_is_charged(self):
+        hold_seats(self.user, self.showtime.id, self.seats[:2])
+        self.assertEqual(
+            list(SeatHold.objects.filter(user=self.user).values_list('price', flat=True)), [Decimal('200.00')] * 2
+        )
+        # Half the house sells and the snapshot is repriced before checkout
+        commit_booking(self.other, self.showtime.id, self.seats[2:7])
+        cache.clear()
+        showtime = Showtime.objects.select_related('theater').get(id=self.showtime.id)
+        self.assertEqual(price_snapshot(showtime).price('standard'), Decimal('220.00'))
+
+        booking = commit_booking(self.user, self.showtime.id, self.seats[:2])
+        self.assertEqual(booking.total_price, Decimal('400.00'))
+        self.assertEqual(list(booking.items.values_list('price', flat=True)), [Decimal('200.00')] * 2)
+
+
+class ReconcileSeatCountsTests(TestCase):
+
+    def test_repairs_counters_only_outside_dry_run(self):
+        user = User.objects.create_user('buyer')
+        showtime = create_showtime(create_movie(), create_theater(rows='A', columns=10))
+        seats = list(showtime.theater.seats.values_list('id', flat=True))
+        commit_booking(user, showtime.id, seats[:2])
+        # Cancelled without releasing its seat, then a drifted counter
+        stranded = commit_booking(user, showtime.id, seats[2:3])
+        Booking.objects.filter(id=stranded.id).update(status='cancelled')
+        Showtime.objects.filter(id=showtime.id).update(available_seats=3)
+
+        out = StringIO()
+        call_command('reconcile_seat_counts', dry_run=True, stdout=out)
+        self.assertIn('Found 1 seat(s) held by cancelled bookings', out.getvalue())
+        self.assertIn('Found 1 drifted showtime counter(s)', out.getvalue())
+        showtime.refresh_from_db()
+        self.assertEqual(showtime.available_seats, 3)
+        self.assertTrue(stranded.items.get().active)
+
+        out = StringIO()
+        call_command('reconcile_seat_counts', stdout=out)
+        self.assertIn('Released 1 seat(s) held by cancelled bookings', out.getvalue())
+        self.assertIn('Repaired 1 drifted showtime counter(s)', out.getvalue())
+        showtime.refresh_from_db()
+        self.assertEqual(showtime.available_seats, 8)
+        self.assertFalse(stranded.items.get().active)
+
+        out = StringIO()
+        call_command('reconcile_seat_counts', stdout=out)
+        self.assertIn('Repaired 0 drifted showtime counter(s)', out.getvalue())
+
+
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Racing checkouts never sell a seat twice (see also manage.py stress_booking)"""
+
+    def test_no_double_bookings_under_concurrent_checkouts(self):
+        showtime = create_showtime(create_movie(), create_theater(rows='ABCD', columns=5))
+        seat_ids = list(showtime.theater.seats.values_list('id', flat=True))
+        users = [User.objects.create_user(f'racer{n}') for n in range(6)]
+        committed = []
+        start = threading.Barrier(len(users))
+
+        def worker(n):
+            rng = random.Random(n)
+            try:
+                start.wait()
+                for _ in range(10):
+                    basket = rng.sample(seat_ids, 3)
+                    # SQLite reports contention as "table is locked"; try again
+                    for _ in range(20):
+                        try:
+                            committed.append(commit_booking(users[n], showtime.id, basket).id)
+                        except SeatsUnavailable:
+                            pass
+                        except OperationalError:
+                            continue
+                        break
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(len(users))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertTrue(committed)
+        items = BookingItem.objects.filter(showtime=showtime, active=True)
+        doubles = items.values('seat_id').annotate(n=Count('id')).filter(n__gt=1)
+        self.assertFalse(doubles.exists())
+        self.assertEqual(items.count(), 3 * len(committed))
+        showtime.refresh_from_db()
+        self.assertEqual(showtime.available_seats, len(seat_ids) - items.count())
+
+
+class DoubleBookingMigrationTests(TransactionTestCase):
+    """0002 resolves seats sold twice before adding the unique constraint"""
+
+    migrate_from = [('bookings', '0001_initial'), ('movies', '0001_initial')]
+    migrate_to = [('bookings', '0002_bookingitem_unique_showtime_seat'), ('movies', '0001_initial')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+        super().tearDown()
+
+    def test_duplicates_are_dropped_and_totals_recomputed(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        apps = executor.loader.project_state(self.migrate_from).apps
+        Booking = apps.get_model('bookings', 'Booking')
+        BookingItem = apps.get_model('bookings', 'BookingItem')
+        Showtime = apps.get_model('movies', 'Showtime')
+        Seat = apps.get_model('movies', 'Seat')
+        user = apps.get_model('auth', 'User').objects.create(username='old')
+        theater = apps.get_model('movies', 'Theater').objects.create(name='Old', location='-', total_seats=3)
+        movie = apps.get_model('movies', 'Movie').objects.create(
+            title='Old', description='-', genre='-', director='-', duration=90, release_date='2024-01-01',
+        )
+        showtime = Showtime.objects.create(
+            movie=movie, theater=theater, show_date='2024-01-02', show_time='19:00',
+            ticket_price='100.00', available_seats=0,
+        )
+        a, b, c = [Seat.objects.create(theater=theater, row='A', column=n, seat_number=f'A{n}') for n in (1, 2, 3)]
+
+        def book(status, *seats):
+            booking = Booking.objects.create(
+                user=user, showtime=showtime, status=status,
+                total_price=100 * len(seats), number_of_seats=len(seats),
+            )
+            for seat in seats:
+                BookingItem.objects.create(booking=booking, showtime=showtime, seat=seat, price='100.00')
+            return booking
+
+        # The cancelled sale came first, but the confirmed ones keep the seats
+        cancelled = book('cancelled', a)
+        first = book('confirmed', a, b)
+        second = book('confirmed', b, c)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+        apps = executor.loader.project_state(self.migrate_to).apps
+        Booking = apps.get_model('bookings', 'Booking')
+        BookingItem = apps.get_model('bookings', 'BookingItem')
+        seats = {
+            booking_id: sorted(BookingItem.objects.filter(booking_id=booking_id).values_list('seat_id', flat=True))
+            for booking_id in (cancelled.id, first.id, second.id)
+        }
+        self.assertEqual(seats, {cancelled.id: [], first.id: [a.id, b.id], second.id: [c.id]})
+        totals = dict(Booking.objects.values_list('id', 'number_of_seats'))
+        self.assertEqual(totals, {cancelled.id: 0, first.id: 2, second.id: 1})
+        self.assertEqual(str(Booking.objects.get(id=second.id).total_price), '100.00')
+        self.assertEqual(Booking.objects.get(id=cancelled.id).status, 'cancelled')
+        self.assertEqual(apps.get_model('movies', 'Showtime').objects.get(id=showtime.id).available_seats, 0)
+
+
+@override_settings(**WEB_SETTINGS)
+class CheckoutQueryTests(TestCase):
+    """The seat map and checkout run a fixed number of queries however big the theater is"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', password='pw')
+        cls.other = User.objects.create_user('other', password='pw')
+        cls.movie = create_movie()
+        cls.small = create_showtime(cls.movie, create_theater('Small', rows='AB', columns=5))
+        cls.large = create_showtime(cls.movie, create_theater('Large', rows='ABCDEFGHIJ', columns=20), days=2)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def seat_ids(self, showtime, count, offset=0):
+        return list(showtime.theater.seats.order_by('id').values_list('id', flat=True)[offset:offset + count])
+
+    def test_seat_selection(self):
+        for showtime in (self.small, self.large):
+            # Someone else's sale and hold show up on the map without extra queries
+            commit_booking(self.other, showtime.id, self.seat_ids(showtime, 2))
+            self.client.force_login(self.other)
+            self.client.post(reverse('reserve_seats', args=[showtime.id]), {'seats': self.seat_ids(showtime, 2, 2)})
+            self.client.force_login(self.user)
+            cache.clear()
+            # session, user, showtime, seats, sold seats, holds
+            with self.assertNumQueries(6):
+                response = self.client.get(reverse('seat_selection', args=[showtime.id]))
+            self.assertEqual(response.status_code, 200)
+
+    def test_checkout_get_only_reads_holds(self):
+        url = reverse('checkout', args=[self.large.id])
+        self.client.post(reverse('reserve_seats', args=[self.large.id]), {'seats': self.seat_ids(self.large, 6)})
+        # session, user, showtime, holds with their seats
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertContains(response, 'Confirm Booking')
+        self.assertEqual(SeatHold.objects.filter(user=self.user).count(), 6)
+
+        # A GET with a seat list does not take holds
+        SeatHold.objects.all().delete()
+        response = self.client.get(url, {'seats': self.seat_ids(self.large, 2)})
+        self.assertRedirects(response, reverse('seat_selection', args=[self.large.id]), fetch_redirect_response=False)
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_checkout_post(self):
+        for showtime, count in ((self.small, 2), (self.large, 8)):
+            seats = self.seat_ids(showtime, count)
+            self.client.post(reverse('reserve_seats', args=[showtime.id]), {'seats': seats})
+            with self.assertNumQueries(15):
+                response = self.client.post(
+                    reverse('checkout', args=[showtime.id]), {'seat_ids': ','.join(map(str, seats))}
+                )
+            booking = Booking.objects.get(user=self.user, showtime=showtime)
+            self.assertRedirects(response, reverse('booking_confirmation', args=[booking.id]),
+                                 fetch_redirect_response=False)
+            self.assertEqual(booking.items.count(), count)
+
+
+@override_settings(**WEB_SETTINGS)
+class DashboardStatsTests(TestCase):
+    """Dashboard numbers come from a fixed number of queries and are cached until a booking changes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('fan', password='pw')
+        theater = create_theater(rows='ABCD', columns=10)
+        cls.showtimes = [
+            create_showtime(create_movie(f'Movie {n}', genre=genre), theater, days=n + 1, price='99.99')
+            for n, genre in enumerate(['Drama', 'Drama', 'Comedy'])
+        ]
+        cls.seats = list(theater.seats.order_by('id').values_list('id', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def book(self, showtime, count, offset=0):
+        with self.captureOnCommitCallbacks(execute=True):
+            return commit_booking(self.user, showtime.id, self.seats[offset:offset + count])
+
+    def test_compute_user_stats_query_count(self):
+        self.book(self.showtimes[0], 1)
+        # totals, genres, upcoming and recent bookings
+        with self.assertNumQueries(4):
+            compute_user_stats(self.user)
+        for n, showtime in enumerate(self.showtimes):
+            self.book(showtime, 3, offset=5 + n * 3)
+        with self.assertNumQueries(4):
+            stats = compute_user_stats(self.user)
+        self.assertEqual(stats['total_bookings'], 4)
+        self.assertEqual(stats['total_tickets'], 10)
+        self.assertEqual(stats['total_spent'], Decimal('999.90'))
+        self.assertEqual(stats['favourite_genres'][0], {'genre': 'Drama', 'tickets': 7})
+
+    def test_dashboard_is_cached_until_a_booking_changes(self):
+        self.book(self.showtimes[0], 2)
+        url = reverse('dashboard')
+        # session, user, then the four stats queries
+        with self.assertNumQueries(6):
+            self.client.get(url)
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(response.context['total_tickets'], 2)
+
+        self.book(self.showtimes[1], 1, offset=2)
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertEqual(response.context['total_tickets'], 3)
+
+
+class CancellationTests(TestCase):
+    """Cancelled bookings keep their items, but the seats can be sold again"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', password='pw')
+        cls.showtime = create_showtime(create_movie(), create_theater(rows='AB', columns=5))
+        cls.seats = list(cls.showtime.theater.seats.order_by('id').values_list('id', flat=True)[:2])
+
+    def test_cancelled_seats_can_be_resold(self):
+        booking = commit_booking(self.user, self.showtime.id, self.seats)
+        self.assertEqual(cancel_bookings(Booking.objects.filter(id=booking.id)), (1, 2))
+        self.assertEqual(booking.items.count(), 2)
+        self.assertFalse(booking.items.filter(active=True).exists())
+
+        resold = commit_booking(self.user, self.showtime.id, self.seats)
+        self.assertEqual(BookingItem.objects.filter(showtime=self.showtime, active=True).count(), 2)
+        self.assertEqual(resold.items.count(), 2)
+        self.showtime.refresh_from_db()
+        self.assertEqual(self.showtime.available_seats, self.showtime.get_available_seats())
+        # Cancelling twice frees nothing more
+        self.assertEqual(cancel_bookings(Booking.objects.filter(id=booking.id)), (0, 0))
+
+    def test_cancelled_status_is_read_only_in_admin(self):
+        booking = commit_booking(self.user, self.showtime.id, self.seats)
+        admin = BookingAdmin(Booking, site)
+        request = RequestFactory().get('/')
+        self.assertNotIn('status', admin.get_readonly_fields(request, booking))
+        cancel_bookings(Booking.objects.filter(id=booking.id))
+        booking.refresh_from_db()
+        self.assertIn('status', admin.get_readonly_fields(request, booking))
+
+
+@unittest.skipIf(tickets.Image is None, 'Pillow is required to render tickets')
+@override_settings(**WEB_SETTINGS)
+class TicketDownloadTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', password='pw')
+        cls.showtime = create_showtime(create_movie(), create_theater(rows='AB', columns=5))
+        cls.seats = list(cls.showtime.theater.seats.order_by('id').values_list('id', flat=True)[:2])
+
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.client.force_login(self.user)
+        self.booking = commit_booking(self.user, self.showtime.id, self.seats)
+        self.url = reverse('download_ticket', args=[self.booking.id])
+
+    def test_matching_etag_gets_304_without_rendering(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content)[:8], b'\x89PNG\r\n\x1a\n')
+        etag = response['ETag']
+
+        with mock.patch.object(tickets, 'get_or_render_ticket') as render:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        render.assert_not_called()
+
+    def test_changed_booking_gets_a_new_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        Booking.objects.filter(id=self.booking.id).update(total_price=Decimal('1.00'))
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        response.close()
+
+
+@unittest.skipIf(tickets.Image is None, 'Pillow is required to render tickets')
+class TicketExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('buyer', password='pw')
+        showtime = create_showtime(create_movie(), create_theater(rows='AB', columns=5))
+        seats = list(showtime.theater.seats.order_by('id').values_list('id', flat=True))
+        cls.bookings = [commit_booking(user, showtime.id, seats[n:n + 2]) for n in (0, 2, 4)]
+
+    def export(self, fmt):
+        return b''.join(stream_tickets(Booking.objects.all(), fmt, workers=1))
+
+    def test_zip_has_one_png_per_booking(self):
+        with zipfile.ZipFile(BytesIO(self.export('zip'))) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(archive.namelist(), [f'ticket-{booking.id}.png' for booking in self.bookings])
+            for name in archive.namelist():
+                self.assertTrue(archive.read(name).startswith(b'\x89PNG'))
+
+    def test_pdf_has_one_page_per_booking(self):
+        pdf = self.export('pdf')
+        self.assertTrue(pdf.startswith(b'%PDF-1.4'))
+        self.assertTrue(pdf.endswith(b'%%EOF\n'))
+        self.assertIn(b'/Count 3', pdf)
+        self.assertEqual(pdf.count(b'/Type /Page '), 3)
+        # startxref points at the cross-reference table
+        xref = int(pdf.rsplit(b'startxref\n', 1)[1].split(b'\n')[0])
+        self.assertTrue(pdf[xref:].startswith(b'xref\n'))
+
+
+@override_settings(GATE_SCAN_KEY='gate-secret', **WEB_SETTINGS)
+class GateScanTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('buyer', password='pw')
+        showtime = create_showtime(create_movie(), create_theater(rows='AB', columns=5))
+        seats = list(showtime.theater.seats.order_by('id').values_list('id', flat=True))
+        cls.booking = commit_booking(user, showtime.id, seats[:2])
+        cls.other = commit_booking(user, showtime.id, seats[2:4])
+        Showtime.objects.filter(id=showtime.id).update(show_date=timezone.localdate())
+        cls.token = tickets.ticket_token(cls.booking.id, timezone.localdate())
+
+    def scan(self, token, key='gate-secret'):
+        headers = {} if key is None else {'HTTP_X_GATE_KEY': key}
+        return self.client.post(reverse('gate_scan'), {'token': token}, **headers)
+
+    def assertRejected(self, response, status, reason):
+        self.assertEqual(response.status_code, status)
+        self.assertEqual(response.json()['reason'], reason)
+
+    def test_valid_ticket_is_admitted_once(self):
+        response = self.scan(self.token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'valid': True, 'booking_id': self.booking.id})
+        self.booking.refresh_from_db()
+        self.assertIsNotNone(self.booking.checked_in_at)
+
+        self.assertRejected(self.scan(self.token), 409, 'already_used')
+
+    def test_forged_and_tampered_tokens_are_rejected(self):
+        prefix, _, show_date, signature = self.token.split('-', 3)
+        # Another booking's id under this ticket's signature
+        self.assertRejected(self.scan(f'{prefix}-{self.other.id}-{show_date}-{signature}'), 409, 'invalid')
+        self.assertRejected(self.scan(f'{prefix}-{self.booking.id}-{show_date}-AAAAAAAAAAAAAAAA'), 409, 'invalid')
+        self.assertRejected(self.scan('not a ticket'), 409, 'invalid')
+        tomorrow = tickets.ticket_token(self.booking.id, timezone.localdate() + timedelta(days=1))
+        self.assertRejected(self.scan(tomorrow), 409, 'wrong_date')
+        self.assertFalse(Booking.objects.filter(checked_in_at__isnull=False).exists())
+
+    def test_scanner_key_is_required(self):
+        self.assertRejected(self.scan(self.token, key=None), 403, 'forbidden')
+        self.assertRejected(self.scan(self.token, key='wrong'), 403, 'forbidden')
+        with override_settings(GATE_SCAN_KEY=''):
+            self.assertRejected(self.scan(self.token, key=''), 403, 'forbidden')
+        self.assertFalse(Booking.objects.filter(checked_in_at__isnull=False).exists())
+
+
+@override_settings(**WEB_SETTINGS)
+class BookingHistoryPaginationTests(TestCase):
+    """Keyset pages over (booking_date, id), including runs of equal dates"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', password='pw')
+        showtime = create_showtime(create_movie(), create_theater(rows='AB', columns=5))
+        seats = list(showtime.theater.seats.order_by('id').values_list('id', flat=True))
+        bookings = [commit_booking(cls.user, showtime.id, [seat]) for seat in seats[:7]]
+        moment = timezone.now().replace(microsecond=0)
+        Booking.objects.filter(id__in=[b.id for b in bookings[1:6]]).update(booking_date=moment)
+        Booking.objects.filter(id=bookings[0].id).update(booking_date=moment + timedelta(hours=1))
+        Booking.objects.filter(id=bookings[6].id).update(booking_date=moment - timedelta(hours=1))
+        cls.newest_first = list(
+            Booking.objects.order_by('-booking_date', '-id').values_list('id', flat=True)
+        )
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def api(self, **params):
+        return self.client.get(reverse('booking_history_api'), params)
+
+    def test_cursor_round_trip(self):
+        booking = Booking.objects.get(id=self.newest_first[3])
+        cursor = encode_cursor(booking)
+        self.assertNotIn('=', cursor)
+        self.assertEqual(decode_cursor(cursor), (booking.booking_date, booking.id))
+        for bad in ('', 'not a cursor', encode_cursor(booking)[:-4], 'eHx5'):
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(bad)
+
+    def test_pages_cover_equal_dates_without_gaps_or_repeats(self):
+        seen, cursors = [], []
+        response = self.api(per_page=2)
+        while True:
+            data = response.json()
+            seen.extend(row['id'] for row in data['results'])
+            if not data['next']:
+                break
+            cursors.append(data['next'])
+            response = self.api(per_page=2, after=data['next'])
+        self.assertEqual(seen, self.newest_first)
+        self.assertEqual(len(cursors), 3)
+
+        # Walking back from the last page reaches the first one again
+        back = []
+        previous = data['previous']
+        while previous:
+            data = self.api(per_page=2, before=previous).json()
+            back = [row['id'] for row in data['results']] + back
+            previous = data['previous']
+        self.assertEqual(back, self.newest_first[:6])
+
+    def test_invalid_cursors_are_rejected(self):
+        for params in ({'after': 'garbage!'}, {'before': 'eHx5'}, {'per_page': 'ten'}):
+            self.assertEqual(self.api(**params).status_code, 400)
+        response = self.client.get(reverse('booking_history'), {'after': 'garbage!'})
+        self.assertRedirects(response, reverse('booking_history'), fetch_redirect_response=False)
+        self.assertEqual(self.client.get(reverse('booking_history')).status_code, 200)
+
+
+class QueryPlanTests(TestCase):
+    """Every hot query shape is served by an index (see check_query_plans)"""
+
+    def test_hot_queries_use_indexes(self):
+        pattern = SEQ_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            self.skipTest('No query plan check for %s' % connection.vendor)
+        if connection.vendor == 'postgresql':
+            # Empty test tables make seq scans cheapest; only ask whether an index path exists
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+        for label, queryset in hot_queries().items():
+            with self.subTest(query=label):
+                plan = queryset.explain()
+                self.assertIsNone(pattern.search(plan), plan)
+
+
+@override_settings(**WEB_SETTINGS)
+class EndpointQueryBudgetTests(TestCase):
+    """The query budgets in benchmarks/budgets.json, checked on every test run.
+
+    Latency and memory budgets depend on the machine and stay with
+    ``manage.py bench_endpoints``; query counts do not.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('generate_load_data', theaters=1, rows=6, seats_per_row=10, movies=3, days=3,
+                     users=20, seed=1, stdout=StringIO())
+        cls.budgets = json.loads(DEFAULT_BUDGETS.read_text())
+
+    def test_endpoints_within_query_budgets(self):
+        for name, request in endpoint_requests(*load_fixtures()).items():
+            with self.subTest(endpoint=name):
+                self.assertIn(name, self.budgets)
+                cache.clear()
+                with CaptureQueriesContext(connection) as ctx:
+                    response = request()
+                self.assertLess(response.status_code, 400)
+                self.assertLessEqual(len(ctx.captured_queries), self.budgets[name]['queries'])
+
+    def test_generated_showtimes_do_not_overlap(self):
+        showtimes = Showtime.objects.select_related('movie', 'theater')
+        self.assertTrue(showtimes.exists())
+        for showtime in showtimes:
+            self.assertIsNone(showtime_conflict(showtime), showtime)
+
+
+class ServingTests(SimpleTestCase):
+
+    def test_several_workers_need_the_redis_broker(self):
+        with override_settings(SEAT_EVENTS_BROKER='local'):
+            check_worker_broker(1)
+            with self.assertRaises(ImproperlyConfigured):
+                check_worker_broker(3)
+        with override_settings(SEAT_EVENTS_BROKER='redis'):
+            check_worker_broker(3)
+
+    def test_gunicorn_runs_one_worker_without_redis(self):
+        conf = Path(__file__).resolve().parents[2] / 'gunicorn.conf.py'
+        with mock.patch.dict(os.environ, {'WEB_CONCURRENCY': '4'}):
+            os.environ.pop('SEAT_EVENTS_BROKER', None)
+            self.assertEqual(runpy.run_path(str(conf))['workers'], 1)
+            os.environ['SEAT_EVENTS_BROKER'] = 'redis'
+            self.assertEqual(runpy.run_path(str(conf))['workers'], 4)
+
+    def test_async_chunks_are_pulled_one_at_a_time(self):
+        produced = []
+        closed = []
+
+        def chunks():
+            try:
+                for n in range(3):
+                    produced.append(n)
+                    yield b'%d' % n
+            finally:
+                closed.append(True)
+
+        async def read_first():
+            stream = async_chunks(chunks())
+            first = await stream.__anext__()
+            pulled = list(produced)
+            await stream.aclose()
+            return first, pulled
+
+        first, pulled = async_to_sync(read_first)()
+        self.assertEqual((first, pulled), (b'0', [0]))
+        # A client that goes away closes the blocking generator too
+        self.assertEqual(closed, [True])
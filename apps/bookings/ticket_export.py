@@ -0,0 +1,175 @@
+"""Bulk ticket export for group and corporate bookings.
+
+Tickets are drawn in a ProcessPoolExecutor with the same layout code as
+``download_ticket`` (see tickets.py) and written out as they complete,
+either as a ZIP of PNGs or as a multipage PDF. At most a few pages per
+worker are in flight, so memory stays flat however many bookings are
+exported. Under ASGI the response must be given ``async_chunks``: Django
+4.2 reads a plain iterator into a list before sending any of it there.
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import os
+import zipfile
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Prefetch
+
+from cinema_project.metrics import TICKET_RENDERS
+from .models import BookingItem
+from .tickets import ticket_fields, encode_ticket, WIDTH, HEIGHT
+
+FORMATS = ('zip', 'pdf')
+
+
+def _ticket_jobs(bookings, image_format):
+    bookings = bookings.select_related(
+        'showtime__movie', 'showtime__theater'
+    ).prefetch_related(
+        Prefetch('items', queryset=BookingItem.objects.select_related('seat').order_by('seat__row', 'seat__column'))
+    ).order_by('id')
+    for booking in bookings.iterator(chunk_size=200):
+        seats = [item.seat for item in booking.items.all()]
+        yield booking.id, (ticket_fields(booking, seats), image_format)
+
+
+def _render_parallel(jobs, workers):
+    """Yield ``(booking_id, bytes)`` in job order with a bounded window.
+
+    Workers only run ``tickets.encode_ticket`` on plain dicts, which needs
+    Pillow but not Django, so any multiprocessing start method works.
+    """
+    workers = workers or getattr(settings, 'TICKET_EXPORT_WORKERS', None) or os.cpu_count() or 1
+    window = workers * 4
+    rendered = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for booking_id, job in jobs:
+                pending.append((booking_id, pool.submit(encode_ticket, *job)))
+                if len(pending) >= window:
+                    booking_id, future = pending.popleft()
+                    yield booking_id, future.result()
+                    rendered += 1
+            while pending:
+                booking_id, future = pending.popleft()
+                yield booking_id, future.result()
+                rendered += 1
+    finally:
+        if rendered:
+            TICKET_RENDERS.inc(rendered, source='export')
+
+
+class _ChunkBuffer:
+    """Write-only file object that hands written bytes to a generator"""
+
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(bookings, workers=None):
+    """Yield a ZIP archive of ticket PNGs chunk by chunk"""
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for booking_id, png in _render_parallel(_ticket_jobs(bookings, 'PNG'), workers):
+            archive.writestr(f'ticket-{booking_id}.png', png)
+            yield buffer.drain()
+    yield buffer.drain()
+
+
+def stream_pdf(bookings, workers=None):
+    """Yield a multipage PDF (one JPEG page per ticket) chunk by chunk.
+
+    Pillow's PDF writer keeps every page in memory, so pages are written
+    with a minimal incremental writer instead. Object 1 is the catalog and
+    object 2 the page tree, which is emitted last once all kids are known.
+    """
+    offsets = {}
+    position = 0
+    page_ids = []
+    next_id = 3
+
+    def emit(obj_id, body):
+        nonlocal position
+        offsets[obj_id] = position
+        data = b'%d 0 obj\n' % obj_id + body + b'\nendobj\n'
+        position += len(data)
+        return data
+
+    header = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+    position = len(header)
+    yield header
+    yield emit(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+
+    for _, jpeg in _render_parallel(_ticket_jobs(bookings, 'JPEG'), workers):
+        image_id, content_id, page_id = next_id, next_id + 1, next_id + 2
+        next_id += 3
+        image = (
+            b'<< /Type /XObject /Subtype /Image /Width %d /Height %d '
+            b'/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode /Length %d >>\nstream\n'
+            % (WIDTH, HEIGHT, len(jpeg)) + jpeg + b'\nendstream'
+        )
+        content = b'q %d 0 0 %d 0 0 cm /Im0 Do Q' % (WIDTH, HEIGHT)
+        yield emit(image_id, image)
+        yield emit(content_id, b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream')
+        yield emit(page_id, (
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /XObject << /Im0 %d 0 R >> >> /Contents %d 0 R >>'
+            % (WIDTH, HEIGHT, image_id, content_id)
+        ))
+        page_ids.append(page_id)
+
+    kids = b' '.join(b'%d 0 R' % pid for pid in page_ids)
+    yield emit(2, b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, len(page_ids)))
+
+    xref = [b'xref\n0 %d\n' % next_id, b'0000000000 65535 f \n']
+    for obj_id in range(1, next_id):
+        xref.append(b'%010d 00000 n \n' % offsets[obj_id])
+    yield b''.join(xref) + (
+        b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (next_id, position)
+    )
+
+
+async def async_chunks(chunks):
+    """Serve a blocking chunk generator to an ASGI response one chunk at a time.
+
+    Every step runs on the same sync thread, so the generator's database
+    cursor stays on one connection; closing the stream early (client
+    gone) closes the generator and shuts its process pool down.
+    """
+    iterator = iter(chunks)
+    done = object()
+    try:
+        while True:
+            chunk = await sync_to_async(next)(iterator, done)
+            if chunk is done:
+                break
+            yield chunk
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close)()
+
+
+def stream_tickets(bookings, fmt='zip', workers=None):
+    if fmt == 'pdf':
+        return stream_pdf(bookings, workers)
+    return stream_zip(bookings, workers)
@@ -0,0 +1,206 @@
+"""Ticket image rendering and caching.
+
+Fonts and the static parts of the ticket (header bar, QR frame, footer) are
+prepared once per process. Rendered PNGs are stored in the default storage
+under a content-addressed name, so a re-download only reads the file back.
+
+The QR code carries a token signed with SECRET_KEY, so the gate can reject
+forged or mistyped tickets without touching the database.
+"""
+from base64 import urlsafe_b64encode
+from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
+import hashlib
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+from cinema_project.metrics import TICKET_RENDERS
+from . import qr
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except Exception:
+    Image = None
+
+# Bump when the ticket layout changes so stored tickets are re-rendered
+TICKET_RENDER_VERSION = 2
+TICKET_STORAGE_DIR = 'tickets'
+
+WIDTH, HEIGHT = 900, 420
+BG = (255, 255, 255)
+HEADER_BG = (31, 111, 235)
+ACCENT = (6, 214, 160)
+TEXT_DARK = (31, 41, 55)
+TEXT_MUTED = (55, 65, 81)
+
+TICKET_TOKEN_PREFIX = 'CP1'
+TICKET_TOKEN_SALT = 'apps.bookings.tickets.ticket_token'
+
+# left, top, right, bottom of the framed QR area
+QR_BOX = (WIDTH - 260, 110, WIDTH - 24, 330)
+
+FONT_CANDIDATES = {
+    'bold': ('arialbd.ttf', 'arial.ttf', 'DejaVuSans-Bold.ttf'),
+    'regular': ('arial.ttf', 'DejaVuSans.ttf'),
+}
+
+
+def _load_font(kind, size):
+    for name in FONT_CANDIDATES[kind]:
+        try:
+            return ImageFont.truetype(name, size)
+        except Exception:
+            continue
+    return ImageFont.load_default()
+
+
+@lru_cache(maxsize=None)
+def fonts():
+    """Ticket fonts, resolved from disk once per process"""
+    return {
+        'bold': _load_font('bold', 28),
+        'regular': _load_font('regular', 18),
+        'small': _load_font('regular', 14),
+    }
+
+
+@lru_cache(maxsize=None)
+def _background():
+    """The parts of the ticket that are identical for every booking"""
+    img = Image.new('RGB', (WIDTH, HEIGHT), color=BG)
+    draw = ImageDraw.Draw(img)
+    f = fonts()
+
+    # Header
+    draw.rectangle([(0, 0), (WIDTH, 80)], fill=HEADER_BG)
+    draw.text((24, 18), 'Cinema Pro - Ticket', fill=(255, 255, 255), font=f['bold'])
+
+    # Right side box (QR area)
+    draw.rectangle([QR_BOX[:2], QR_BOX[2:]], outline=HEADER_BG, width=3)
+
+    draw.text((24, 350), 'Present this ticket at the theater entrance.', fill=(99, 102, 241), font=f['small'])
+    return img
+
+
+def _token_signature(booking_id, show_date):
+    digest = salted_hmac(
+        TICKET_TOKEN_SALT, f"{booking_id}-{show_date}", algorithm='sha256'
+    ).digest()
+    return urlsafe_b64encode(digest[:12]).decode()
+
+
+def ticket_token(booking_id, show_date):
+    """Signed token encoded in the ticket QR: ``CP1-<booking id>-<YYYYMMDD>-<signature>``"""
+    show_date = show_date.strftime('%Y%m%d')
+    return f"{TICKET_TOKEN_PREFIX}-{booking_id}-{show_date}-{_token_signature(booking_id, show_date)}"
+
+
+def parse_ticket_token(token):
+    """Return ``(booking_id, show_date)`` for a genuine token, else None"""
+    try:
+        prefix, booking_id, show_date, signature = token.strip().split('-', 3)
+        if prefix != TICKET_TOKEN_PREFIX or not booking_id.isdigit():
+            return None
+        day = datetime.strptime(show_date, '%Y%m%d').date()
+    except (AttributeError, ValueError):
+        return None
+    if not constant_time_compare(signature, _token_signature(booking_id, show_date)):
+        return None
+    return int(booking_id), day
+
+
+def qr_image(data, size):
+    """Black-on-white QR code for ``data``, scaled to at most ``size`` pixels"""
+    modules = qr.encode(data)
+    quiet = 4
+    count = len(modules) + 2 * quiet
+    img = Image.new('1', (count, count), color=1)
+    img.putdata([
+        0 if 0 <= r - quiet < len(modules) and 0 <= c - quiet < len(modules)
+        and modules[r - quiet][c - quiet] else 1
+        for r in range(count) for c in range(count)
+    ])
+    scale = max(1, size // count)
+    return img.resize((count * scale, count * scale), Image.NEAREST)
+
+
+def ticket_fields(booking, seats):
+    """The booking details printed on the ticket"""
+    showtime = booking.showtime
+    return {
+        'ref': f"BOOKING-{booking.id}",
+        'token': ticket_token(booking.id, showtime.show_date),
+        'title': showtime.movie.title,
+        'theater': showtime.theater.name,
+        'date': showtime.show_date.strftime('%b %d, %Y'),
+        'time': showtime.show_time.strftime('%I:%M %p'),
+        'seats': ', '.join(f"{seat.row}{seat.number}" for seat in seats),
+        'total': f"{booking.total_price}",
+    }
+
+
+def ticket_etag(booking, seats):
+    """Content hash of everything that ends up on the ticket image"""
+    fields = ticket_fields(booking, seats)
+    payload = '|'.join([str(TICKET_RENDER_VERSION), str(booking.id)] + [fields[k] for k in sorted(fields)])
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+def draw_ticket(booking, seats):
+    """Render a ticket to a Pillow image"""
+    return draw_ticket_fields(ticket_fields(booking, seats))
+
+
+def draw_ticket_fields(fields):
+    """Render a ticket from a ``ticket_fields`` dict.
+
+    Takes plain data only so it can run in a worker process.
+    """
+    img = _background().copy()
+    draw = ImageDraw.Draw(img)
+    f = fonts()
+
+    draw.text((24, 46), fields['ref'], fill=(255, 255, 255), font=f['small'])
+
+    # Movie block
+    draw.text((24, 110), fields['title'], fill=TEXT_DARK, font=f['bold'])
+    draw.text((24, 150), f"Theater: {fields['theater']}", fill=TEXT_MUTED, font=f['regular'])
+    draw.text((24, 180), f"Date: {fields['date']}", fill=TEXT_MUTED, font=f['regular'])
+    draw.text((24, 210), f"Time: {fields['time']}", fill=TEXT_MUTED, font=f['regular'])
+
+    # Seats and price
+    draw.text((24, 250), f"Seats: {fields['seats']}", fill=TEXT_DARK, font=f['regular'])
+    draw.text((24, 290), f"Total Paid: ₱{fields['total']}", fill=ACCENT, font=f['bold'])
+
+    left, top, right, bottom = QR_BOX
+    code = qr_image(fields['token'], min(right - left, bottom - top) - 12)
+    img.paste(code, (left + (right - left - code.width) // 2, top + (bottom - top - code.height) // 2))
+    return img
+
+
+def render_ticket_png(booking, seats):
+    return encode_ticket(ticket_fields(booking, seats), 'PNG')
+
+
+def encode_ticket(fields, image_format='PNG'):
+    """Draw and encode a ticket; ``image_format`` is any Pillow format name"""
+    buffer = BytesIO()
+    draw_ticket_fields(fields).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def ticket_storage_name(booking, etag):
+    return f"{TICKET_STORAGE_DIR}/{booking.id}-{etag}.png"
+
+
+def get_or_render_ticket(booking, seats, etag=None):
+    """Return ``(storage_name, etag)``, rendering and storing the PNG if needed"""
+    etag = etag or ticket_etag(booking, seats)
+    name = ticket_storage_name(booking, etag)
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(render_ticket_png(booking, seats)))
+        TICKET_RENDERS.inc(source='download')
+    return name, etag
@@ -3,11 +3,17 @@ from . import views
 
 urlpatterns = [
     path('seat-selection/<int:showtime_id>/', views.SeatSelectionView.as_view(), name='seat_selection'),
+    path('hold/<int:showtime_id>/', views.reserve_seats, name='reserve_seats'),
     path('checkout/<int:showtime_id>/', views.BookingCheckoutView.as_view(), name='checkout'),
     path('confirmation/<int:booking_id>/', views.BookingConfirmationView.as_view(), name='booking_confirmation'),
     path('ticket/<int:booking_id>/', views.download_ticket, name='download_ticket'),
     path('history/', views.BookingHistoryView.as_view(), name='booking_history'),
+    path('cancel/<int:booking_id>/', views.cancel_booking, name='cancel_booking'),
+    path('api/bookings/<int:booking_id>/cancel/', views.cancel_booking_api, name='cancel_booking_api'),
+    path('api/history/', views.booking_history_api, name='booking_history_api'),
     path('dashboard/', views.DashboardView.as_view(), name='dashboard'),
     path('api/seat-availability/<int:showtime_id>/', views.get_seat_availability, name='seat_availability'),
+    path('api/seat-events/<int:showtime_id>/', views.seat_events, name='seat_events'),
+    path('api/gate-scan/', views.gate_scan, name='gate_scan'),
     path('add-review/<int:movie_id>/', views.add_review, name='add_review'),
 ]
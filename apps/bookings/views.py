@@ -1,25 +1,39 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_http_methods
+from django.contrib import messages
+from django.views.decorators.http import require_http_methods, require_POST
+from django.views.decorators.csrf import csrf_exempt
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
 from django.http import JsonResponse
 from django.views import View
-from django.views.generic import TemplateView, ListView
+from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db import transaction
+from django.db.models import Prefetch
+from django.urls import reverse
 from decimal import Decimal
 from datetime import datetime
 
 from apps.movies.models import Showtime, Seat, Theater
-from .models import Booking, BookingItem, Review
+from apps.movies.pricing import price_snapshot, price_basket
+from cinema_project.metrics import CHECKOUT_CONFLICTS, SEAT_AVAILABILITY_REQUESTS
+from .models import Booking, BookingItem, Review, SeatHold
 from .forms import CustomUserCreationForm, CustomAuthenticationForm, ReviewForm
-from django.http import HttpResponse
-from io import BytesIO
-
-try:
-    from PIL import Image, ImageDraw, ImageFont
-except Exception:
-    Image = None
+from .pagination import keyset_page, InvalidCursor
+from .seatmap import SeatMap
+from .stats import get_user_stats
+from .services import (
+    commit_booking, hold_seats, check_in_ticket, cancel_booking_for_user,
+    SeatsUnavailable, InvalidSeatSelection, TicketRejected, CancellationRejected,
+)
+from django.http import HttpResponse, HttpResponseNotModified, FileResponse, Http404, StreamingHttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
+from django.core.files.storage import default_storage
+from django.utils.http import http_date
+from . import live, tickets
 
 
 class RegisterView(View):
@@ -82,72 +96,78 @@ class SeatSelectionView(LoginRequiredMixin, View):
     login_url = 'login'
     
     def get(self, request, showtime_id):
-        showtime = get_object_or_404(Showtime, id=showtime_id)
-        seats = Seat.objects.filter(theater=showtime.theater)
-        
-        # Get booked seats
-        booked_seats = BookingItem.objects.filter(
-            showtime=showtime
-        ).values_list('seat_id', flat=True)
-        
-        # Organize seats by row
-        seats_by_row = {}
-        for seat in seats:
-            if seat.row not in seats_by_row:
-                seats_by_row[seat.row] = []
-            seat.is_booked = seat.id in booked_seats
-            seats_by_row[seat.row].append(seat)
+        showtime = get_object_or_404(
+            Showtime.objects.select_related('movie', 'theater'), id=showtime_id
+        )
+        seat_map = SeatMap.for_showtime(showtime, user=request.user)
         
         context = {
             'showtime': showtime,
-            'seats_by_row': sorted(seats_by_row.items()),
+            'seats_by_row': seat_map.seats_by_row(),
+            'seat_prices': price_snapshot(showtime).as_json(),
             'page': 'seat_selection',
         }
         return render(request, self.template_name, context)
 
 
+@login_required
+@require_POST
+def reserve_seats(request, showtime_id):
+    """Hold the seats picked on the seat map, then show them at checkout"""
+    showtime = get_object_or_404(Showtime, id=showtime_id)
+    # Accept either repeated seats=1&seats=2 or comma-separated seats=1,2,3
+    seat_id_strs = [s for entry in request.POST.getlist('seats') for s in entry.split(',') if s.strip()]
+    if not seat_id_strs:
+        return redirect('seat_selection', showtime_id=showtime.id)
+
+    try:
+        seat_ids = [int(s) for s in seat_id_strs]
+    except ValueError:
+        return redirect('seat_selection', showtime_id=showtime.id)
+
+    # Reserve the selection so it cannot be sold while the customer pays
+    try:
+        hold_seats(request.user, showtime.id, seat_ids)
+    except SeatsUnavailable as exc:
+        if not isinstance(exc, InvalidSeatSelection):
+            CHECKOUT_CONFLICTS.inc(stage='hold')
+        return render(request, BookingCheckoutView.template_name, {
+            'error': str(exc),
+            'showtime': showtime,
+        })
+    return redirect('checkout', showtime_id=showtime.id)
+
+
 class BookingCheckoutView(LoginRequiredMixin, View):
     """Booking checkout view"""
     template_name = 'bookings/checkout.html'
     login_url = 'login'
     
     def get(self, request, showtime_id):
-        showtime = get_object_or_404(Showtime, id=showtime_id)
-        # Accept either repeated ?seats=1&seats=2 or comma-separated ?seats=1,2,3
-        raw_seats = request.GET.getlist('seats') or request.GET.get('seats', '')
-
-        # Normalize into list of ID strings
-        if isinstance(raw_seats, list):
-            # flatten any comma-separated entries
-            flat = []
-            for entry in raw_seats:
-                flat.extend([s for s in str(entry).split(',') if s.strip()])
-            seat_id_strs = flat
-        else:
-            seat_id_strs = [s for s in str(raw_seats).split(',') if s.strip()]
-
-        if not seat_id_strs:
-            return redirect('movie_detail', pk=showtime.movie.id)
-
-        try:
-            seat_ids = [int(s) for s in seat_id_strs]
-        except ValueError:
-            return redirect('movie_detail', pk=showtime.movie.id)
+        """Show the customer's current seat holds; taking them is reserve_seats' job"""
+        showtime = get_object_or_404(Showtime.objects.select_related('movie', 'theater'), id=showtime_id)
+        holds = list(
+            SeatHold.active().filter(showtime_id=showtime.id, user=request.user)
+            .select_related('seat').order_by('seat__row', 'seat__column')
+        )
+        if not holds:
+            messages.info(request, 'Your seat reservation has expired. Please select your seats again.')
+            return redirect('seat_selection', showtime_id=showtime.id)
 
-        seats = Seat.objects.filter(id__in=seat_ids)
-        # price per seat comes from showtime ticket_price
-        total_price = showtime.ticket_price * seats.count()
-        
+        # These prices are locked into the holds; commit_booking charges them
+        locked = {hold.seat_id: hold.price for hold in holds if hold.price is not None}
+        basket = price_basket(showtime, [hold.seat for hold in holds], locked)
         context = {
             'showtime': showtime,
-            'seats': seats,
-            'total_price': total_price,
-            'seat_ids': ','.join(str(s) for s in seat_ids),
+            'seat_lines': basket.lines,
+            'seat_count': len(basket),
+            'total_price': basket.total,
+            'seat_ids': ','.join(str(hold.seat_id) for hold in holds),
+            'hold_expires_at': min(hold.expires_at for hold in holds),
             'page': 'checkout',
         }
         return render(request, self.template_name, context)
     
-    @transaction.atomic
     def post(self, request, showtime_id):
         showtime = get_object_or_404(Showtime, id=showtime_id)
         raw = request.POST.get('seat_ids', '')
@@ -164,46 +184,17 @@ class BookingCheckoutView(LoginRequiredMixin, View):
                 'showtime': showtime,
             })
 
-        seats = Seat.objects.filter(id__in=seat_ids)
-        
-        # Check if seats are still available
-        booked_seats = BookingItem.objects.filter(
-            showtime=showtime,
-            seat__in=seats
-        ).exists()
-        
-        if booked_seats:
-            # Seat no longer available
+        try:
+            booking = commit_booking(request.user, showtime.id, seat_ids)
+        except SeatsUnavailable as exc:
+            # Seat no longer available (or not part of this theater)
+            if not isinstance(exc, InvalidSeatSelection):
+                CHECKOUT_CONFLICTS.inc(stage='commit')
             return render(request, self.template_name, {
-                'error': 'One or more seats are no longer available. Please select again.',
+                'error': str(exc),
                 'showtime': showtime,
             })
         
-        # Create booking
-        booking = Booking.objects.create(
-            user=request.user,
-            showtime=showtime,
-            status='confirmed'
-        )
-        
-        # Create booking items using showtime ticket_price
-        total_price = Decimal(str(showtime.ticket_price)) * seats.count()
-        for seat in seats:
-            BookingItem.objects.create(
-                booking=booking,
-                showtime=showtime,
-                seat=seat,
-                price=showtime.ticket_price
-            )
-        
-        booking.total_price = total_price
-        booking.number_of_seats = seats.count()
-        booking.save()
-        
-        # Update available seats
-        showtime.available_seats = showtime.get_available_seats()
-        showtime.save()
-        
         return redirect('booking_confirmation', booking_id=booking.id)
 
 
@@ -222,102 +213,150 @@ class BookingConfirmationView(LoginRequiredMixin, View):
 
 
 def download_ticket(request, booking_id):
-    """Generate a simple ticket image (PNG) and return as download.
+    """Serve the booking's ticket image (PNG) as a download.
 
-    Uses Pillow (PIL) which is in requirements. If Pillow is missing, return 404.
+    Tickets are rendered once with Pillow and stored under a content hash;
+    later downloads are served from storage, and clients holding the
+    current ETag get a 304. If Pillow is missing, return 500.
     """
-    booking = get_object_or_404(Booking, id=booking_id)
+    booking = get_object_or_404(
+        Booking.objects.select_related('showtime__movie', 'showtime__theater'), id=booking_id
+    )
     # ensure only owner or staff can download
-    if not request.user.is_authenticated or (booking.user != request.user and not request.user.is_staff):
+    if not request.user.is_authenticated or (booking.user_id != request.user.id and not request.user.is_staff):
         return redirect('login')
 
-    if Image is None:
+    if booking.status == 'cancelled':
+        raise Http404('Booking was cancelled')
+
+    if tickets.Image is None:
         return HttpResponse('Pillow is required to generate tickets', status=500)
 
-    # Build ticket text
-    title = booking.showtime.movie.title
-    theater = booking.showtime.theater.name
-    date = booking.showtime.show_date.strftime('%b %d, %Y')
-    time = booking.showtime.show_time.strftime('%I:%M %p')
-    seats = ', '.join(f"{it.seat.row}{it.seat.number}" for it in booking.items.all())
-    total = f"{booking.total_price}"
-    booking_ref = f"BOOKING-{booking.id}"
-
-    # Image size
-    w, h = 900, 420
-    bg = (255, 255, 255)
-    header_bg = (31, 111, 235)
-    accent = (6, 214, 160)
-
-    img = Image.new('RGB', (w, h), color=bg)
-    draw = ImageDraw.Draw(img)
-
-    # Fonts (fallback to default)
-    try:
-        font_bold = ImageFont.truetype('arial.ttf', 28)
-        font_regular = ImageFont.truetype('arial.ttf', 18)
-        font_small = ImageFont.truetype('arial.ttf', 14)
-    except Exception:
-        font_bold = ImageFont.load_default()
-        font_regular = ImageFont.load_default()
-        font_small = ImageFont.load_default()
-
-    # Header
-    draw.rectangle([(0, 0), (w, 80)], fill=header_bg)
-    draw.text((24, 18), 'Cinema Pro - Ticket', fill=(255, 255, 255), font=font_bold)
-    draw.text((24, 46), booking_ref, fill=(255, 255, 255), font=font_small)
-
-    # Movie block
-    draw.text((24, 110), title, fill=(31, 41, 55), font=font_bold)
-    draw.text((24, 150), f"Theater: {theater}", fill=(55, 65, 81), font=font_regular)
-    draw.text((24, 180), f"Date: {date}", fill=(55, 65, 81), font=font_regular)
-    draw.text((24, 210), f"Time: {time}", fill=(55, 65, 81), font=font_regular)
-
-    # Seats and price
-    draw.text((24, 250), f"Seats: {seats}", fill=(31, 41, 55), font=font_regular)
-    draw.text((24, 290), f"Total Paid: ₱{total}", fill=accent, font=font_bold)
-
-    # Right side box (QR placeholder)
-    box_x = w - 260
-    draw.rectangle([(box_x, 110), (w - 24, 330)], outline=header_bg, width=3)
-    draw.text((box_x + 14, 130), 'Ticket QR', fill=(31, 41, 55), font=font_bold)
-    # draw a simple QR-like pattern
-    sq_size = 16
-    offset_x = box_x + 14
-    offset_y = 170
-    for r in range(6):
-        for c in range(6):
-            if (r + c) % 2 == 0:
-                draw.rectangle([(offset_x + c * sq_size, offset_y + r * sq_size),
-                                (offset_x + (c + 1) * sq_size - 4, offset_y + (r + 1) * sq_size - 4)],
-                               fill=(31, 41, 55))
-
-    draw.text((24, 350), 'Present this ticket at the theater entrance.', fill=(99, 102, 241), font=font_small)
-
-    # Save to BytesIO
-    buffer = BytesIO()
-    img.save(buffer, format='PNG')
-    buffer.seek(0)
-
-    response = HttpResponse(buffer, content_type='image/png')
-    response['Content-Disposition'] = f'attachment; filename="ticket-{booking.id}.png"'
+    seats = [item.seat for item in booking.items.select_related('seat')]
+    etag = f'"{tickets.ticket_etag(booking, seats)}"'
+    last_modified = http_date(booking.booking_date.timestamp())
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+    else:
+        name, _ = tickets.get_or_render_ticket(booking, seats, etag=etag.strip('"'))
+        response = FileResponse(default_storage.open(name), content_type='image/png')
+        response['Content-Disposition'] = f'attachment; filename="ticket-{booking.id}.png"'
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    response['Cache-Control'] = 'private, max-age=0, must-revalidate'
     return response
 
 
-class BookingHistoryView(LoginRequiredMixin, ListView):
+@csrf_exempt
+@require_POST
+def gate_scan(request):
+    """API endpoint for gate scanners: verify a ticket QR token and admit it once.
+
+    Scanners authenticate with the shared ``X-Gate-Key`` header
+    (settings.GATE_SCAN_KEY), so no session or user lookup is needed.
+    """
+    key = settings.GATE_SCAN_KEY
+    if not key or not constant_time_compare(request.headers.get('X-Gate-Key', ''), key):
+        return JsonResponse({'valid': False, 'reason': 'forbidden'}, status=403)
+
+    try:
+        booking_id = check_in_ticket(request.POST.get('token', ''))
+    except TicketRejected as e:
+        return JsonResponse({'valid': False, 'reason': e.reason, 'message': str(e)}, status=409)
+    return JsonResponse({'valid': True, 'booking_id': booking_id})
+
+
+@login_required
+@require_POST
+def cancel_booking(request, booking_id):
+    """Cancel one of the user's bookings from the history page"""
+    try:
+        refund = cancel_booking_for_user(request.user, booking_id)
+    except CancellationRejected as e:
+        messages.error(request, str(e))
+    else:
+        messages.success(request, f"Booking BOOKING-{booking_id} was cancelled. ₱{refund} will be refunded.")
+    return redirect('booking_history')
+
+
+@require_POST
+def cancel_booking_api(request, booking_id):
+    """API endpoint for the mobile app: cancel a booking and report the refund"""
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    try:
+        refund = cancel_booking_for_user(request.user, booking_id)
+    except CancellationRejected as e:
+        status = 404 if e.reason == 'not_found' else 409
+        return JsonResponse({'cancelled': False, 'reason': e.reason, 'message': str(e)}, status=status)
+    return JsonResponse({'cancelled': True, 'booking_id': booking_id, 'refund_amount': str(refund)})
+
+
+def booking_history_page(request, per_page):
+    """Keyset page of the user's bookings with showtime, movie, theater and seats loaded"""
+    bookings = Booking.objects.filter(user=request.user).select_related(
+        'showtime__movie', 'showtime__theater'
+    ).prefetch_related(
+        Prefetch('items', queryset=BookingItem.objects.select_related('seat').order_by('seat__row', 'seat__column'))
+    )
+    return keyset_page(
+        bookings, after=request.GET.get('after'), before=request.GET.get('before'), per_page=per_page
+    )
+
+
+class BookingHistoryView(LoginRequiredMixin, View):
     """View booking history"""
-    model = Booking
     template_name = 'bookings/booking_history.html'
-    context_object_name = 'bookings'
     paginate_by = 10
     
-    def get_queryset(self):
-        return Booking.objects.filter(user=self.request.user).prefetch_related('items')
-    
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['page'] = 'booking_history'
-        return context
+    def get(self, request):
+        try:
+            page = booking_history_page(request, self.paginate_by)
+        except InvalidCursor:
+            return redirect('booking_history')
+        context = {
+            'bookings': page.items,
+            'page_obj': page,
+            'page': 'booking_history',
+        }
+        return render(request, self.template_name, context)
+
+
+def booking_history_api(request):
+    """API endpoint for the mobile app: the user's bookings, newest first.
+
+    Pass the returned ``next`` cursor as ``?after=`` to fetch older ones.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    try:
+        per_page = min(max(int(request.GET.get('per_page', 20)), 1), 100)
+        page = booking_history_page(request, per_page)
+    except (ValueError, InvalidCursor):
+        return JsonResponse({'error': 'Invalid cursor or page size'}, status=400)
+
+    return JsonResponse({
+        'results': [
+            {
+                'id': booking.id,
+                'status': booking.status,
+                'booking_date': booking.booking_date.isoformat(),
+                'total_price': str(booking.total_price),
+                'number_of_seats': booking.number_of_seats,
+                'refund_amount': str(booking.refund_amount) if booking.refund_amount is not None else None,
+                'can_cancel': booking.can_cancel(),
+                'movie': {'id': booking.showtime.movie_id, 'title': booking.showtime.movie.title},
+                'theater': booking.showtime.theater.name,
+                'show_date': booking.showtime.show_date.isoformat(),
+                'show_time': booking.showtime.show_time.strftime('%H:%M'),
+                'seats': [f"{item.seat.row}{item.seat.number}" for item in booking.items.all()],
+                'ticket_url': reverse('download_ticket', args=[booking.id]),
+            }
+            for booking in page
+        ],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
 
 
 class DashboardView(LoginRequiredMixin, TemplateView):
@@ -326,17 +365,7 @@ class DashboardView(LoginRequiredMixin, TemplateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['recent_bookings'] = Booking.objects.filter(
-            user=self.request.user
-        ).order_by('-booking_date')[:5]
-        context['total_bookings'] = Booking.objects.filter(
-            user=self.request.user
-        ).count()
-        context['total_spent'] = sum(
-            float(b.total_price) for b in Booking.objects.filter(
-                user=self.request.user
-            )
-        )
+        context.update(get_user_stats(self.request.user))
         context['page'] = 'dashboard'
         return context
 
@@ -377,17 +406,37 @@ def add_review(request, movie_id):
 
 def get_seat_availability(request, showtime_id):
     """API endpoint for getting seat availability"""
+    SEAT_AVAILABILITY_REQUESTS.inc()
     showtime = get_object_or_404(Showtime, id=showtime_id)
-    
-    booked_seats = BookingItem.objects.filter(
-        showtime=showtime
-    ).values_list('seat_id', flat=True)
-    
-    available_count = Seat.objects.filter(
-        theater=showtime.theater
-    ).exclude(id__in=booked_seats).count()
+    seat_map = SeatMap.for_showtime(showtime, user=request.user)
     
     return JsonResponse({
-        'available_seats': available_count,
-        'booked_seats': list(booked_seats),
+        'available_seats': seat_map.available_count,
+        'booked_seats': seat_map.booked_seat_ids(),
+        'held_seats': seat_map.held_seat_ids(),
     })
+
+
+async def seat_events(request, showtime_id):
+    """Server-Sent Events stream of seat changes for a showtime.
+
+    Under ASGI the connection stays open and receives deltas as bookings
+    and holds commit. Under WSGI a long-lived stream would pin a worker,
+    so only the snapshot is sent and the browser re-polls every
+    SEAT_EVENTS_RETRY_MS.
+    """
+    showtime = await Showtime.objects.filter(id=showtime_id).only('id', 'theater_id').afirst()
+    if showtime is None:
+        raise Http404('Showtime not found')
+    user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+
+    if isinstance(request, ASGIRequest):
+        stream = live.event_stream(showtime, user, user.id if user else None)
+    else:
+        snapshot = await sync_to_async(live.seat_snapshot)(showtime, user)
+        stream = [f'retry: {settings.SEAT_EVENTS_RETRY_MS}\n' + live.format_event('snapshot', snapshot)]
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,7 +1,13 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 from django.utils.html import format_html, format_html_join
-from apps.bookings.models import BookingItem
+from apps.bookings.models import Booking, BookingItem
+from apps.bookings.services import cancel_bookings
+from .forms import ScheduleForm
 from .models import Movie, Theater, Showtime, Seat
+from .scheduling import create_schedule, plan_schedule
 
 
 @admin.register(Movie)
@@ -32,13 +38,61 @@ class ShowtimeAdmin(admin.ModelAdmin):
     search_fields = ['movie__title', 'theater__name']
     readonly_fields = ['available_seats', 'booked_seats_list']
     inlines = []
+    change_list_template = 'admin/movies/showtime/change_list.html'
+    actions = ['cancel_all_bookings']
+
+    @admin.action(description='Cancel and refund every booking for selected showtimes')
+    def cancel_all_bookings(self, request, queryset):
+        # e.g. a projector failure: one pass over all affected bookings
+        cancelled, freed = cancel_bookings(
+            Booking.objects.filter(showtime__in=queryset), reason='Showtime cancelled'
+        )
+        self.message_user(request, "Cancelled %d bookings and released %d seats." % (cancelled, freed), messages.SUCCESS)
+
+    def get_urls(self):
+        return [
+            path('generate/', self.admin_site.admin_view(self.generate_schedule_view),
+                 name='movies_showtime_generate'),
+        ] + super().get_urls()
+
+    def generate_schedule_view(self, request):
+        """Plan a schedule over a date range, show conflicts, then bulk-create it"""
+        if not self.has_add_permission(request):
+            return redirect('admin:movies_showtime_changelist')
+        form = ScheduleForm(request.POST or None)
+        plan = None
+        if request.method == 'POST' and form.is_valid():
+            data = form.cleaned_data
+            args = (data['start_date'], data['end_date'], data['movies'].order_by('pk'),
+                    data['theaters'].order_by('pk'), data['slots'])
+            if data['dry_run']:
+                plan = plan_schedule(*args)
+            else:
+                plan = create_schedule(*args)
+                self.message_user(request, "Created %d showtimes, skipped %d conflicts." % (
+                    len(plan.showtimes), len(plan.conflicts)),
+                    messages.WARNING if plan.conflicts else messages.SUCCESS)
+                if not plan.conflicts:
+                    return redirect('admin:movies_showtime_changelist')
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Generate schedule',
+            'form': form,
+            'plan': plan,
+            'conflicts': plan.conflicts[:200] if plan else [],
+        }
+        return TemplateResponse(request, 'admin/movies/showtime/generate_schedule.html', context)
+
+    list_select_related = ['movie', 'theater']
 
     def booked_seats_count(self, obj):
-        return BookingItem.objects.filter(showtime=obj).count()
+        # From the maintained seat counter: no per-row COUNT on the changelist
+        return obj.theater.total_seats - obj.available_seats
     booked_seats_count.short_description = 'Booked Seats'
 
     def booked_seats_list(self, obj):
-        items = BookingItem.objects.filter(showtime=obj).select_related('seat')
+        items = BookingItem.objects.filter(showtime=obj, active=True).select_related('seat')
         if not items.exists():
             return '-'
         # render small badges for each booked seat
@@ -1 +1,9 @@
-default_app_config = 'apps.movies.apps.MoviesConfig'
+from django.apps import AppConfig
+
+
+class MoviesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.movies'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,85 @@
+"""Catalogue caching helpers.
+
+Cached catalogue pages and template fragments include a catalogue version
+number in their keys. Saving or deleting a Movie, Showtime or Review bumps
+the version (see signals.py), which orphans every cached entry at once
+instead of hunting down individual keys. The version lives in the default
+cache, so the bump only reaches every worker when that cache is shared
+(CACHE_BACKEND 'file' or 'redis'; see checks.py).
+"""
+from functools import partial, wraps
+import hashlib
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+
+from cinema_project.metrics import CACHE_REQUESTS
+
+CATALOGUE_VERSION_KEY = 'catalogue:version'
+
+
+def get_catalogue_version():
+    version = cache.get(CATALOGUE_VERSION_KEY)
+    if version is None:
+        version = 1
+        cache.add(CATALOGUE_VERSION_KEY, version, None)
+    return version
+
+
+def bump_catalogue_version():
+    """Invalidate every cached catalogue page and fragment"""
+    try:
+        cache.incr(CATALOGUE_VERSION_KEY)
+    except ValueError:
+        # Key missing (evicted or never set); start a fresh version
+        cache.set(CATALOGUE_VERSION_KEY, 2, None)
+
+
+def page_cache_key(request):
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'catalogue:page:{get_catalogue_version()}:{url}'
+
+
+def page_timeout(shows_prices=False):
+    timeout = settings.CATALOGUE_CACHE_TIMEOUT
+    if shows_prices:
+        # Quoted prices must not outlive their price snapshot
+        timeout = min(timeout, settings.PRICE_SNAPSHOT_SECONDS)
+    return timeout
+
+
+def cache_anonymous_page(view_func=None, *, shows_prices=False):
+    """Cache full GET responses for anonymous visitors.
+
+    Authenticated users always get a fresh page since the navbar and
+    booking links depend on who is logged in. Pages that quote
+    demand-based prices (``shows_prices=True``) are kept no longer than
+    PRICE_SNAPSHOT_SECONDS.
+    """
+    if view_func is None:
+        return partial(cache_anonymous_page, shows_prices=shows_prices)
+
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        if request.method != 'GET' or request.user.is_authenticated or len(get_messages(request)):
+            return view_func(request, *args, **kwargs)
+
+        key = page_cache_key(request)
+        response = cache.get(key)
+        CACHE_REQUESTS.inc(cache='catalogue_page', result='miss' if response is None else 'hit')
+        if response is not None:
+            return response
+
+        response = view_func(request, *args, **kwargs)
+
+        def _store(r):
+            if r.status_code == 200 and not r.cookies:
+                cache.set(key, r, page_timeout(shows_prices))
+
+        if hasattr(response, 'render') and callable(response.render):
+            response.add_post_render_callback(_store)
+        else:
+            _store(response)
+        return response
+    return _wrapped
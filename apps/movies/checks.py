@@ -0,0 +1,17 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register()
+def shared_cache_check(app_configs, **kwargs):
+    """Catalogue invalidation and price snapshots need a cache every worker sees"""
+    backend = settings.CACHES['default']['BACKEND']
+    if settings.DEBUG or not backend.endswith('LocMemCache'):
+        return []
+    return [Warning(
+        'The default cache is process-local (locmem).',
+        hint="With several workers, a catalogue version bump or a new price snapshot only "
+             "reaches the worker that made it, and the others keep serving stale pages and "
+             "prices until their entries expire. Set CACHE_BACKEND to 'file' or 'redis'.",
+        id='movies.W001',
+    )]
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from .cache import get_catalogue_version
+
+
+def catalogue_cache(request):
+    """Expose the fragment cache timeout and catalogue version to templates.
+
+    The version is looked up lazily so pages without cached fragments do not
+    pay for a cache round trip.
+    """
+    return {
+        'CATALOGUE_CACHE_TIMEOUT': settings.CATALOGUE_CACHE_TIMEOUT,
+        'catalogue_version': SimpleLazyObject(get_catalogue_version),
+    }
@@ -1,5 +1,6 @@
 from django import forms
 from .models import Movie, Theater, Showtime, Seat
+from .scheduling import parse_slots
 
 
 class MovieForm(forms.ModelForm):
@@ -41,3 +42,31 @@ class ShowtimeForm(forms.ModelForm):
             'show_time': forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}),
             'ticket_price': forms.NumberInput(attrs={'class': 'form-control', 'step': '0.01'}),
         }
+
+
+class ScheduleForm(forms.Form):
+    """Admin form for generating showtimes over a date range"""
+    start_date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    movies = forms.ModelMultipleChoiceField(queryset=Movie.objects.filter(status__in=['active', 'upcoming']))
+    theaters = forms.ModelMultipleChoiceField(queryset=Theater.objects.all())
+    slots = forms.CharField(
+        initial='10:30,13:30,16:30,19:30,22:15',
+        help_text='Comma-separated HH:MM[@price][/weekdays], e.g. 19:30@350 or 23:00@300/4-5 (0 = Monday)',
+    )
+    price = forms.DecimalField(max_digits=10, decimal_places=2, initial='250.00',
+                               help_text='Price for slots without @price')
+    dry_run = forms.BooleanField(required=False, initial=True, label='Only check for conflicts')
+
+    def clean_slots(self):
+        try:
+            return parse_slots(self.cleaned_data['slots'], self.data.get('price') or '0')
+        except (ValueError, ArithmeticError) as e:
+            raise forms.ValidationError(f"Invalid slots: {e}")
+
+    def clean(self):
+        cleaned = super().clean()
+        start, end = cleaned.get('start_date'), cleaned.get('end_date')
+        if start and end and end < start:
+            raise forms.ValidationError("The end date is before the start date.")
+        return cleaned
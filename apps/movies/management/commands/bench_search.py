@@ -0,0 +1,88 @@
+from datetime import date
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import connection, transaction
+from django.db.models import Q
+
+from apps.movies.models import Movie
+from apps.movies.search import search_movies
+
+WORDS = (
+    'quantum paradox love paris dark shadows space odyssey laugh dragon chronicles '
+    'heist ocean mystery storm empire river night city ghost legend winter summer '
+    'secret garden machine iron crown shadow fire island desert hunter silent'
+).split()
+SYLLABLES = 'ka lo mi ra ven tor sil an dre mu pha zel ok ti bra nor'.split()
+GENRES = ['Sci-Fi', 'Romance', 'Thriller', 'Comedy', 'Fantasy', 'Crime', 'Adventure', 'Drama']
+DIRECTORS = ['Nolan', 'Anderson', 'Villeneuve', 'Cameron', 'Apatow', 'Jackson', 'Soderbergh', 'Wan']
+
+
+class Command(BaseCommand):
+    help = "Compare the legacy icontains search against the full-text index on synthetic movies."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--movies', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--queries', default='dragon,shadow city,nolan,zzzz')
+
+    def handle(self, *args, **options):
+        self.stdout.write("Database: %s" % connection.vendor)
+        # Synthetic rows are inserted in a transaction that is rolled back
+        with transaction.atomic():
+            self._populate(options['movies'], options['seed'])
+            self.stdout.write("%-14s %10s %14s %14s" % ('query', 'hits', 'legacy ms', 'indexed ms'))
+            for query in options['queries'].split(','):
+                self._bench(query.strip(), options['repeat'])
+            transaction.set_rollback(True)
+
+    def _populate(self, count, seed):
+        rng = random.Random(seed)
+        # A realistic vocabulary so common query words are not in every row
+        vocab = WORDS + [
+            ''.join(rng.choices(SYLLABLES, k=3)) for _ in range(5000)
+        ]
+        start = time.perf_counter()
+        batch = []
+        for n in range(count):
+            batch.append(Movie(
+                title=' '.join(rng.sample(vocab, 3)).title(),
+                description=' '.join(rng.choices(vocab, k=30)),
+                genre=rng.choice(GENRES),
+                director=rng.choice(DIRECTORS),
+                duration=rng.randint(80, 180),
+                release_date=date(2020 + n % 6, 1 + n % 12, 1 + n % 28),
+                status='active',
+            ))
+            if len(batch) == 5000:
+                Movie.objects.bulk_create(batch)
+                batch = []
+        Movie.objects.bulk_create(batch)
+        self.stdout.write("Inserted %d movies in %.1fs" % (count, time.perf_counter() - start))
+
+    def _time(self, fn, repeat):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = fn()
+        return result, (time.perf_counter() - start) * 1000 / repeat
+
+    def _bench(self, query, repeat):
+        def legacy():
+            movies = Movie.objects.filter(status='active').filter(
+                Q(title__icontains=query) | Q(description__icontains=query)
+            )
+            page = Paginator(movies, 12).get_page(1)
+            list(page.object_list)
+            return page.paginator.count
+
+        def indexed():
+            page = Paginator(search_movies(query), 12).get_page(1)
+            list(page.object_list)
+            return page.paginator.count
+
+        _, legacy_ms = self._time(legacy, repeat)
+        hits, indexed_ms = self._time(indexed, repeat)
+        self.stdout.write("%-14s %10d %14.2f %14.2f" % (query, hits, legacy_ms, indexed_ms))
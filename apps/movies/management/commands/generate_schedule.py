@@ -0,0 +1,61 @@
+from collections import Counter
+from datetime import date
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.movies.models import Movie, Theater
+from apps.movies.scheduling import create_schedule, parse_slots, plan_schedule
+
+
+class Command(BaseCommand):
+    help = ("Create showtimes for a date range from slot templates, rotating movies across "
+            "theaters. Overlapping screenings (duration plus turnaround) are skipped and reported.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('start', help='First day (YYYY-MM-DD)')
+        parser.add_argument('end', help='Last day, inclusive (YYYY-MM-DD)')
+        parser.add_argument('--slots', default='10:30,13:30,16:30,19:30,22:15',
+                            help='Comma-separated HH:MM[@price][/weekdays], e.g. "19:30@350,23:00@300/4-5"')
+        parser.add_argument('--price', default='250.00', help='Price for slots without @price')
+        parser.add_argument('--movie', type=int, action='append', dest='movies',
+                            help='Movie id (repeatable); defaults to all active movies')
+        parser.add_argument('--theater', type=int, action='append', dest='theaters',
+                            help='Theater id (repeatable); defaults to all theaters')
+        parser.add_argument('--dry-run', action='store_true', help='Report the plan without saving it')
+        parser.add_argument('--show-conflicts', type=int, default=20,
+                            help='How many individual conflicts to list')
+
+    def handle(self, *args, **options):
+        try:
+            start, end = date.fromisoformat(options['start']), date.fromisoformat(options['end'])
+            slots = parse_slots(options['slots'], options['price'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        if end < start:
+            raise CommandError("The end date is before the start date")
+
+        movies = Movie.objects.filter(pk__in=options['movies']) if options['movies'] else Movie.objects.filter(status='active')
+        theaters = Theater.objects.filter(pk__in=options['theaters']) if options['theaters'] else Theater.objects.all()
+        movies, theaters = list(movies.order_by('pk')), list(theaters.order_by('pk'))
+        if not movies or not theaters:
+            raise CommandError("No movies or theaters to schedule")
+
+        started = time.perf_counter()
+        if options['dry_run']:
+            plan = plan_schedule(start, end, movies, theaters, slots)
+        else:
+            plan = create_schedule(start, end, movies, theaters, slots)
+        elapsed = time.perf_counter() - started
+
+        for conflict in plan.conflicts[:options['show_conflicts']]:
+            self.stdout.write("  %s %s %s: %s overlaps %s" % (
+                conflict.theater.name, conflict.show_date, conflict.show_time.strftime('%H:%M'),
+                conflict.movie.title, conflict.clashes_with))
+        if plan.conflicts:
+            by_theater = Counter(c.theater.name for c in plan.conflicts)
+            self.stdout.write("Most conflicts: %s" % ", ".join(
+                "%s %d" % item for item in by_theater.most_common(10)))
+
+        self.stdout.write(self.style.SUCCESS("%s %d showtimes, skipped %d conflicts in %.2fs" % (
+            'Planned' if options['dry_run'] else 'Created', len(plan.showtimes), len(plan.conflicts), elapsed)))
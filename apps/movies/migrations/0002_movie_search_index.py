@@ -0,0 +1,85 @@
+from django.db import migrations
+
+# Full-text search index for Movie (see apps/movies/search.py).
+#
+# PostgreSQL: a stored generated tsvector column with a GIN index. Being a
+# generated column it is recomputed by the database on every INSERT/UPDATE,
+# including bulk_create() and queryset.update().
+#
+# SQLite: an external-content FTS5 table kept in sync by triggers.
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE movies_movie ADD COLUMN search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english'::regconfig, coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english'::regconfig, coalesce(director, '')), 'B') ||
+        setweight(to_tsvector('english'::regconfig, coalesce(genre, '')), 'B') ||
+        setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX movies_movie_search_vector_gin ON movies_movie USING GIN (search_vector)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS movies_movie_search_vector_gin",
+    "ALTER TABLE movies_movie DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE movies_movie_fts USING fts5(
+        title, director, genre, description,
+        content='movies_movie', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER movies_movie_fts_ai AFTER INSERT ON movies_movie BEGIN
+        INSERT INTO movies_movie_fts(rowid, title, director, genre, description)
+        VALUES (new.id, new.title, new.director, new.genre, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER movies_movie_fts_ad AFTER DELETE ON movies_movie BEGIN
+        INSERT INTO movies_movie_fts(movies_movie_fts, rowid, title, director, genre, description)
+        VALUES ('delete', old.id, old.title, old.director, old.genre, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER movies_movie_fts_au AFTER UPDATE ON movies_movie BEGIN
+        INSERT INTO movies_movie_fts(movies_movie_fts, rowid, title, director, genre, description)
+        VALUES ('delete', old.id, old.title, old.director, old.genre, old.description);
+        INSERT INTO movies_movie_fts(rowid, title, director, genre, description)
+        VALUES (new.id, new.title, new.director, new.genre, new.description);
+    END
+    """,
+    "INSERT INTO movies_movie_fts(movies_movie_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS movies_movie_fts_ai",
+    "DROP TRIGGER IF EXISTS movies_movie_fts_ad",
+    "DROP TRIGGER IF EXISTS movies_movie_fts_au",
+    "DROP TABLE IF EXISTS movies_movie_fts",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for sql in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
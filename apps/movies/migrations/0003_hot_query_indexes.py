@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0002_movie_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(condition=models.Q(('status', 'active')), fields=['-release_date'], name='movie_active_release_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['status', 'genre', '-release_date'], name='movie_status_genre_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='showtime',
+            index=models.Index(fields=['movie', 'show_date', 'show_time'], name='showtime_movie_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='showtime',
+            index=models.Index(fields=['show_date', 'show_time'], name='showtime_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showtime',
+            name='sales_updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -24,6 +24,12 @@ class Movie(models.Model):
     
     class Meta:
         ordering = ['-release_date']
+        indexes = [
+            # Catalogue listing: active movies, newest first
+            models.Index(fields=['-release_date'], condition=models.Q(status='active'),
+                         name='movie_active_release_idx'),
+            models.Index(fields=['status', 'genre', '-release_date'], name='movie_status_genre_idx'),
+        ]
         
     def __str__(self):
         return self.title
@@ -52,16 +58,29 @@ class Showtime(models.Model):
     ticket_price = models.DecimalField(max_digits=10, decimal_places=2, default=10.00)
     available_seats = models.IntegerField()
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped whenever the showtime or its sales change; the reporting
+    # rollups refresh showtimes changed since their last run
+    sales_updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         ordering = ['show_date', 'show_time']
         unique_together = ['movie', 'theater', 'show_date', 'show_time']
+        indexes = [
+            # A movie's upcoming schedule
+            models.Index(fields=['movie', 'show_date', 'show_time'], name='showtime_movie_date_idx'),
+            # Upcoming showtimes across all movies
+            models.Index(fields=['show_date', 'show_time'], name='showtime_date_idx'),
+        ]
     
     def __str__(self):
         return f"{self.movie.title} at {self.theater.name} - {self.show_date} {self.show_time}"
     
     def get_available_seats(self):
-        """Get count of available seats for this showtime"""
+        """Recount available seats from BookingItem rows.
+
+        ``available_seats`` is the maintained counter that pages should read;
+        this recount is only meant for repairs (see reconcile_seat_counts).
+        """
         from apps.bookings.models import BookingItem
         # Total seats in the theater (fallback to counting Seat objects)
         try:
@@ -69,7 +88,7 @@ class Showtime(models.Model):
         except Exception:
             from apps.movies.models import Seat as SeatModel
             total = SeatModel.objects.filter(theater=self.theater).count()
-        booked = BookingItem.objects.filter(showtime=self).count()
+        booked = BookingItem.objects.filter(showtime=self, active=True).count()
         return max(total - booked, 0)
     
     def update_available_seats(self):
@@ -77,6 +96,15 @@ class Showtime(models.Model):
         self.available_seats = self.get_available_seats()
         self.save()
 
+    def clean(self):
+        """Reject a screening that overlaps another one in the same theater"""
+        from django.core.exceptions import ValidationError
+        from .scheduling import showtime_conflict
+        if self.movie_id and self.theater_id and self.show_date and self.show_time:
+            clash = showtime_conflict(self)
+            if clash:
+                raise ValidationError(f"{self.theater.name} is busy with {clash} (including turnaround).")
+
     def save(self, *args, **kwargs):
         """Auto-fill available_seats on create if not provided.
 
@@ -0,0 +1,188 @@
+"""Seat pricing.
+
+A showtime's price table gives the price of each seat type: the
+showtime's ticket_price, scaled by the first matching weekday /
+time-of-day rule in SHOWTIME_PRICE_RULES, plus the seat type's
+SEAT_TYPE_SURCHARGES. Tables depend only on fields of the showtime row
+and those settings, so they are built without queries and memoized per
+process; changing either setting (override_settings) clears the memo.
+
+On top of that, demand pricing scales the table by a multiplier chosen
+from DEMAND_PRICING_TIERS by how full the showtime is
+(``available_seats`` against ``theater.total_seats``). The result is
+stored in the cache as a price snapshot for PRICE_SNAPSHOT_SECONDS, so
+every page and worker quotes the same prices for a while instead of
+each recomputing them. The movie page, the seat page and the seat holds
+taken at checkout all read the snapshot; a hold keeps the price it was
+quoted and the booking charges that, never a recomputed one.
+"""
+from collections import Counter
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from cinema_project.metrics import CACHE_REQUESTS
+
+CENT = Decimal('0.01')
+ONE = Decimal('1')
+
+
+class PriceTable:
+    """Prices per seat type for one showtime"""
+
+    def __init__(self, showtime_id, prices, rule=None, multiplier=ONE, occupancy=0.0):
+        self.showtime_id = showtime_id
+        self.prices = prices
+        self.rule = rule
+        self.multiplier = multiplier
+        self.occupancy = occupancy
+
+    def price(self, seat_type):
+        return self.prices.get(seat_type, self.prices['standard'])
+
+    @property
+    def lowest(self):
+        return min(self.prices.values())
+
+    def as_json(self):
+        """Prices as strings for the seat page script"""
+        return {seat_type: str(price) for seat_type, price in self.prices.items()}
+
+    def to_snapshot(self):
+        return {
+            'prices': self.as_json(), 'rule': self.rule,
+            'multiplier': str(self.multiplier), 'occupancy': self.occupancy,
+        }
+
+    @classmethod
+    def from_snapshot(cls, showtime_id, data):
+        return cls(
+            showtime_id, {seat_type: Decimal(price) for seat_type, price in data['prices'].items()},
+            data['rule'], Decimal(data['multiplier']), data['occupancy'],
+        )
+
+
+class Basket:
+    """A priced seat selection: ``lines`` of (seat, price) and the ``total``"""
+
+    def __init__(self, lines):
+        self.lines = lines
+        # One multiplication per distinct price rather than a running sum per seat
+        counts = Counter(price for _, price in lines)
+        self.total = sum((price * n for price, n in counts.items()), Decimal('0.00'))
+
+    def __len__(self):
+        return len(self.lines)
+
+
+def matching_rule(show_date, show_time):
+    """The first SHOWTIME_PRICE_RULES entry covering the show's weekday and start time"""
+    weekday = show_date.weekday()
+    starts_at = show_time.strftime('%H:%M')
+    for rule in settings.SHOWTIME_PRICE_RULES:
+        label, weekdays, starts, ends, multiplier = rule
+        if weekday in weekdays and starts <= starts_at < ends:
+            return rule
+    return None
+
+
+@lru_cache(maxsize=4096)
+def _build_table(showtime_id, base, show_date, show_time):
+    rule = matching_rule(show_date, show_time)
+    if rule is not None:
+        base = (base * Decimal(rule[4])).quantize(CENT, ROUND_HALF_UP)
+    prices = {
+        seat_type: base + Decimal(surcharge)
+        for seat_type, surcharge in settings.SEAT_TYPE_SURCHARGES.items()
+    }
+    return PriceTable(showtime_id, prices, rule[0] if rule else None)
+
+
+@receiver(setting_changed)
+def clear_price_tables(setting, **kwargs):
+    if setting in ('SHOWTIME_PRICE_RULES', 'SEAT_TYPE_SURCHARGES'):
+        _build_table.cache_clear()
+
+
+def price_table(showtime):
+    """The PriceTable for ``showtime`` before demand pricing; no queries.
+
+    Keyed on the fields it is built from, so editing a showtime's price
+    or schedule yields a fresh table.
+    """
+    return _build_table(showtime.pk, Decimal(showtime.ticket_price), showtime.show_date, showtime.show_time)
+
+
+def demand_multiplier(available_seats, total_seats):
+    """The DEMAND_PRICING_TIERS multiplier for a showtime this full"""
+    occupancy = 1 - available_seats / total_seats if total_seats else 0
+    multiplier = ONE
+    for threshold, tier_multiplier in settings.DEMAND_PRICING_TIERS:
+        if occupancy >= threshold:
+            multiplier = Decimal(tier_multiplier)
+    return multiplier, max(occupancy, 0)
+
+
+def demand_table(showtime):
+    """Price the showtime for its current occupancy (needs ``showtime.theater``)"""
+    table = price_table(showtime)
+    multiplier, occupancy = demand_multiplier(showtime.available_seats, showtime.theater.total_seats)
+    prices = {
+        seat_type: (price * multiplier).quantize(CENT, ROUND_HALF_UP)
+        for seat_type, price in table.prices.items()
+    }
+    return PriceTable(showtime.pk, prices, table.rule, multiplier, occupancy)
+
+
+def snapshot_key(showtime):
+    # The base price and schedule are part of the key so an edited showtime is repriced at once
+    return f'pricing:snapshot:{showtime.pk}:{showtime.ticket_price}:{showtime.show_date}:{showtime.show_time}'
+
+
+def price_snapshots(showtimes):
+    """Current prices for several showtimes with one cache round trip.
+
+    Showtimes without a live snapshot are priced from their
+    ``available_seats`` (select_related the theater) and stored for
+    PRICE_SNAPSHOT_SECONDS. Returns {showtime id: PriceTable}.
+    """
+    keys = {snapshot_key(showtime): showtime for showtime in showtimes}
+    cached = cache.get_many(keys)
+    tables, fresh = {}, {}
+    for key, showtime in keys.items():
+        if key in cached:
+            tables[showtime.pk] = PriceTable.from_snapshot(showtime.pk, cached[key])
+        else:
+            tables[showtime.pk] = table = demand_table(showtime)
+            fresh[key] = table.to_snapshot()
+    if fresh:
+        cache.set_many(fresh, settings.PRICE_SNAPSHOT_SECONDS)
+        CACHE_REQUESTS.inc(len(fresh), cache='price_snapshot', result='miss')
+    if len(keys) > len(fresh):
+        CACHE_REQUESTS.inc(len(keys) - len(fresh), cache='price_snapshot', result='hit')
+    return tables
+
+
+def price_snapshot(showtime):
+    return price_snapshots([showtime])[showtime.pk]
+
+
+def price_basket(showtime, seats, locked=None):
+    """Price ``seats`` from the showtime's snapshot.
+
+    ``locked`` maps seat ids to prices already quoted to the customer
+    (their seat holds); those are kept and the snapshot is only read for
+    the rest.
+    """
+    locked = locked or {}
+    if all(seat.id in locked for seat in seats):
+        return Basket([(seat, locked[seat.id]) for seat in seats])
+    table = price_snapshot(showtime)
+    # A locked price of 0.00 (a free seat) is still a quote to keep
+    return Basket([
+        (seat, locked[seat.id] if seat.id in locked else table.price(seat.seat_type)) for seat in seats
+    ])
@@ -0,0 +1,199 @@
+"""Showtime scheduling with overlap detection.
+
+A screening occupies its theater from ``show_time`` for the movie's
+duration plus SHOWTIME_TURNAROUND_MINUTES of cleaning. ``plan_schedule``
+lays movies onto slot templates over a date range and checks every
+candidate against an interval index per (theater, day) that is seeded
+with the existing showtimes in a single query, so a season of tens of
+thousands of showtimes is planned in memory and reported in bulk.
+``create_schedule`` then writes the accepted showtimes in one
+transaction.
+"""
+from bisect import bisect_left
+from collections import namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+
+from .cache import bump_catalogue_version
+from .models import Showtime, Theater
+
+MINUTES_PER_DAY = 24 * 60
+
+# weekdays: a set of day numbers (0 = Monday), or None for every day
+SlotTemplate = namedtuple('SlotTemplate', 'start price weekdays', defaults=(None,))
+
+Conflict = namedtuple('Conflict', 'theater show_date show_time movie clashes_with')
+
+
+def parse_slots(text, default_price):
+    """Parse ``"10:30, 13:30@280, 22:15@320/4-6"`` into SlotTemplates.
+
+    Each slot is ``HH:MM``, optionally ``@price`` and ``/weekdays`` as a
+    range or comma-free list of digits (0 = Monday). Raises ValueError.
+    """
+    slots = []
+    for part in filter(None, (p.strip() for p in text.split(','))):
+        part, _, days = part.partition('/')
+        start, _, price = part.partition('@')
+        weekdays = None
+        if days:
+            if '-' in days:
+                first, last = days.split('-')
+                weekdays = frozenset(range(int(first), int(last) + 1))
+            else:
+                weekdays = frozenset(int(d) for d in days)
+            if not weekdays <= set(range(7)):
+                raise ValueError("Weekdays must be 0-6: %r" % days)
+        slots.append(SlotTemplate(
+            datetime.strptime(start.strip(), '%H:%M').time(),
+            Decimal(price) if price else Decimal(default_price),
+            weekdays,
+        ))
+    if not slots:
+        raise ValueError("No slots given")
+    return sorted(slots, key=lambda s: s.start)
+
+
+class IntervalIndex:
+    """Occupied [start, end) minute ranges of one theater on one day"""
+
+    def __init__(self):
+        self.starts = []
+        self.intervals = []  # (start, end, label), sorted like starts
+        self.longest = 0
+
+    def overlapping(self, start, end):
+        """The label of an interval overlapping [start, end), or None"""
+        # Only intervals starting within ``longest`` minutes before ``start`` can reach it
+        lo = bisect_left(self.starts, start - self.longest + 1)
+        hi = bisect_left(self.starts, end)
+        for other_start, other_end, label in self.intervals[lo:hi]:
+            if other_end > start:
+                return label
+        return None
+
+    def add(self, start, end, label):
+        i = bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.intervals.insert(i, (start, end, label))
+        self.longest = max(self.longest, end - start)
+
+
+class TheaterCalendar:
+    """Interval indexes per (theater, day); screenings past midnight spill into the next day"""
+
+    def __init__(self, turnaround):
+        self.turnaround = turnaround
+        self._days = {}
+
+    def _span(self, show_time, duration):
+        start = show_time.hour * 60 + show_time.minute
+        return start, start + duration + self.turnaround
+
+    def conflict(self, theater_id, show_date, show_time, duration):
+        start, end = self._span(show_time, duration)
+        label = self._index(theater_id, show_date).overlapping(start, end)
+        if label is None and end > MINUTES_PER_DAY:
+            label = self._index(theater_id, show_date + timedelta(days=1)).overlapping(0, end - MINUTES_PER_DAY)
+        return label
+
+    def add(self, theater_id, show_date, show_time, duration, label):
+        start, end = self._span(show_time, duration)
+        self._index(theater_id, show_date).add(start, min(end, MINUTES_PER_DAY), label)
+        if end > MINUTES_PER_DAY:
+            self._index(theater_id, show_date + timedelta(days=1)).add(0, end - MINUTES_PER_DAY, label)
+
+    def _index(self, theater_id, day):
+        index = self._days.get((theater_id, day))
+        if index is None:
+            index = self._days[(theater_id, day)] = IntervalIndex()
+        return index
+
+
+def load_calendar(theater_ids, start_date, end_date, exclude=None):
+    """A TheaterCalendar holding the showtimes already booked in the range (one query)"""
+    calendar = TheaterCalendar(settings.SHOWTIME_TURNAROUND_MINUTES)
+    existing = Showtime.objects.filter(
+        theater_id__in=theater_ids,
+        # The day before may spill past midnight, and the last day's late
+        # shows spill into the day after
+        show_date__gte=start_date - timedelta(days=1),
+        show_date__lte=end_date + timedelta(days=1),
+    )
+    if exclude is not None:
+        existing = existing.exclude(pk=exclude)
+    for pk, theater_id, show_date, show_time, duration, title in existing.values_list(
+        'pk', 'theater_id', 'show_date', 'show_time', 'movie__duration', 'movie__title'
+    ).iterator(chunk_size=5000):
+        calendar.add(theater_id, show_date, show_time, duration,
+                     f"{title} at {show_time:%H:%M} on {show_date}")
+    return calendar
+
+
+def showtime_conflict(showtime):
+    """Describe the showtime that ``showtime`` would overlap, or None"""
+    calendar = load_calendar([showtime.theater_id], showtime.show_date, showtime.show_date, exclude=showtime.pk)
+    return calendar.conflict(showtime.theater_id, showtime.show_date, showtime.show_time, showtime.movie.duration)
+
+
+class SchedulePlan:
+    """Showtimes to create and the candidates rejected as conflicts"""
+
+    def __init__(self):
+        self.showtimes = []
+        self.conflicts = []
+
+
+def plan_schedule(start_date, end_date, movies, theaters, slots):
+    """Plan showtimes for every day from ``start_date`` to ``end_date`` inclusive.
+
+    Movies rotate across theaters and slots so each day gives every movie
+    a different hour than the day before. Candidates that overlap an
+    existing or already planned screening are collected as Conflicts.
+    """
+    movies, theaters = list(movies), list(theaters)
+    plan = SchedulePlan()
+    if not movies or not theaters:
+        return plan
+    calendar = load_calendar([t.pk for t in theaters], start_date, end_date)
+
+    day = start_date
+    day_number = 0
+    while day <= end_date:
+        weekday = day.weekday()
+        todays_slots = [s for s in slots if s.weekdays is None or weekday in s.weekdays]
+        for theater_number, theater in enumerate(theaters):
+            for slot_number, slot in enumerate(todays_slots):
+                movie = movies[(day_number + theater_number + slot_number) % len(movies)]
+                clash = calendar.conflict(theater.pk, day, slot.start, movie.duration)
+                if clash is not None:
+                    plan.conflicts.append(Conflict(theater, day, slot.start, movie, clash))
+                    continue
+                calendar.add(theater.pk, day, slot.start, movie.duration,
+                             f"{movie.title} at {slot.start:%H:%M} on {day}")
+                plan.showtimes.append(Showtime(
+                    movie=movie, theater=theater, show_date=day, show_time=slot.start,
+                    ticket_price=slot.price, available_seats=theater.total_seats,
+                ))
+        day += timedelta(days=1)
+        day_number += 1
+    return plan
+
+
+def create_schedule(start_date, end_date, movies, theaters, slots, batch_size=2000):
+    """Plan and bulk-create a schedule in one transaction; returns the SchedulePlan.
+
+    The theaters are locked first so two schedulers (or an admin editing
+    a showtime) cannot interleave between the conflict check and insert.
+    """
+    with transaction.atomic():
+        theaters = list(Theater.objects.select_for_update().filter(pk__in=[t.pk for t in theaters]).order_by('pk'))
+        plan = plan_schedule(start_date, end_date, movies, theaters, slots)
+        Showtime.objects.bulk_create(plan.showtimes, batch_size=batch_size)
+        if plan.showtimes:
+            # bulk_create sends no post_save signals
+            transaction.on_commit(bump_catalogue_version)
+    return plan
@@ -0,0 +1,144 @@
+"""Ranked full-text movie search.
+
+Backed by the index created in migration 0002_movie_search_index: a GIN
+indexed tsvector column on PostgreSQL and an FTS5 table on SQLite. Other
+databases fall back to unranked ``icontains`` matching.
+
+``search_movies`` returns a lazy, sliceable result set that Django's
+Paginator can page through; only the requested page is ranked and loaded.
+"""
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+
+from .models import Movie
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _tokens(query):
+    return _TOKEN_RE.findall(query.lower())[:16]
+
+
+class _Backend:
+    """Builds the vendor-specific ``(sql, params)`` for matching ids.
+
+    Each vendor subclass provides ``count_sql()`` and
+    ``page_sql(limit, offset)``.
+    """
+
+    def __init__(self, tokens, status):
+        self.tokens = tokens
+        self.status = status
+
+
+class _PostgresBackend(_Backend):
+
+    def _tsquery(self):
+        # Tokens are plain \w+ runs, so they cannot smuggle tsquery operators
+        return ' & '.join(f'{t}:*' for t in self.tokens)
+
+    def count_sql(self):
+        return (
+            "SELECT COUNT(*) FROM movies_movie "
+            "WHERE status = %s AND search_vector @@ to_tsquery('english', %s)",
+            [self.status, self._tsquery()],
+        )
+
+    def page_sql(self, limit, offset):
+        return (
+            "SELECT id FROM movies_movie "
+            "WHERE status = %s AND search_vector @@ to_tsquery('english', %s) "
+            "ORDER BY ts_rank(search_vector, to_tsquery('english', %s)) DESC, id "
+            "LIMIT %s OFFSET %s",
+            [self.status, self._tsquery(), self._tsquery(), limit, offset],
+        )
+
+
+class _SQLiteBackend(_Backend):
+
+    def _match(self):
+        # Quote every token so FTS5 syntax characters are taken literally
+        return ' '.join(f'"{t}"*' for t in self.tokens)
+
+    def count_sql(self):
+        return (
+            "SELECT COUNT(*) FROM movies_movie_fts f "
+            "JOIN movies_movie m ON m.id = f.rowid "
+            "WHERE movies_movie_fts MATCH %s AND m.status = %s",
+            [self._match(), self.status],
+        )
+
+    def page_sql(self, limit, offset):
+        # bm25 column weights: title, director, genre, description
+        return (
+            "SELECT m.id FROM movies_movie_fts f "
+            "JOIN movies_movie m ON m.id = f.rowid "
+            "WHERE movies_movie_fts MATCH %s AND m.status = %s "
+            "ORDER BY bm25(movies_movie_fts, 10.0, 4.0, 4.0, 1.0), m.id "
+            "LIMIT %s OFFSET %s",
+            [self._match(), self.status, limit, offset],
+        )
+
+
+_BACKENDS = {
+    'postgresql': _PostgresBackend,
+    'sqlite': _SQLiteBackend,
+}
+
+
+class SearchResults:
+    """Lazy ranked result set; supports ``count()``, ``len()`` and slicing"""
+
+    def __init__(self, backend, using):
+        self._backend = backend
+        self._using = using
+        self._count = None
+
+    def _fetch_ids(self, sql, params):
+        with connections[self._using].cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def count(self):
+        if self._count is None:
+            sql, params = self._backend.count_sql()
+            with connections[self._using].cursor() as cursor:
+                cursor.execute(sql, params)
+                self._count = cursor.fetchone()[0]
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        stop = key.stop if key.stop is not None else self.count()
+        if stop <= start:
+            return []
+        ids = self._fetch_ids(*self._backend.page_sql(stop - start, start))
+        movies = Movie.objects.using(self._using).in_bulk(ids)
+        return [movies[i] for i in ids if i in movies]
+
+
+def search_movies(query, status='active'):
+    """Return movies matching ``query`` in title, director, genre or description.
+
+    Results are ranked by relevance where the database supports it.
+    """
+    tokens = _tokens(query)
+    # Raw SQL bypasses the router, so pick the database the way it would
+    using = router.db_for_read(Movie)
+    backend = _BACKENDS.get(connections[using].vendor)
+    if not tokens:
+        return Movie.objects.none()
+    if backend is None:
+        match = Q()
+        for token in tokens:
+            match &= Q(title__icontains=token) | Q(director__icontains=token) \
+                | Q(genre__icontains=token) | Q(description__icontains=token)
+        return Movie.objects.filter(match, status=status).order_by('title')
+    return SearchResults(backend(tokens, status), using)
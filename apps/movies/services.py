@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Showtime
+
+
+def upcoming_showtimes(movie, days=30):
+    """Showtimes for ``movie`` over the next ``days`` days in a single query.
+
+    Each showtime carries its theater (select_related) and a ``booked``
+    annotation with the number of sold seats.
+    """
+    today = timezone.localdate()
+    return list(
+        Showtime.objects.filter(
+            movie=movie,
+            show_date__gte=today,
+            show_date__lte=today + timedelta(days=days),
+        )
+        .select_related('theater')
+        .annotate(booked=Count('bookingitem', filter=Q(bookingitem__active=True)))
+        .order_by('show_date', 'theater__name', 'show_time')
+    )
+
+
+def group_schedule(showtimes):
+    """Group an ordered showtime list by date, then theater, for templates.
+
+    Returns ``[{'date': date, 'theaters': [{'theater': t, 'showtimes': [...]}]}]``.
+    """
+    schedule = []
+    for showtime in showtimes:
+        if not schedule or schedule[-1]['date'] != showtime.show_date:
+            schedule.append({'date': showtime.show_date, 'theaters': []})
+        theaters = schedule[-1]['theaters']
+        if not theaters or theaters[-1]['theater'].id != showtime.theater_id:
+            theaters.append({'theater': showtime.theater, 'showtimes': []})
+        theaters[-1]['showtimes'].append(showtime)
+    return schedule
@@ -0,0 +1,14 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.bookings.models import Review
+from .cache import bump_catalogue_version
+from .models import Movie, Showtime
+
+
+@receiver([post_save, post_delete], sender=Movie)
+@receiver([post_save, post_delete], sender=Showtime)
+@receiver([post_save, post_delete], sender=Review)
+def invalidate_catalogue_cache(sender, **kwargs):
+    """Any catalogue change makes cached pages and fragments stale"""
+    bump_catalogue_version()
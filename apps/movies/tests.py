@@ -0,0 +1,230 @@
+from datetime import time, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Movie, Theater, Seat, Showtime
+from .pricing import demand_multiplier, demand_table, price_basket, price_snapshot, price_table
+from .scheduling import SlotTemplate, create_schedule
+from .search import search_movies
+
+# Plain HTTP and unhashed static files, whatever DEBUG the suite runs with
+WEB_SETTINGS = dict(
+    SECURE_SSL_REDIRECT=False,
+    STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage',
+)
+
+
+def create_movie(title='Test Movie', duration=120, **kwargs):
+    return Movie.objects.create(
+        title=title, description=kwargs.pop('description', '-'), genre=kwargs.pop('genre', 'Drama'),
+        director=kwargs.pop('director', '-'),
+        duration=duration, release_date=timezone.localdate(), **kwargs
+    )
+
+
+def create_theater(name='Hall 1', rows='ABC', columns=10):
+    theater = Theater.objects.create(name=name, location='-', total_seats=len(rows) * columns)
+    Seat.objects.bulk_create([
+        Seat(theater=theater, seat_number=f'{row}{column}', row=row, column=column,
+             seat_type='vip' if row == rows[-1] else 'standard')
+        for row in rows for column in range(1, columns + 1)
+    ])
+    return theater
+
+
+def create_showtime(movie, theater, days=1, at=time(19, 0), price='300.00'):
+    return Showtime.objects.create(
+        movie=movie, theater=theater, show_date=timezone.localdate() + timedelta(days=days),
+        show_time=at, ticket_price=price, available_seats=theater.total_seats,
+    )
+
+
+@override_settings(**WEB_SETTINGS)
+class MovieDetailQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = create_movie()
+        cls.theaters = [create_theater(f'Hall {n}') for n in range(3)]
+        create_showtime(cls.movie, cls.theaters[0])
+
+    def get_detail(self):
+        # Measure the uncached page
+        cache.clear()
+        return self.client.get(reverse('movie_detail', args=[self.movie.pk]))
+
+    def test_query_count_does_not_grow_with_showtimes(self):
+        # Movie, its schedule (one annotated query) and reviews
+        with self.assertNumQueries(3):
+            self.get_detail()
+
+        for day in range(1, 15):
+            for theater in self.theaters:
+                create_showtime(self.movie, theater, days=day, at=time(13, 0))
+        with self.assertNumQueries(3):
+            response = self.get_detail()
+        self.assertEqual(len(response.context['showtimes']), 1 + 14 * 3)
+
+
+@override_settings(**WEB_SETTINGS, CATALOGUE_CACHE_TIMEOUT=600, PRICE_SNAPSHOT_SECONDS=60)
+class PageCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.movie = create_movie()
+        create_showtime(cls.movie, create_theater())
+
+    def cached_timeouts(self, url):
+        cache.clear()
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.client.get(url)
+        return [c.args[2] for c in cache_set.call_args_list if c.args[0].startswith('catalogue:page:')]
+
+    def test_pages_quoting_prices_expire_with_the_price_snapshot(self):
+        self.assertEqual(self.cached_timeouts(reverse('movie_detail', args=[self.movie.pk])), [60])
+        self.assertEqual(self.cached_timeouts(reverse('movie_list')), [600])
+
+
+@override_settings(SHOWTIME_TURNAROUND_MINUTES=15)
+class ScheduleOverlapTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.theater = create_theater()
+        cls.movie = create_movie(duration=150)
+        # Just after midnight on the day after the one being scheduled
+        cls.late = create_showtime(cls.movie, cls.theater, days=2, at=time(0, 30))
+        cls.day = cls.late.show_date - timedelta(days=1)
+
+    def test_show_crossing_midnight_clashes_with_the_next_day(self):
+        plan = create_schedule(self.day, self.day, [self.movie], [self.theater],
+                               [SlotTemplate(time(23, 0), Decimal('300.00'))])
+        self.assertEqual(plan.showtimes, [])
+        self.assertEqual(len(plan.conflicts), 1)
+        self.assertFalse(Showtime.objects.filter(show_date=self.day).exists())
+
+        showtime = Showtime(movie=self.movie, theater=self.theater, show_date=self.day,
+                            show_time=time(23, 0), ticket_price='300.00')
+        with self.assertRaises(ValidationError):
+            showtime.clean()
+        # Ending (with turnaround) at 00:30 fits
+        showtime.show_time = time(21, 45)
+        showtime.clean()
+
+
+@override_settings(SHOWTIME_PRICE_RULES=[], DEMAND_PRICING_TIERS=[])
+class PricingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.showtime = create_showtime(create_movie(), create_theater(rows='AB', columns=2), price='200.00')
+        cls.seats = list(cls.showtime.theater.seats.order_by('row', 'column'))
+
+    def setUp(self):
+        cache.clear()
+
+    def test_free_locked_price_is_kept(self):
+        first, second = self.seats[:2]
+        basket = price_basket(self.showtime, [first, second], {first.id: Decimal('0.00')})
+        self.assertEqual(basket.lines, [(first, Decimal('0.00')), (second, Decimal('200.00'))])
+        self.assertEqual(basket.total, Decimal('200.00'))
+
+    def test_tables_follow_setting_changes(self):
+        with override_settings(SEAT_TYPE_SURCHARGES={'standard': '0.00', 'vip': '50.00'}):
+            self.assertEqual(price_table(self.showtime).price('vip'), Decimal('250.00'))
+        with override_settings(SEAT_TYPE_SURCHARGES={'standard': '0.00', 'vip': '80.00'}):
+            self.assertEqual(price_table(self.showtime).price('vip'), Decimal('280.00'))
+        rules = [('Matinee', range(7), '00:00', '23:59', '0.5')]
+        with override_settings(SHOWTIME_PRICE_RULES=rules):
+            self.assertEqual(price_table(self.showtime).rule, 'Matinee')
+
+
+DEMAND_SETTINGS = dict(
+    SHOWTIME_PRICE_RULES=[], SEAT_TYPE_SURCHARGES={'standard': '0.00', 'vip': '50.00'},
+    DEMAND_PRICING_TIERS=[(0.50, '1.10'), (0.75, '1.20'), (0.90, '1.35')], PRICE_SNAPSHOT_SECONDS=60,
+)
+
+
+@override_settings(**DEMAND_SETTINGS)
+class DemandPricingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.showtime = create_showtime(create_movie(), create_theater(rows='AB', columns=5), price='200.00')
+
+    def setUp(self):
+        cache.clear()
+        self.showtime.refresh_from_db()
+
+    def test_multiplier_tiers(self):
+        for available, multiplier in [(100, '1'), (51, '1'), (50, '1.10'), (26, '1.10'),
+                                      (25, '1.20'), (11, '1.20'), (10, '1.35'), (0, '1.35')]:
+            self.assertEqual(demand_multiplier(available, 100)[0], Decimal(multiplier), available)
+        self.assertEqual(demand_multiplier(0, 0), (Decimal('1'), 0))
+
+        self.showtime.available_seats = 1
+        table = demand_table(self.showtime)
+        self.assertEqual((table.multiplier, table.occupancy), (Decimal('1.35'), 0.9))
+        self.assertEqual(table.prices, {'standard': Decimal('270.00'), 'vip': Decimal('337.50')})
+
+    def test_snapshot_holds_prices_until_it_expires(self):
+        self.assertEqual(price_snapshot(self.showtime).price('standard'), Decimal('200.00'))
+        self.showtime.available_seats = 2
+        # Demand changed, but the snapshot is still live
+        self.assertEqual(price_snapshot(self.showtime).price('standard'), Decimal('200.00'))
+
+        with mock.patch('time.time', return_value=timezone.now().timestamp() + 59):
+            self.assertEqual(price_snapshot(self.showtime).multiplier, Decimal('1'))
+        with mock.patch('time.time', return_value=timezone.now().timestamp() + 61):
+            self.assertEqual(price_snapshot(self.showtime).price('standard'), Decimal('240.00'))
+
+
+def has_full_text_index():
+    if connection.vendor == 'postgresql':
+        return True
+    return connection.vendor == 'sqlite' and 'movies_movie_fts' in connection.introspection.table_names()
+
+
+class MovieSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.heist = create_movie('Dragon Heist', description='A crew plans one last job.', director='Mann')
+        cls.legend = create_movie('Winter Legend', description='A dragon wakes under the ice.', director='Lee')
+        cls.noir = create_movie('Night City', genre='Noir', director='Villeneuve')
+        cls.archived = create_movie('Dragon Archive', status='archived')
+
+    def setUp(self):
+        if not has_full_text_index():
+            self.skipTest('No full-text index on %s' % connection.vendor)
+
+    def titles(self, query):
+        return [movie.title for movie in search_movies(query)[:10]]
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.titles('dragon'), ['Dragon Heist', 'Winter Legend'])
+        # Prefixes match and every word must match
+        self.assertEqual(self.titles('drag ice'), ['Winter Legend'])
+        results = search_movies('dragon')
+        self.assertEqual((results.count(), len(results[1:])), (2, 1))
+
+    def test_director_and_genre_match(self):
+        self.assertEqual(self.titles('villeneuve'), ['Night City'])
+        self.assertEqual(self.titles('noir'), ['Night City'])
+        # FTS syntax in the query is taken literally
+        self.assertEqual(self.titles('noir"*'), ['Night City'])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.heist.title = 'Ocean Heist'
+        self.heist.save()
+        self.assertEqual(self.titles('dragon'), ['Winter Legend'])
+        self.assertEqual(self.titles('ocean'), ['Ocean Heist'])
+        self.legend.delete()
+        self.assertEqual(self.titles('dragon'), [])
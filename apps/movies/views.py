@@ -1,10 +1,19 @@
 from django.shortcuts import render, get_object_or_404
 from django.views import View
 from django.views.generic import ListView, DetailView
+from django.core.paginator import Paginator
+from django.utils.decorators import method_decorator
+from cinema_project.db_router import use_replica
+from .cache import cache_anonymous_page
 from .models import Movie, Showtime
+from .pricing import price_snapshots
+from .services import upcoming_showtimes, group_schedule
+from .search import search_movies
 from datetime import datetime, timedelta
 
 
+@method_decorator(cache_anonymous_page, name='dispatch')
+@method_decorator(use_replica, name='dispatch')
 class MovieListView(ListView):
     """View for listing all movies"""
     model = Movie
@@ -25,6 +34,8 @@ class MovieListView(ListView):
         return context
 
 
+@method_decorator(cache_anonymous_page(shows_prices=True), name='dispatch')
+@method_decorator(use_replica, name='dispatch')
 class MovieDetailView(DetailView):
     """View for movie details and showtimes"""
     model = Movie
@@ -35,31 +46,37 @@ class MovieDetailView(DetailView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Get showtimes for the next 30 days
-        future_date = datetime.now() + timedelta(days=30)
-        context['showtimes'] = Showtime.objects.filter(
-            movie=self.object,
-            show_date__gte=datetime.now().date(),
-            show_date__lte=future_date.date()
-        ).order_by('show_date', 'show_time')
+        # Get showtimes for the next 30 days, grouped by date and theater
+        showtimes = upcoming_showtimes(self.object, days=30)
+        # Cheapest current seat per showtime, from the shared price snapshots
+        prices = price_snapshots(showtimes)
+        for showtime in showtimes:
+            showtime.price_from = prices[showtime.pk].lowest
+        context['showtimes'] = showtimes
+        context['schedule'] = group_schedule(showtimes)
+        context['reviews'] = self.object.reviews.select_related('user')
         return context
 
 
+@method_decorator(use_replica, name='dispatch')
 class MovieSearchView(View):
     """View for searching movies"""
+    paginate_by = 12
+
     def get(self, request):
         query = request.GET.get('q', '')
-        movies = Movie.objects.filter(status='active')
         
         if query:
-            movies = movies.filter(
-                title__icontains=query
-            ) | movies.filter(
-                description__icontains=query
-            )
+            movies = search_movies(query)
+        else:
+            movies = Movie.objects.filter(status='active')
         
+        paginator = Paginator(movies, self.paginate_by)
+        page_obj = paginator.get_page(request.GET.get('page'))
         context = {
-            'movies': movies,
+            'movies': page_obj.object_list,
+            'page_obj': page_obj,
+            'is_paginated': page_obj.has_other_pages(),
             'query': query,
         }
         return render(request, 'movies/movie_list.html', context)
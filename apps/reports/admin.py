@@ -0,0 +1,82 @@
+from django.contrib import admin
+from django.http import HttpResponse
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.decorators import method_decorator
+
+from cinema_project.db_router import use_replica
+from .forms import ReportForm
+from .models import ShowtimeSales, RollupRun
+from .reports import GROUPINGS, report_totals, sales_report, write_report_csv
+
+
+@admin.register(ShowtimeSales)
+class ShowtimeSalesAdmin(admin.ModelAdmin):
+    """Read-only rollup rows plus the sales report (reads rollups only)"""
+    list_display = ('show_date', 'showtime', 'movie', 'theater', 'bookings', 'tickets', 'capacity', 'occupancy_display', 'revenue')
+    list_filter = ('show_date', 'theater')
+    list_select_related = ('showtime', 'showtime__movie', 'showtime__theater', 'movie', 'theater')
+    search_fields = ('movie__title', 'theater__name')
+    date_hierarchy = 'show_date'
+    change_list_template = 'admin/reports/showtimesales/change_list.html'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='Occupancy')
+    def occupancy_display(self, obj):
+        return f"{obj.occupancy:.0%}"
+
+    @method_decorator(use_replica)
+    def changelist_view(self, request, extra_context=None):
+        return super().changelist_view(request, extra_context)
+
+    def get_urls(self):
+        return [
+            path('report/', self.admin_site.admin_view(self.report_view), name='reports_showtimesales_report'),
+        ] + super().get_urls()
+
+    @method_decorator(use_replica)
+    def report_view(self, request):
+        """Sales and occupancy per movie, theater or day; ?format=csv downloads it"""
+        form = ReportForm(request.GET or None, initial=ReportForm.initial_for_month())
+        report = None
+        if form.is_valid():
+            data = form.cleaned_data
+            report = sales_report(data['start_date'], data['end_date'], data['group_by'])
+            if request.GET.get('format') == 'csv':
+                response = HttpResponse(content_type='text/csv')
+                response['Content-Disposition'] = 'attachment; filename="sales-%s-%s-%s.csv"' % (
+                    data['group_by'], data['start_date'], data['end_date'])
+                write_report_csv(report, data['group_by'], response)
+                return response
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Sales report',
+            'form': form,
+            'report': report,
+            'group_label': GROUPINGS[form.cleaned_data['group_by']][0] if report is not None else '',
+            'totals': report_totals(report) if report is not None else None,
+            'last_run': RollupRun.objects.filter(finished_at__isnull=False).first(),
+            'csv_query': request.GET.urlencode(),
+        }
+        return TemplateResponse(request, 'admin/reports/showtimesales/report.html', context)
+
+
+@admin.register(RollupRun)
+class RollupRunAdmin(admin.ModelAdmin):
+    list_display = ('started_at', 'finished_at', 'full', 'showtimes')
+    list_filter = ('full',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
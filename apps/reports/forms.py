@@ -0,0 +1,23 @@
+from django import forms
+from django.utils import timezone
+
+from .reports import GROUPINGS
+
+
+class ReportForm(forms.Form):
+    start_date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    end_date = forms.DateField(widget=forms.DateInput(attrs={'type': 'date'}))
+    group_by = forms.ChoiceField(choices=[(key, label) for key, (label, _) in GROUPINGS.items()], initial='movie')
+
+    @classmethod
+    def initial_for_month(cls):
+        """This month so far"""
+        today = timezone.localdate()
+        return {'start_date': today.replace(day=1), 'end_date': today, 'group_by': 'movie'}
+
+    def clean(self):
+        cleaned = super().clean()
+        start, end = cleaned.get('start_date'), cleaned.get('end_date')
+        if start and end and end < start:
+            raise forms.ValidationError("The end date is before the start date.")
+        return cleaned
@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.reports.rollups import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = ("Refresh the daily sales/occupancy rollups behind the admin sales report. "
+            "By default only showtimes changed since the last run are recomputed; run it from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recompute every showtime')
+        parser.add_argument('--start', help='With --full: first show date (YYYY-MM-DD)')
+        parser.add_argument('--end', help='With --full: last show date (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        try:
+            start = date.fromisoformat(options['start']) if options['start'] else None
+            end = date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+        if (start or end) and not options['full']:
+            raise CommandError("--start and --end only apply with --full")
+
+        run = refresh_rollups(full=options['full'], start_date=start, end_date=end)
+        self.stdout.write(self.style.SUCCESS("Refreshed %d showtimes (%s) in %.2fs" % (
+            run.showtimes, 'full' if run.full else 'incremental',
+            (run.finished_at - run.started_at).total_seconds())))
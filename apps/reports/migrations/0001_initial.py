@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('movies', '0004_showtime_sales_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollupRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('started_at', models.DateTimeField()),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('full', models.BooleanField(default=False)),
+                ('showtimes', models.IntegerField(default=0)),
+            ],
+            options={
+                'ordering': ['-started_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ShowtimeSales',
+            fields=[
+                ('showtime', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sales', serialize=False, to='movies.showtime')),
+                ('show_date', models.DateField()),
+                ('bookings', models.IntegerField(default=0)),
+                ('tickets', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('capacity', models.IntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField()),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movies.movie')),
+                ('theater', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movies.theater')),
+            ],
+            options={
+                'verbose_name': 'showtime sales',
+                'verbose_name_plural': 'showtime sales',
+                'ordering': ['-show_date'],
+                'indexes': [models.Index(fields=['show_date', 'movie'], name='sales_date_movie_idx'), models.Index(fields=['show_date', 'theater'], name='sales_date_theater_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,51 @@
+from django.db import models
+
+from apps.movies.models import Movie, Theater, Showtime
+
+
+class ShowtimeSales(models.Model):
+    """Daily sales rollup: one row per showtime, dated by its show date.
+
+    Maintained by apps.reports.rollups from Booking/BookingItem; reports
+    aggregate these rows instead of scanning booking items.
+    """
+    showtime = models.OneToOneField(Showtime, on_delete=models.CASCADE, primary_key=True, related_name='sales')
+    show_date = models.DateField()
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name='+')
+    theater = models.ForeignKey(Theater, on_delete=models.CASCADE, related_name='+')
+    bookings = models.IntegerField(default=0)
+    tickets = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    capacity = models.IntegerField(default=0)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = 'showtime sales'
+        verbose_name_plural = 'showtime sales'
+        ordering = ['-show_date']
+        indexes = [
+            models.Index(fields=['show_date', 'movie'], name='sales_date_movie_idx'),
+            models.Index(fields=['show_date', 'theater'], name='sales_date_theater_idx'),
+        ]
+
+    def __str__(self):
+        return f"Sales for showtime #{self.showtime_id} on {self.show_date}"
+
+    @property
+    def occupancy(self):
+        """Share of seats sold, 0-1"""
+        return self.tickets / self.capacity if self.capacity else 0
+
+
+class RollupRun(models.Model):
+    """One refresh of the sales rollups; the last finished run is the next run's starting point"""
+    started_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True, blank=True)
+    full = models.BooleanField(default=False)
+    showtimes = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ['-started_at']
+
+    def __str__(self):
+        return f"Rollup run {self.started_at:%Y-%m-%d %H:%M:%S} ({self.showtimes} showtimes)"
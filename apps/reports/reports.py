@@ -0,0 +1,63 @@
+"""Sales and occupancy reports aggregated from the ShowtimeSales rollups"""
+import csv
+
+from django.db.models import Count, F, Sum
+
+from .models import ShowtimeSales
+
+# group_by choice -> (label, rollup columns to group on)
+GROUPINGS = {
+    'movie': ('Movie', ['movie_id', 'movie__title']),
+    'theater': ('Theater', ['theater_id', 'theater__name']),
+    'day': ('Day', ['show_date']),
+    'movie_day': ('Movie and day', ['show_date', 'movie_id', 'movie__title']),
+}
+
+CSV_COLUMNS = ['showtimes', 'bookings', 'tickets', 'capacity', 'occupancy', 'revenue']
+
+
+def sales_report(start_date, end_date, group_by='movie'):
+    """Totals per ``group_by`` for shows dated ``start_date``..``end_date``.
+
+    One aggregate query over the rollup rows; returns a list of dicts
+    with the group columns plus showtimes, bookings, tickets, capacity,
+    revenue and occupancy (0-1), highest revenue first.
+    """
+    label, columns = GROUPINGS[group_by]
+    rows = (
+        ShowtimeSales.objects
+        .filter(show_date__gte=start_date, show_date__lte=end_date)
+        .values(*columns)
+        # Aliased because the sums share names with the rollup columns
+        .annotate(
+            n_showtimes=Count('pk'), n_bookings=Sum('bookings'), n_tickets=Sum('tickets'),
+            n_capacity=Sum('capacity'), n_revenue=Sum('revenue'),
+        )
+        .order_by(F('n_revenue').desc(nulls_last=True), *columns)
+    )
+    report = []
+    for row in rows:
+        for key in ('showtimes', 'bookings', 'tickets', 'capacity', 'revenue'):
+            row[key] = row.pop('n_' + key)
+        row['occupancy'] = row['tickets'] / row['capacity'] if row['capacity'] else 0
+        row['group'] = ' '.join(str(row[c]) for c in columns if not c.endswith('_id'))
+        report.append(row)
+    return report
+
+
+def report_totals(report):
+    totals = {key: sum(row[key] or 0 for row in report) for key in ('showtimes', 'bookings', 'tickets', 'capacity', 'revenue')}
+    totals['occupancy'] = totals['tickets'] / totals['capacity'] if totals['capacity'] else 0
+    return totals
+
+
+def write_report_csv(report, group_by, out):
+    """Write ``report`` as CSV to the file-like ``out``"""
+    label, columns = GROUPINGS[group_by]
+    writer = csv.writer(out)
+    writer.writerow([label] + CSV_COLUMNS)
+    for row in report:
+        writer.writerow([row['group']] + [
+            f"{row['occupancy']:.4f}" if column == 'occupancy' else row[column]
+            for column in CSV_COLUMNS
+        ])
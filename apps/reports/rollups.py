@@ -0,0 +1,81 @@
+"""Incremental refresh of the ShowtimeSales rollups.
+
+Every path that changes a showtime's sales (checkout, releasing seats,
+booking status changes, editing the showtime) bumps
+``Showtime.sales_updated_at``. A refresh recomputes only the showtimes
+bumped since the previous run started, in chunks of one aggregate query
+over their booking items plus one upsert. The window is widened by
+REPORTS_REFRESH_OVERLAP_SECONDS so a transaction that commits while a
+run is in progress is picked up by the next one.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from apps.bookings.models import BookingItem
+from apps.movies.models import Showtime
+from .models import ShowtimeSales, RollupRun
+
+CHUNK_SIZE = 2000
+
+UPDATE_FIELDS = ['show_date', 'movie', 'theater', 'bookings', 'tickets', 'revenue', 'capacity', 'refreshed_at']
+
+
+def _refresh_chunk(showtime_ids, now):
+    showtimes = Showtime.objects.filter(pk__in=showtime_ids).values_list(
+        'pk', 'show_date', 'movie_id', 'theater_id', 'theater__total_seats'
+    )
+    sales = {
+        row['showtime_id']: row
+        for row in BookingItem.objects.filter(showtime_id__in=showtime_ids, booking__status='confirmed')
+        .values('showtime_id')
+        .annotate(tickets=Count('id'), bookings=Count('booking_id', distinct=True), revenue=Sum('price'))
+        .order_by()
+    }
+    rows = []
+    for pk, show_date, movie_id, theater_id, capacity in showtimes:
+        sold = sales.get(pk, {})
+        rows.append(ShowtimeSales(
+            showtime_id=pk, show_date=show_date, movie_id=movie_id, theater_id=theater_id,
+            bookings=sold.get('bookings', 0), tickets=sold.get('tickets', 0),
+            revenue=sold.get('revenue') or Decimal('0'), capacity=capacity, refreshed_at=now,
+        ))
+    ShowtimeSales.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['showtime'], update_fields=UPDATE_FIELDS,
+    )
+    return len(rows)
+
+
+def refresh_rollups(full=False, start_date=None, end_date=None):
+    """Bring ShowtimeSales up to date and return the RollupRun.
+
+    By default only showtimes changed since the last finished run are
+    recomputed (all of them on the first run). ``full`` recomputes every
+    showtime, optionally limited to show dates within ``start_date`` and
+    ``end_date``.
+    """
+    started_at = timezone.now()
+    last = RollupRun.objects.filter(finished_at__isnull=False).order_by('-started_at').first()
+    full = full or last is None
+    showtimes = Showtime.objects.order_by()
+    if full:
+        if start_date:
+            showtimes = showtimes.filter(show_date__gte=start_date)
+        if end_date:
+            showtimes = showtimes.filter(show_date__lte=end_date)
+    else:
+        since = last.started_at - timedelta(seconds=settings.REPORTS_REFRESH_OVERLAP_SECONDS)
+        showtimes = showtimes.filter(sales_updated_at__gte=since)
+
+    run = RollupRun.objects.create(started_at=started_at, full=full)
+    ids = list(showtimes.values_list('pk', flat=True))
+    for i in range(0, len(ids), CHUNK_SIZE):
+        with transaction.atomic():
+            run.showtimes += _refresh_chunk(ids[i:i + CHUNK_SIZE], started_at)
+    run.finished_at = timezone.now()
+    run.save(update_fields=['showtimes', 'finished_at'])
+    return run
@@ -0,0 +1,87 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db.models import Count, Sum
+from django.test import TestCase
+
+from apps.bookings.models import Booking
+from apps.bookings.services import cancel_bookings, commit_booking
+from apps.movies.tests import create_movie, create_theater, create_showtime
+from .models import RollupRun, ShowtimeSales
+from .rollups import refresh_rollups
+
+ROLLUP_FIELDS = ('showtime_id', 'show_date', 'movie_id', 'theater_id', 'bookings', 'tickets', 'revenue', 'capacity')
+
+
+class SalesRollupTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('buyer', password='pw')
+        movie = create_movie()
+        cls.showtimes = [
+            create_showtime(movie, create_theater('Hall 1', rows='AB', columns=5)),
+            create_showtime(movie, create_theater('Hall 2', rows='AB', columns=4), price='250.00'),
+            create_showtime(movie, create_theater('Hall 3', rows='A', columns=4), days=2),
+        ]
+
+    def seats(self, showtime):
+        return list(showtime.theater.seats.order_by('id').values_list('id', flat=True))
+
+    def book(self, showtime, *seats):
+        return commit_booking(self.user, showtime.id, list(seats))
+
+    def raw_sales(self):
+        """The rollup computed straight from confirmed bookings"""
+        sold = {
+            row['showtime_id']: row
+            for row in Booking.objects.filter(status='confirmed').values('showtime_id').annotate(
+                bookings=Count('id'), tickets=Sum('number_of_seats'), revenue=Sum('total_price')
+            ).order_by()
+        }
+        return [
+            (
+                showtime.id, showtime.show_date, showtime.movie_id, showtime.theater_id,
+                sold.get(showtime.id, {}).get('bookings', 0), sold.get(showtime.id, {}).get('tickets', 0),
+                sold.get(showtime.id, {}).get('revenue') or Decimal('0'), showtime.theater.total_seats,
+            )
+            for showtime in sorted(self.showtimes, key=lambda showtime: showtime.id)
+        ]
+
+    def rollups(self):
+        return list(ShowtimeSales.objects.order_by('showtime_id').values_list(*ROLLUP_FIELDS))
+
+    def test_refresh_matches_bookings_and_is_idempotent(self):
+        first, second = self.showtimes[:2]
+        seats = self.seats(first)
+        self.book(first, *seats[:3])
+        cancelled = self.book(first, *seats[3:5])
+        self.book(first, seats[5])
+        self.book(second, *self.seats(second)[:2])
+        cancel_bookings(Booking.objects.filter(id=cancelled.id))
+
+        run = refresh_rollups()
+        self.assertTrue(run.full)
+        self.assertEqual(run.showtimes, 3)
+        self.assertEqual(self.rollups(), self.raw_sales())
+        # The cancelled booking is left out
+        self.assertEqual(self.rollups()[0][4:6], (2, 4))
+
+        # Nothing changed: the incremental run rewrites the same rows
+        run = refresh_rollups()
+        self.assertFalse(run.full)
+        self.assertEqual(self.rollups(), self.raw_sales())
+        self.assertEqual(ShowtimeSales.objects.count(), 3)
+        self.assertEqual(RollupRun.objects.filter(finished_at__isnull=False).count(), 2)
+
+    def test_incremental_refresh_picks_up_later_sales(self):
+        refresh_rollups()
+        first = self.showtimes[0]
+        booking = self.book(first, *self.seats(first)[:2])
+        refresh_rollups()
+        self.assertEqual(self.rollups(), self.raw_sales())
+
+        cancel_bookings(Booking.objects.filter(id=booking.id))
+        refresh_rollups()
+        self.assertEqual(self.rollups(), self.raw_sales())
+        self.assertEqual(ShowtimeSales.objects.get(showtime=first).tickets, 0)
@@ -0,0 +1,154 @@
+"""Database connection pooling and connection metrics.
+
+``ConnectionPool`` is a small thread-safe pool used by the
+``cinema_project.pooled_postgresql`` backend (DB_POOL=True). Django
+checks a connection out when a request first touches the database and
+hands it back when it would normally close it, so threads and requests
+share at most DB_POOL_MAX_SIZE server connections per process.
+
+Every pool counts checkouts, waits, timeouts and reconnects. For all
+backends, pooled or not, ``connects`` counts how often Django opened a
+connection per alias (``connection_created``); with persistent
+connections, growth beyond one per thread means connections are being
+dropped and re-established.
+"""
+from collections import deque, Counter
+import threading
+import time
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection became free within the pool timeout"""
+
+
+class ConnectionPool:
+
+    def __init__(self, connect, reset, ping, max_size=5, timeout=10.0, check_after=30.0):
+        """
+        ``connect()`` opens a new connection, ``reset(conn)`` returns False
+        if a connection given back must be discarded, and ``ping(conn)``
+        returns False for a dead one. Idle connections are pinged on
+        checkout once they have been idle for ``check_after`` seconds.
+        """
+        self._connect = connect
+        self._reset = reset
+        self._ping = ping
+        self.max_size = max_size
+        self.timeout = timeout
+        self.check_after = check_after
+        self._idle = deque()  # (connection, returned_at)
+        self._size = 0
+        self._cond = threading.Condition()
+        self.stats = Counter(checkouts=0, waits=0, wait_ms=0, timeouts=0, reconnects=0, created=0, discarded=0)
+
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        started = None
+        with self._cond:
+            self.stats['checkouts'] += 1
+            while not self._idle and self._size >= self.max_size:
+                if started is None:
+                    started = time.monotonic()
+                    self.stats['waits'] += 1
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if not self._idle and self._size >= self.max_size:
+                        self.stats['timeouts'] += 1
+                        raise PoolTimeout('No database connection free after %.1fs' % self.timeout)
+            if started is not None:
+                self.stats['wait_ms'] += int((time.monotonic() - started) * 1000)
+            if self._idle:
+                conn, returned_at = self._idle.pop()
+            else:
+                conn, returned_at = None, None
+                self._size += 1
+
+        # Ping and connect outside the lock; stats are only touched inside it
+        if conn is not None and time.monotonic() - returned_at > self.check_after and not self._ping(conn):
+            self._discard(conn, replacing=True)
+            with self._cond:
+                self.stats['reconnects'] += 1
+            conn = None
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self.stats['created'] += 1
+        return conn
+
+    def putconn(self, conn):
+        try:
+            keep = self._reset(conn)
+        except Exception:
+            keep = False
+        if not keep:
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def _discard(self, conn, replacing=False):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self.stats['discarded'] += 1
+            if not replacing:
+                self._size -= 1
+                self._cond.notify()
+
+    def closeall(self):
+        with self._cond:
+            idle, self._idle = list(self._idle), deque()
+            self._size -= len(idle)
+        for conn, _ in idle:
+            conn.close()
+
+    def snapshot(self):
+        with self._cond:
+            return {
+                **self.stats,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'max_size': self.max_size,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+connects = Counter()
+
+
+def get_pool(alias, factory):
+    """The process-wide pool for ``alias``, created with ``factory()`` on first use"""
+    pool = _pools.get(alias)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(alias)
+            if pool is None:
+                pool = _pools[alias] = factory()
+    return pool
+
+
+@receiver(connection_created)
+def count_connection(sender, connection, **kwargs):
+    connects[connection.alias] += 1
+
+
+def pool_stats():
+    """Per-alias connection metrics for this process"""
+    stats = {alias: {'connects': count} for alias, count in connects.items()}
+    for alias, pool in list(_pools.items()):
+        stats.setdefault(alias, {'connects': 0}).update(pool=pool.snapshot())
+    return stats
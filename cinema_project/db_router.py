@@ -0,0 +1,110 @@
+"""Read-replica routing.
+
+Reads go to the primary unless a view opts in with ``use_replica``; the
+catalogue pages and admin reports do. Within an opted-in request one
+replica is picked and used for every read, except:
+
+* models whose reads must see the latest writes (sessions, auth, admin
+  log) always use the primary;
+* reads inside a transaction on the primary (``select_for_update`` before
+  a booking is written, for one) stay in that transaction;
+* once anything is written the request is pinned to the primary, and
+  PrimaryPinMiddleware keeps the client pinned for REPLICA_PIN_SECONDS
+  so the next pages read their own writes while replicas catch up.
+
+With no DATABASE_REPLICA_URLS configured every query uses 'default'.
+"""
+from contextvars import ContextVar
+from functools import wraps
+import random
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'primary_pin'
+
+# Models that read-your-writes paths depend on
+PRIMARY_ONLY_APPS = {'sessions', 'auth', 'admin', 'contenttypes'}
+
+_replica = ContextVar('replica', default=None)
+_pinned = ContextVar('pinned_to_primary', default=False)
+_wrote = ContextVar('wrote_to_primary', default=False)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def pin_to_primary():
+    """Send every remaining read in this request to the primary"""
+    _pinned.set(True)
+
+
+def is_pinned():
+    return _pinned.get()
+
+
+def use_replica(view_func):
+    """Let ``view_func`` read from a replica (a no-op without replicas).
+
+    Template responses are rendered inside the scope so their lazy
+    querysets use the replica too.
+    """
+    @wraps(view_func)
+    def _wrapped(request, *args, **kwargs):
+        if not replicas() or _pinned.get():
+            return view_func(request, *args, **kwargs)
+        token = _replica.set(random.choice(replicas()))
+        try:
+            response = view_func(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render) and not response.is_rendered:
+                response.render()
+            return response
+        finally:
+            _replica.reset(token)
+    return _wrapped
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        alias = _replica.get()
+        if alias is None or _pinned.get() or model._meta.app_label in PRIMARY_ONLY_APPS:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        _wrote.set(True)
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryPinMiddleware:
+    """Keep a client on the primary for a few seconds after it writes"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = _pinned.set(PIN_COOKIE in request.COOKIES)
+        wrote = _wrote.set(False)
+        try:
+            response = self.get_response(request)
+            if _wrote.get() and replicas():
+                response.set_cookie(
+                    PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax'
+                )
+            return response
+        finally:
+            _wrote.reset(wrote)
+            _pinned.reset(pinned)
@@ -0,0 +1,263 @@
+"""Counters shared by every worker process, exposed at /metrics.
+
+Each process writes its counters to its own memory-mapped file in
+METRICS_DIR (``<pid>.db``), so incrementing is a dict lookup and an
+8-byte write with no locking between processes. The /metrics view sums
+the files into the Prometheus text format. When a process exits (at
+exit, or gunicorn's child_exit hook for a worker that was killed),
+``mark_process_dead`` adds its counters to ``merged.db`` and deletes its
+file, so the directory holds one file per live process plus one, and
+the values of dead workers still count: counters only ever grow and
+Prometheus' rate() works across restarts. Merging and reading take a
+lock file so a scrape never sees a process counted twice or not at all
+(fcntl.flock, or msvcrt.locking on Windows, which has no shared locks).
+The directory can be emptied between deploys. With METRICS_DIR empty,
+the default, counters stay in process memory (fine for runserver).
+
+File layout: an 8-byte header holding the bytes used, then entries of
+a 4-byte key length, the UTF-8 key padded to 8 bytes and an 8-byte
+float. Keys are JSON ``[name, {label: value}]``.
+"""
+from contextlib import contextmanager
+from pathlib import Path
+import atexit
+import json
+import mmap
+import os
+import struct
+import threading
+
+from django.conf import settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+INITIAL_SIZE = 64 * 1024
+MERGED_NAME = 'merged.db'
+
+_lock = threading.Lock()
+_file = None
+_memory = {}
+
+
+class MetricsFile:
+    """The calling process's counters, appended to and updated in place"""
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, 'a+b')
+        if os.fstat(self._f.fileno()).st_size == 0:
+            self._f.truncate(INITIAL_SIZE)
+        self._map = mmap.mmap(self._f.fileno(), 0)
+        self._used = struct.unpack_from('Q', self._map, 0)[0] or 8
+        self._offsets = {}
+        # A reused pid finds its predecessor's file and keeps adding to it
+        for key, value, offset in read_entries(self._map, self._used):
+            self._offsets[key] = offset
+
+    def inc(self, key, amount):
+        offset = self._offsets.get(key)
+        if offset is None:
+            offset = self._append(key)
+        value = struct.unpack_from('d', self._map, offset)[0]
+        struct.pack_into('d', self._map, offset, value + amount)
+
+    def _append(self, key):
+        encoded = key.encode()
+        padded = len(encoded) + (-(len(encoded) + 4) % 8)
+        size = 4 + padded + 8
+        if self._used + size > len(self._map):
+            new_size = len(self._map)
+            while self._used + size > new_size:
+                new_size *= 2
+            self._map.close()
+            self._f.truncate(new_size)
+            self._map = mmap.mmap(self._f.fileno(), new_size)
+        struct.pack_into('i%ds' % padded, self._map, self._used, len(encoded), encoded)
+        offset = self._used + 4 + padded
+        struct.pack_into('d', self._map, offset, 0.0)
+        # Publish the entry to readers only once it is complete
+        self._used += size
+        struct.pack_into('Q', self._map, 0, self._used)
+        self._offsets[key] = offset
+        return offset
+
+    def close(self):
+        self._map.close()
+        self._f.close()
+
+
+def read_entries(data, used=None):
+    """Yield ``(key, value, value offset)`` from a metrics file's bytes"""
+    if used is None:
+        used = struct.unpack_from('Q', data, 0)[0]
+    pos = 8
+    while pos < used:
+        length = struct.unpack_from('i', data, pos)[0]
+        padded = length + (-(length + 4) % 8)
+        key = bytes(data[pos + 4:pos + 4 + length]).decode()
+        offset = pos + 4 + padded
+        yield key, struct.unpack_from('d', data, offset)[0], offset
+        pos = offset + 8
+
+
+def _process_file():
+    global _file
+    # Reopen after a fork so children do not write into the parent's file
+    if _file is None or _file.pid != os.getpid():
+        directory = Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        _file = MetricsFile(directory / ('%d.db' % os.getpid()))
+        _file.pid = os.getpid()
+        atexit.register(_merge_at_exit, _file.pid)
+    return _file
+
+
+def _merge_at_exit(pid):
+    # Forked children inherit their parent's handler; only the owner merges
+    if os.getpid() == pid:
+        mark_process_dead(pid)
+
+
+@contextmanager
+def _directory_lock(directory, shared=False):
+    with open(directory / '.lock', 'a+b') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    # LK_LOCK raises OSError after ten tries a second apart; keep waiting
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def mark_process_dead(pid):
+    """Add the counters of exited process ``pid`` to merged.db and delete its file"""
+    if not settings.METRICS_DIR:
+        return
+    directory = Path(settings.METRICS_DIR)
+    path = directory / ('%d.db' % pid)
+    if not path.exists():
+        return
+    with _directory_lock(directory):
+        # The at-exit merge and child_exit may both run for the same process
+        if not path.exists():
+            return
+        data = path.read_bytes()
+        merged = MetricsFile(directory / MERGED_NAME)
+        try:
+            for key, value, _ in read_entries(data) if len(data) >= 8 else ():
+                merged.inc(key, value)
+        finally:
+            merged.close()
+        path.unlink()
+
+
+def increment(key, amount=1):
+    with _lock:
+        if settings.METRICS_DIR:
+            _process_file().inc(key, amount)
+        else:
+            _memory[key] = _memory.get(key, 0) + amount
+
+
+def collect():
+    """Counter totals across every process: {key: value}"""
+    if not settings.METRICS_DIR:
+        with _lock:
+            return dict(_memory)
+    totals = {}
+    directory = Path(settings.METRICS_DIR)
+    if not directory.exists():
+        return totals
+    with _directory_lock(directory, shared=True):
+        for path in sorted(directory.glob('*.db')):
+            data = path.read_bytes()
+            if len(data) < 8:
+                continue
+            for key, value, _ in read_entries(data):
+                totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+REGISTRY = {}
+
+
+class Counter:
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._keys = {}
+        REGISTRY[name] = self
+
+    def inc(self, amount=1, **labels):
+        values = tuple(sorted(labels.items()))
+        key = self._keys.get(values)
+        if key is None:
+            if set(labels) != set(self.labelnames):
+                raise ValueError('%s takes labels %s' % (self.name, ', '.join(self.labelnames)))
+            key = self._keys[values] = json.dumps([self.name, labels], sort_keys=True)
+        increment(key, amount)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_number(value):
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+def render_metrics():
+    """All counters in the Prometheus text exposition format"""
+    samples = {}
+    for key, value in collect().items():
+        name, labels = json.loads(key)
+        samples.setdefault(name, []).append((labels, value))
+    lines = []
+    for name in sorted(set(REGISTRY) | set(samples)):
+        counter = REGISTRY.get(name)
+        if counter is not None:
+            lines.append('# HELP %s %s' % (name, _escape(counter.documentation)))
+            lines.append('# TYPE %s counter' % name)
+        rows = samples.get(name)
+        if not rows and counter is not None and not counter.labelnames:
+            rows = [({}, 0)]
+        for labels, value in sorted(rows or [], key=lambda row: sorted(row[0].items())):
+            label_text = ','.join('%s="%s"' % (k, _escape(v)) for k, v in sorted(labels.items()))
+            lines.append('%s%s %s' % (name, '{%s}' % label_text if label_text else '', _format_number(value)))
+    return '\n'.join(lines) + '\n'
+
+
+# Counters instrumented across the apps
+BOOKINGS = Counter('cinema_bookings_total', 'Bookings committed')
+BOOKED_SEATS = Counter('cinema_booked_seats_total', 'Seats sold in committed bookings')
+CHECKOUT_CONFLICTS = Counter(
+    'cinema_checkout_conflicts_total',
+    'Checkouts refused because a selected seat was sold or held (stage: hold or commit)',
+    ['stage'],
+)
+TICKET_RENDERS = Counter(
+    'cinema_ticket_renders_total', 'Ticket images drawn (source: download or export)', ['source'],
+)
+SEAT_AVAILABILITY_REQUESTS = Counter('cinema_seat_availability_requests_total', 'Seat availability API calls')
+CACHE_REQUESTS = Counter(
+    'cinema_cache_requests_total', 'Cache lookups by cache and result (hit or miss)', ['cache', 'result'],
+)
@@ -0,0 +1,62 @@
+"""PostgreSQL backend that borrows connections from a per-process pool.
+
+Use it with CONN_MAX_AGE = 0: Django then "closes" the connection at the
+end of every request, which here returns it to the pool instead. Pool
+sizing comes from the POOL entry of the database settings (see
+settings.py and cinema_project/db_pool.py). Written for psycopg2.
+"""
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+
+from cinema_project.db_pool import ConnectionPool, PoolTimeout, get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def _pool(self, conn_params):
+        options = self.settings_dict.get('POOL', {})
+
+        def connect():
+            return super(DatabaseWrapper, self).get_new_connection(conn_params)
+
+        def reset(conn):
+            # Only clean, idle connections go back into the pool
+            if conn.closed:
+                return False
+            status = conn.info.transaction_status
+            if status != self.Database.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            return conn.info.transaction_status == self.Database.extensions.TRANSACTION_STATUS_IDLE
+
+        def ping(conn):
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                if not conn.autocommit:
+                    conn.rollback()
+                return True
+            except self.Database.Error:
+                return False
+
+        return get_pool(self.alias, lambda: ConnectionPool(
+            connect, reset, ping,
+            max_size=options.get('MAX_SIZE', 5),
+            timeout=options.get('TIMEOUT', 10.0),
+            check_after=options.get('CHECK_AFTER', 30.0),
+        ))
+
+    def get_new_connection(self, conn_params):
+        # Pooled connections skip the parent's connect, which is also where
+        # the wrapper learns its isolation level
+        level = self.settings_dict['OPTIONS'].get('isolation_level')
+        self.isolation_level = IsolationLevel(level) if level is not None else IsolationLevel.READ_COMMITTED
+        self._connection_pool = self._pool(conn_params)
+        try:
+            return self._connection_pool.getconn()
+        except PoolTimeout as e:
+            raise self.Database.OperationalError(str(e)) from e
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self._connection_pool.putconn(self.connection)
@@ -0,0 +1,235 @@
+"""Opt-in request profiling.
+
+With PROFILING_ENABLED, ProfilingMiddleware records one JSON line per
+request in PROFILING_DIR/requests.log, rotated at
+PROFILING_LOG_MAX_BYTES with PROFILING_LOG_BACKUPS old files kept:
+
+* view: the resolved view name
+* wall_ms: time spent in the rest of the middleware stack and the view;
+  for a streaming response (e.g. the live seat events) only the time to
+  build it, so those entries are flagged ``streaming`` and left out of
+  the summary
+* db_ms, queries: time and number of queries on every connection
+* duplicates: queries whose SQL (before parameters) already ran in the
+  request; a high count usually means an N+1 loop
+* template_ms: time rendering templates, including queries they trigger
+* status, method and a timestamp
+
+A PROFILING_SAMPLE_RATE fraction of requests also runs under cProfile,
+leaving a ``.prof`` file in PROFILING_DIR (open it with pstats or
+snakeviz), and records ``peak_kb``: the peak Python memory allocated
+while it ran. tracemalloc is started for that one request and stopped
+after it, one sampled request at a time, so other requests run
+untraced; allocations by other threads in that window still count.
+Disabled, the middleware removes itself at startup and costs nothing.
+``summarize`` aggregates the logs for the staff summary page.
+"""
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+import cProfile
+import json
+import logging
+import random
+import re
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.backends.django import Template as DjangoTemplate
+
+LOG_NAME = 'requests.log'
+
+_current = ContextVar('profiling_record', default=None)
+_logger = None
+# Held by the one sampled request whose memory is being traced
+_tracing_lock = threading.Lock()
+
+
+class RequestRecord:
+    """Measurements collected while one request runs"""
+
+    def __init__(self):
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.queries = 0
+        self.seen_sql = set()
+        self.duplicates = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            if sql in self.seen_sql:
+                self.duplicates += 1
+            else:
+                self.seen_sql.add(sql)
+
+
+def _timed_render(render):
+    def _render(self, context=None, request=None):
+        record = _current.get()
+        if record is None:
+            return render(self, context, request)
+        start = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            record.template_time += time.perf_counter() - start
+    _render.profiled = True
+    return _render
+
+
+def get_logger():
+    global _logger
+    if _logger is None:
+        directory = Path(settings.PROFILING_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(
+            directory / LOG_NAME, maxBytes=settings.PROFILING_LOG_MAX_BYTES,
+            backupCount=settings.PROFILING_LOG_BACKUPS,
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger = logging.getLogger('cinema_project.profiling')
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(handler)
+        _logger = logger
+    return _logger
+
+
+class ProfilingMiddleware:
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.logger = get_logger()
+        # Top-level renders only; {% include %} runs inside the outer render
+        if not getattr(DjangoTemplate.render, 'profiled', False):
+            DjangoTemplate.render = _timed_render(DjangoTemplate.render)
+
+    def __call__(self, request):
+        record = RequestRecord()
+        token = _current.set(record)
+        profiler = None
+        tracing = False
+        if settings.PROFILING_SAMPLE_RATE and random.random() < settings.PROFILING_SAMPLE_RATE:
+            profiler = cProfile.Profile()
+            # Leave tracemalloc alone if something else (e.g. bench_endpoints) runs it
+            tracing = not tracemalloc.is_tracing() and _tracing_lock.acquire(blocking=False)
+            if tracing:
+                tracemalloc.start()
+        peak = None
+        start = time.perf_counter()
+        wrappers = [conn.execute_wrapper(record) for conn in connections.all()]
+        for wrapper in wrappers:
+            wrapper.__enter__()
+        try:
+            if profiler is not None:
+                try:
+                    response = profiler.runcall(self.get_response, request)
+                except ValueError:
+                    # Another profiler is already active in this process
+                    profiler = None
+                    response = self.get_response(request)
+            else:
+                response = self.get_response(request)
+        finally:
+            wall = time.perf_counter() - start
+            for wrapper in reversed(wrappers):
+                wrapper.__exit__(None, None, None)
+            _current.reset(token)
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                _tracing_lock.release()
+
+        match = request.resolver_match
+        entry = {
+            'ts': round(time.time(), 3),
+            # Not the path: unmatched URLs would each become their own row
+            'view': match.view_name if match else '(unresolved)',
+            'method': request.method,
+            'status': response.status_code,
+            'wall_ms': round(wall * 1000, 2),
+            'db_ms': round(record.db_time * 1000, 2),
+            'queries': record.queries,
+            'duplicates': record.duplicates,
+            'template_ms': round(record.template_time * 1000, 2),
+        }
+        if response.streaming:
+            entry['streaming'] = True
+        if peak is not None:
+            entry['peak_kb'] = peak // 1024
+        if profiler is not None:
+            entry['profile'] = self._dump(profiler, entry)
+        self.logger.info(json.dumps(entry))
+        return response
+
+    def _dump(self, profiler, entry):
+        name = '%d-%s.prof' % (entry['ts'] * 1000, re.sub(r'[^\w.-]+', '_', entry['view']).strip('_'))
+        profiler.dump_stats(Path(settings.PROFILING_DIR) / name)
+        return name
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def read_entries(since=None):
+    """Every logged request, oldest log file first, optionally only those after ``since`` (epoch)"""
+    directory = Path(settings.PROFILING_DIR)
+    paths = [directory / ('%s.%d' % (LOG_NAME, n)) for n in range(settings.PROFILING_LOG_BACKUPS, 0, -1)]
+    paths.append(directory / LOG_NAME)
+    for path in paths:
+        if not path.exists():
+            continue
+        with open(path) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short by rotation or a crash
+                    continue
+                if since is None or entry['ts'] >= since:
+                    yield entry
+
+
+def summarize(entries):
+    """Per-view request count, wall time p50/p95/p99 and averages, slowest p95 first.
+
+    Streaming responses are skipped: their wall time ends before the body is sent.
+    """
+    views = {}
+    for entry in entries:
+        if not entry.get('streaming'):
+            views.setdefault(entry['view'], []).append(entry)
+    summary = []
+    for view, rows in views.items():
+        n = len(rows)
+        wall = [row['wall_ms'] for row in rows]
+        peaks = [row['peak_kb'] for row in rows if 'peak_kb' in row]
+        summary.append({
+            'view': view,
+            'requests': n,
+            'p50': percentile(wall, 50),
+            'p95': percentile(wall, 95),
+            'p99': percentile(wall, 99),
+            'db_ms': sum(row['db_ms'] for row in rows) / n,
+            'queries': sum(row['queries'] for row in rows) / n,
+            'max_duplicates': max(row['duplicates'] for row in rows),
+            'template_ms': sum(row['template_ms'] for row in rows) / n,
+            'peak_kb': max(peaks) if peaks else None,
+            'profiles': sum(1 for row in rows if 'profile' in row),
+        })
+    summary.sort(key=lambda row: row['p95'], reverse=True)
+    return summary
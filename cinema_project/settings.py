@@ -37,17 +37,21 @@ INSTALLED_APPS = [
     # Local apps
     'apps.movies',
     'apps.bookings',
+    'apps.reports',
     # Optional storage backends
     'storages',
 ]
 
 MIDDLEWARE = [
+    # Removes itself unless PROFILING_ENABLED; first so it times the whole stack
+    'cinema_project.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'cinema_project.db_router.PrimaryPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -65,6 +69,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'apps.movies.context_processors.catalogue_cache',
             ],
         },
     },
@@ -75,10 +80,12 @@ WSGI_APPLICATION = 'cinema_project.wsgi.application'
 
 # Database
 # Use DATABASE_URL environment variable (Postgres on Railway)
+# Connections persist for DB_CONN_MAX_AGE seconds per worker thread.
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', '600'))
 DATABASE_URL = os.getenv('DATABASE_URL')
 if DATABASE_URL:
     DATABASES = {
-        'default': dj_database_url.parse(DATABASE_URL, conn_max_age=600)
+        'default': dj_database_url.parse(DATABASE_URL, conn_max_age=DB_CONN_MAX_AGE)
     }
 else:
     DATABASES = {
@@ -88,6 +95,76 @@ else:
         }
     }
 
+# Read replicas: comma-separated database URLs, e.g.
+# DATABASE_REPLICA_URLS=sqlite:////path/to/replica.sqlite3 for local testing
+# (see the sync_sqlite_replicas command). Only views decorated with
+# cinema_project.db_router.use_replica read from them; a client that has
+# just written stays on the primary for REPLICA_PIN_SECONDS.
+DATABASE_REPLICAS = []
+for n, url in enumerate(filter(None, os.getenv('DATABASE_REPLICA_URLS', '').split(',')), 1):
+    alias = f'replica_{n}'
+    DATABASES[alias] = dj_database_url.parse(url.strip(), conn_max_age=DB_CONN_MAX_AGE)
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['cinema_project.db_router.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '5'))
+
+# Connection health: persistent connections are checked before a request
+# reuses them, so a connection dropped by the server or a failover is
+# replaced instead of failing the request.
+# DB_POOL=True (PostgreSQL only) shares at most DB_POOL_MAX_SIZE
+# connections per process between all threads and requests instead of
+# keeping one per thread, which lets threaded/ASGI workers be scaled up
+# (WEB_CONCURRENCY in the Procfile) without exhausting max_connections.
+# A request waits up to DB_POOL_TIMEOUT seconds for a free connection.
+# Connection and pool counters are served to staff at /health/db/.
+DB_POOL = os.getenv('DB_POOL', 'False').lower() in ('true', '1', 'yes')
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '5'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+for db in DATABASES.values():
+    db['CONN_HEALTH_CHECKS'] = True
+    if DB_POOL and db['ENGINE'] == 'django.db.backends.postgresql':
+        db['ENGINE'] = 'cinema_project.pooled_postgresql'
+        # Django returns the connection after each request; the pool keeps it open
+        db['CONN_MAX_AGE'] = 0
+        db['POOL'] = {'MAX_SIZE': DB_POOL_MAX_SIZE, 'TIMEOUT': DB_POOL_TIMEOUT, 'CHECK_AFTER': 30}
+
+
+# Cache
+# CACHE_BACKEND selects the store: 'locmem' (default, per process), 'file'
+# (shared between workers on one host) or 'redis' (shared across hosts,
+# requires the `redis` package). CACHE_LOCATION is the directory for 'file'
+# and the URL for 'redis', e.g. redis://localhost:6379/1. Use a shared
+# backend whenever more than one worker runs: the catalogue version and
+# price snapshots live in this cache (check movies.W001 warns otherwise).
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'locmem').lower()
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+}
+CACHE_LOCATIONS = {
+    'locmem': 'cinema-cache',
+    'file': str(BASE_DIR / '.cache'),
+    'redis': 'redis://localhost:6379/1',
+}
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKENDS.get(CACHE_BACKEND, CACHE_BACKENDS['locmem']),
+        'LOCATION': os.getenv('CACHE_LOCATION', CACHE_LOCATIONS.get(CACHE_BACKEND, 'cinema-cache')),
+        'TIMEOUT': int(os.getenv('CACHE_TIMEOUT', '300')),
+        'KEY_PREFIX': 'cinema',
+    }
+}
+
+# How long anonymous catalogue pages and fragments stay cached (seconds).
+# Saves and deletes of movies, showtimes and reviews invalidate them early.
+CATALOGUE_CACHE_TIMEOUT = int(os.getenv('CATALOGUE_CACHE_TIMEOUT', '600'))
+
+# How long a user's dashboard statistics stay cached (seconds). Booking
+# changes invalidate them early.
+USER_STATS_CACHE_TIMEOUT = int(os.getenv('USER_STATS_CACHE_TIMEOUT', '300'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/stable/ref/settings/#auth-password-validators
@@ -189,6 +266,74 @@ LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'home'
 
+# Seat holds: how long selected seats stay reserved during checkout
+SEAT_HOLD_MINUTES = int(os.getenv('SEAT_HOLD_MINUTES', '10'))
+
+# Render processes used by bulk ticket export (admin action / export_tickets)
+TICKET_EXPORT_WORKERS = int(os.getenv('TICKET_EXPORT_WORKERS', '0')) or None
+
+# Live seat map events (bookings/api/seat-events/). SEAT_EVENTS_BROKER is
+# 'local' (one process) or 'redis' (all workers, requires the `redis`
+# package); gunicorn refuses to start more than one worker with 'local'.
+# Streams are closed after SEAT_EVENTS_STREAM_SECONDS and the browser
+# reconnects with a fresh snapshot. Django 4.2 does not detect ASGI
+# disconnects, so this also bounds how long a closed tab's stream lingers.
+SEAT_EVENTS_BROKER = os.getenv('SEAT_EVENTS_BROKER', 'local').lower()
+SEAT_EVENTS_REDIS_URL = os.getenv('SEAT_EVENTS_REDIS_URL', 'redis://localhost:6379/2')
+SEAT_EVENTS_STREAM_SECONDS = int(os.getenv('SEAT_EVENTS_STREAM_SECONDS', '60'))
+SEAT_EVENTS_HEARTBEAT_SECONDS = 15
+SEAT_EVENTS_RETRY_MS = int(os.getenv('SEAT_EVENTS_RETRY_MS', '5000'))
+
+# Cleaning time between screenings in one theater, used by the schedule generator
+SHOWTIME_TURNAROUND_MINUTES = int(os.getenv('SHOWTIME_TURNAROUND_MINUTES', '15'))
+
+# Sales rollups (refresh_sales_rollups): each incremental run also rechecks
+# showtimes changed this many seconds before the previous run started, to
+# catch transactions that were still open during it
+REPORTS_REFRESH_OVERLAP_SECONDS = int(os.getenv('REPORTS_REFRESH_OVERLAP_SECONDS', '300'))
+
+# Seat pricing (apps/movies/pricing.py). A seat costs the showtime's
+# ticket_price, scaled by the first matching rule below, plus the
+# surcharge for its seat type. Rules are
+# (label, weekdays with 0 = Monday, from 'HH:MM', until 'HH:MM', multiplier), e.g.
+# ('Weekday matinee', (0, 1, 2, 3, 4), '00:00', '16:00', '0.85').
+SEAT_TYPE_SURCHARGES = {'standard': '0.00', 'premium': '100.00', 'vip': '250.00'}
+SHOWTIME_PRICE_RULES = []
+
+# Demand pricing: once a showtime is at least this full (share of seats
+# sold), its prices are multiplied accordingly; [] turns it off. Quoted
+# prices are cached per showtime for PRICE_SNAPSHOT_SECONDS and locked
+# into the customer's seat hold at checkout.
+DEMAND_PRICING_TIERS = [(0.50, '1.10'), (0.75, '1.20'), (0.90, '1.35')]
+PRICE_SNAPSHOT_SECONDS = int(os.getenv('PRICE_SNAPSHOT_SECONDS', '60'))
+
+# Customers can cancel (with a full refund) until this long before the show
+BOOKING_CANCEL_CUTOFF_MINUTES = int(os.getenv('BOOKING_CANCEL_CUTOFF_MINUTES', '60'))
+
+# Request profiling (cinema_project/profiling.py): when enabled, every
+# request's timings and query counts are appended to a rotating log in
+# PROFILING_DIR, summarized for staff at /admin/profiling/.
+# PROFILING_SAMPLE_RATE (0-1) of requests are also profiled with cProfile
+# and have their peak memory traced.
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() in ('true', '1', 'yes')
+PROFILING_DIR = os.getenv('PROFILING_DIR', str(BASE_DIR / 'profiling'))
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', '0'))
+PROFILING_LOG_MAX_BYTES = int(os.getenv('PROFILING_LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+PROFILING_LOG_BACKUPS = int(os.getenv('PROFILING_LOG_BACKUPS', '5'))
+
+# Operational counters (cinema_project/metrics.py) served at /metrics in
+# the Prometheus text format. Each worker process writes its own file in
+# METRICS_DIR, folded into merged.db when it exits (gunicorn.conf.py
+# handles killed workers), and the endpoint sums them. Unset, counters stay
+# in process memory, which only covers one worker: set METRICS_DIR when
+# running several. Scrapers send METRICS_TOKEN as a bearer token; without
+# one only staff sessions can read the endpoint.
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+# Shared secret sent by gate scanners in the X-Gate-Key header; empty disables scanning
+GATE_SCAN_KEY = os.getenv('GATE_SCAN_KEY', '')
+
 # Security settings for production
 if not DEBUG:
     SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
@@ -0,0 +1,286 @@
+from pathlib import Path
+from unittest import mock
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import tracemalloc
+import unittest
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, connections, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TransactionTestCase, override_settings
+
+from apps.movies.models import Movie
+from apps.movies.tests import create_movie
+from . import profiling
+from .db_router import PIN_COOKIE, PrimaryPinMiddleware, is_pinned, use_replica
+from .db_pool import ConnectionPool, PoolTimeout, pool_stats
+from .metrics import MERGED_NAME, MetricsFile, collect, increment, mark_process_dead
+
+
+class FakeConnection:
+
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def fake_pool(**kwargs):
+    return ConnectionPool(FakeConnection, lambda conn: not conn.closed, lambda conn: conn.alive, **kwargs)
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+    def test_connections_are_reused(self):
+        pool = fake_pool(max_size=2)
+        first = pool.getconn()
+        pool.putconn(first)
+        self.assertIs(pool.getconn(), first)
+        self.assertEqual(pool.snapshot()['created'], 1)
+
+    def test_checkout_times_out_when_the_pool_is_exhausted(self):
+        pool = fake_pool(max_size=1, timeout=0.05)
+        pool.getconn()
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        self.assertEqual((pool.stats['waits'], pool.stats['timeouts']), (1, 1))
+
+    def test_dead_idle_connection_is_replaced(self):
+        pool = fake_pool(max_size=1, check_after=0)
+        dead = pool.getconn()
+        pool.putconn(dead)
+        dead.alive = False
+        fresh = pool.getconn()
+        self.assertIsNot(fresh, dead)
+        self.assertTrue(dead.closed)
+        snapshot = pool.snapshot()
+        self.assertEqual(
+            (snapshot['reconnects'], snapshot['created'], snapshot['discarded'], snapshot['size']), (1, 2, 1, 1)
+        )
+
+    def test_threads_share_max_size_connections(self):
+        pool = fake_pool(max_size=3, timeout=5)
+        opened = set()
+
+        def work():
+            for _ in range(50):
+                conn = pool.getconn()
+                opened.add(id(conn))
+                pool.putconn(conn)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        snapshot = pool.snapshot()
+        self.assertEqual(snapshot['checkouts'], 400)
+        self.assertLessEqual(snapshot['created'], 3)
+        self.assertEqual(snapshot['in_use'], 0)
+        self.assertLessEqual(len(opened), 3)
+
+
+@unittest.skipUnless(settings.DATABASES['default'].get('POOL'), 'Needs DATABASE_URL=postgres://... and DB_POOL=True')
+class PooledPostgresTests(SimpleTestCase):
+    databases = {'default'}
+
+    def test_closing_returns_the_connection_to_the_pool(self):
+        connection.close()
+        connection.ensure_connection()
+        raw = connection.connection
+        connection.close()
+        before = pool_stats()['default']['pool']
+        self.assertGreaterEqual(before['idle'], 1)
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        self.assertIs(connection.connection, raw)
+        after = pool_stats()['default']['pool']
+        self.assertEqual(after['checkouts'], before['checkouts'] + 1)
+        self.assertEqual(after['created'], before['created'])
+        connection.close()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TransactionTestCase):
+    """The test database as primary and a SQLite file copied from it as 'replica'.
+
+    The alias is added after the test databases are set up, so the runner
+    leaves the file alone and each test copies the primary onto it.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        cls.replica_path = os.path.join(directory.name, 'replica.sqlite3')
+        connections.settings['replica'] = dict(connections['default'].settings_dict, NAME=cls.replica_path)
+        cls.addClassCleanup(cls.remove_replica)
+
+    @classmethod
+    def remove_replica(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+
+    def setUp(self):
+        create_movie('Replicated')
+        self.sync_replica()
+        # Only the primary has these
+        create_movie('Primary only')
+        User.objects.create_user('fresh', password='pw')
+
+    def sync_replica(self):
+        connections['replica'].close()
+        connections['default'].ensure_connection()
+        target = sqlite3.connect(self.replica_path)
+        try:
+            connections['default'].connection.backup(target)
+        finally:
+            target.close()
+
+    def request(self, view, **cookies):
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies)
+        return PrimaryPinMiddleware(use_replica(view))(request)
+
+    def titles(self):
+        return sorted(Movie.objects.values_list('title', flat=True))
+
+    def test_reads_in_opted_in_views_use_the_replica(self):
+        seen = {}
+
+        def view(request):
+            seen['titles'] = self.titles()
+            seen['users'] = User.objects.count()
+            return HttpResponse()
+
+        self.request(view)
+        self.assertEqual(seen['titles'], ['Replicated'])
+        # auth reads stay on the primary
+        self.assertEqual(seen['users'], 1)
+        self.assertEqual(self.titles(), ['Primary only', 'Replicated'])
+
+    def test_writes_and_transactions_use_the_primary(self):
+        seen = []
+
+        def view(request):
+            with transaction.atomic():
+                seen.append(self.titles())
+            seen.append(self.titles())
+            create_movie('Written')
+            seen.append(self.titles())
+            return HttpResponse()
+
+        response = self.request(view)
+        self.assertEqual(seen, [
+            ['Primary only', 'Replicated'],
+            ['Replicated'],
+            ['Primary only', 'Replicated', 'Written'],
+        ])
+        self.assertEqual(Movie.objects.using('replica').count(), 1)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_pinning_is_reset_for_each_request(self):
+        seen = []
+
+        def view(request):
+            seen.append((is_pinned(), self.titles()))
+            return HttpResponse()
+
+        def writing_view(request):
+            create_movie('Written')
+            return view(request)
+
+        outside = is_pinned()
+        response = self.request(writing_view)
+        self.assertEqual(is_pinned(), outside)
+        self.request(view)
+        self.request(view, **{PIN_COOKIE: response.cookies[PIN_COOKIE].value})
+        self.assertEqual(seen, [
+            (True, ['Primary only', 'Replicated', 'Written']),
+            (False, ['Replicated']),
+            (True, ['Primary only', 'Replicated', 'Written']),
+        ])
+        self.assertEqual(is_pinned(), outside)
+
+
+class ProfilingMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.enterContext(override_settings(PROFILING_ENABLED=True, PROFILING_DIR=directory.name))
+
+    def logged(self, response, sample_rate):
+        with override_settings(PROFILING_SAMPLE_RATE=sample_rate), \
+                mock.patch.object(profiling, 'get_logger') as get_logger:
+            middleware = profiling.ProfilingMiddleware(lambda request: response)
+            middleware(RequestFactory().get('/'))
+        return json.loads(get_logger.return_value.info.call_args.args[0])
+
+    def test_memory_is_traced_for_sampled_requests_only(self):
+        entry = self.logged(HttpResponse('ok'), 0)
+        self.assertNotIn('peak_kb', entry)
+        self.assertNotIn('profile', entry)
+        entry = self.logged(HttpResponse('ok'), 1)
+        self.assertIn('peak_kb', entry)
+        self.assertIn('profile', entry)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_streaming_responses_are_flagged_and_not_summarized(self):
+        streamed = self.logged(StreamingHttpResponse(iter([b'data'])), 0)
+        self.assertTrue(streamed['streaming'])
+        plain = self.logged(HttpResponse('ok'), 0)
+        self.assertNotIn('streaming', plain)
+        summary = profiling.summarize([streamed, plain])
+        self.assertEqual([row['requests'] for row in summary], [1])
+        self.assertIsNone(summary[0]['peak_kb'])
+
+
+class MetricsFileTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+        self.enterContext(override_settings(METRICS_DIR=directory.name))
+
+    def write(self, pid, **counts):
+        metrics = MetricsFile(self.directory / ('%d.db' % pid))
+        for key, amount in counts.items():
+            metrics.inc(key, amount)
+        metrics.close()
+
+    def test_dead_processes_are_folded_into_one_file(self):
+        # Pids that cannot be running
+        self.write(1000001, a=2, b=1)
+        self.write(1000002, a=3)
+        self.write(os.getpid(), b=5)
+        totals = collect()
+
+        mark_process_dead(1000001)
+        mark_process_dead(1000002)
+        # A second notice for the same process (at exit, then child_exit) adds nothing
+        mark_process_dead(1000001)
+        self.assertEqual(collect(), totals)
+        self.assertEqual(totals, {'a': 5, 'b': 6})
+        self.assertEqual(
+            sorted(p.name for p in self.directory.glob('*.db')), sorted([MERGED_NAME, '%d.db' % os.getpid()])
+        )
+
+    def test_counters_stay_in_memory_without_a_directory(self):
+        with override_settings(METRICS_DIR=''):
+            before = collect().get('memory-only', 0)
+            increment('memory-only', 2)
+            mark_process_dead(os.getpid())
+            self.assertEqual(collect()['memory-only'], before + 2)
+        self.assertEqual(list(self.directory.iterdir()), [])
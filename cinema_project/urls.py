@@ -8,11 +8,23 @@ import os
 from django.conf.urls.static import static
 from django.views.generic import View
 from django.shortcuts import render
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
+from django.db import connections, DatabaseError
 from apps.bookings.views import RegisterView, LoginView, LogoutView, DashboardView
+from django.utils.decorators import method_decorator
+from apps.movies.cache import cache_anonymous_page
+from cinema_project.db_router import use_replica
+from cinema_project.db_pool import pool_stats
+from cinema_project import profiling
+from cinema_project.metrics import render_metrics
+from django.utils.crypto import constant_time_compare
+from django.contrib.admin.views.decorators import staff_member_required
+import time
 from apps.movies.models import Movie
 
 # Home view
+@method_decorator(cache_anonymous_page, name='dispatch')
+@method_decorator(use_replica, name='dispatch')
 class HomeView(View):
     def get(self, request):
         featured_movies = Movie.objects.filter(status='active')[:8]
@@ -22,8 +34,51 @@ class HomeView(View):
         }
         return render(request, 'home.html', context)
 
+
+# Database health for load balancers; staff also see this process's connection metrics
+def db_health(request):
+    try:
+        with connections['default'].cursor() as cursor:
+            cursor.execute('SELECT 1')
+    except DatabaseError:
+        return JsonResponse({'status': 'unavailable'}, status=503)
+    data = {'status': 'ok'}
+    if request.user.is_staff:
+        data['databases'] = pool_stats()
+    return JsonResponse(data)
+
+
+# Prometheus scrape target: booking, checkout, ticket and cache counters summed over all workers
+def metrics(request):
+    token = settings.METRICS_TOKEN
+    auth = request.headers.get('Authorization', '')
+    if not (token and constant_time_compare(auth, 'Bearer ' + token)) and not request.user.is_staff:
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+# Per-view latency percentiles from the profiling log (PROFILING_ENABLED)
+@staff_member_required
+def profiling_summary(request):
+    try:
+        hours = max(float(request.GET.get('hours', 24)), 0)
+    except ValueError:
+        hours = 24
+    entries = profiling.read_entries(since=time.time() - hours * 3600 if hours else None)
+    context = dict(
+        admin.site.each_context(request),
+        title='Request profiling',
+        summary=profiling.summarize(entries),
+        hours=hours,
+        enabled=settings.PROFILING_ENABLED,
+        profiling_dir=settings.PROFILING_DIR,
+    )
+    return render(request, 'admin/profiling_summary.html', context)
+
 urlpatterns = [
+    path('admin/profiling/', profiling_summary, name='profiling_summary'),
     path('admin/', admin.site.urls),
+    path('health/db/', db_health, name='db_health'),
+    path('metrics', metrics, name='metrics'),
     path('', HomeView.as_view(), name='home'),
     path('movies/', include('apps.movies.urls')),
     path('bookings/', include('apps.bookings.urls')),
@@ -0,0 +1,33 @@
+"""Gunicorn server hooks (loaded by the Procfile with --config)"""
+import os
+
+# Hosts set WEB_CONCURRENCY to suit the machine (gunicorn reads it too), but
+# workers only see each other's seat events through the Redis broker, so
+# anything else runs one. An explicit --workers still goes to on_starting.
+if os.getenv('SEAT_EVENTS_BROKER', 'local').lower() == 'redis':
+    workers = int(os.getenv('WEB_CONCURRENCY', '3'))
+else:
+    workers = 1
+
+
+def on_starting(server):
+    """Refuse to start workers that could not share live seat events"""
+    import django
+    from django.core.exceptions import ImproperlyConfigured
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cinema_project.settings')
+    django.setup()
+    from apps.bookings.live import check_worker_broker
+
+    try:
+        check_worker_broker(server.cfg.workers)
+    except ImproperlyConfigured as e:
+        # Gunicorn prints RuntimeErrors from the arbiter and exits non-zero
+        raise RuntimeError(str(e))
+
+
+def child_exit(server, worker):
+    """Fold a worker's counters into metrics/merged.db, even if it was killed"""
+    from cinema_project.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid)
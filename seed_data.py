@@ -235,10 +235,10 @@ print("✓ Created reviews")
 
 # Create sample bookings
 from decimal import Decimal
-for user in users:
+for user_idx, user in enumerate(users):
     for i, showtime in enumerate(Showtime.objects.all()[:2]):
-        # Get some available seats
-        available_seats = Seat.objects.filter(theater=showtime.theater)[:3]
+        # Get some available seats (distinct per user; a seat sells once per showtime)
+        available_seats = Seat.objects.filter(theater=showtime.theater)[user_idx * 3:(user_idx + 1) * 3]
         
         booking = Booking.objects.create(
             user=user,
@@ -262,6 +262,10 @@ for user in users:
 
 print("✓ Created bookings")
 
+# Bring Showtime.available_seats in line with the bookings created above
+from django.core.management import call_command
+call_command('reconcile_seat_counts')
+
 print("\n✅ Database seed complete!")
 print(f"Sample Users:")
 for user in users: